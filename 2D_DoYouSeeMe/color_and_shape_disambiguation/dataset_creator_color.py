@@ -1,13 +1,18 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
-import pandas as pd
-import ast
+import os
+import sys
 import random
-random.seed(0)
 import math
-# read dataset_info.csv
-data = pd.read_csv('visual_discrimination/sweep/color_and_shape_disambiguation/dataset_dump.csv')
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "scripts"))
+from common.balance import add_balance_argument, balance_by_sweep
+from common.columns import counts_to_records, pair_counts_from_records, pair_counts_to_records, read_dump
+from common.sink import MetadataSink
+
+dir_path = 'visual_discrimination/sweep/color_and_shape_disambiguation'
 DATA_SAMPLE_RATIO = 0.5
 '''
 Eg: dataset_info.csv
@@ -18,26 +23,69 @@ medium_1.svg,"{'octagon': 3, 'cross': 6, 'star': 5}","{('octagon', 'red'): 1, ('
 easy_1.svg is the file name, it contains 1 yellow triangle, 1 orange triangle and 1 green triangle.
 
 Thus, a maximum number of questions that ca be asked for an image is the number of keys in the color_dictionary.
+
+The typed dataset_dump.parquet (or .jsonl) stores color_dictionary as
+[{"shape": "triangle", "color": "yellow", "count": 1}, ...] and is read in preference to the csv.
 '''
 
-# dataset list of dictionary row enteries
-dataset = []
-    
-for idx, row in data.iterrows():
-    shape_dict = ast.literal_eval(row['shape_dictionary'])
-    color_dict = ast.literal_eval(row['color_dictionary'])
-    filename = row['filename']
-    sweep = row['sweep']
-
-
-    for (shape, color), count in random.sample(list(color_dict.items()), math.ceil(DATA_SAMPLE_RATIO*len(color_dict))):
-        question = f"Count the number of {shape}'s that are {color}."
-        answer = count
-        data = {
-            'filename': filename,
-            'question': question,
-            'answer': answer,
-            'sweep': sweep
-        }
-        dataset.append(data)
-pd.DataFrame(dataset).to_csv('visual_discrimination/sweep/color_and_shape_disambiguation/dataset_info.csv', index=False)
\ No newline at end of file
+# Encoders for dumps that only have the legacy csv
+DUMP_ENCODERS = {'shape_dictionary': counts_to_records, 'color_dictionary': pair_counts_to_records,
+                 'sweep': list}
+
+def question_row(filename, shape, color, count, sweep):
+    return {
+        'filename': filename,
+        'question': f"Count the number of {shape}'s that are {color}.",
+        'answer': count,
+        'sweep': sweep
+    }
+
+
+def generate_questions(rows):
+    """Yield the dataset_info.csv rows (dataset list of dictionary row enteries) for the typed dataset_dump rows."""
+    for row in rows:
+        color_dict = pair_counts_from_records(row['color_dictionary'])
+        filename = row['filename']
+        sweep = tuple(row['sweep'])
+
+
+        for (shape, color), count in random.sample(list(color_dict.items()), math.ceil(DATA_SAMPLE_RATIO*len(color_dict))):
+            yield question_row(filename, shape, color, count, sweep)
+
+
+def generate_balanced_questions(rows, target):
+    """
+    Yield the dataset_info.csv rows with the answers of each sweep cell balanced to `target`.
+
+    Every (shape, color) pair of an image is a candidate and each cell keeps as many questions as
+    generate_questions would ask (see common.balance).
+    """
+    def images():
+        for row in rows:
+            pairs = list(pair_counts_from_records(row['color_dictionary']).items())
+            sweep = tuple(row['sweep'])
+            yield sweep, [count for _, count in pairs], math.ceil(DATA_SAMPLE_RATIO*len(pairs)), (row['filename'], sweep, pairs)
+
+    for (filename, sweep, pairs), chosen in balance_by_sweep(images(), target):
+        for i in chosen:
+            (shape, color), count = pairs[i]
+            yield question_row(filename, shape, color, count, sweep)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the 2D color and shape disambiguation questions.")
+    add_balance_argument(parser)
+    args = parser.parse_args(argv)
+
+    random.seed(0)
+    # read dataset_dump
+    rows = read_dump(dir_path, DUMP_ENCODERS)
+    with MetadataSink(os.path.join(dir_path, 'dataset_info.csv')) as sink:
+        if args.balance_answers is None:
+            sink.writerows(generate_questions(rows))
+        else:
+            sink.writerows(generate_balanced_questions(rows, args.balance_answers))
+
+
+if __name__ == "__main__":
+    main()
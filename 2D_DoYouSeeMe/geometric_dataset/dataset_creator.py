@@ -1,40 +1,85 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
-import ast
-import pandas as pd
 import os
+import sys
 import math
 import random
-random.seed(0)
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "scripts"))
+from common.balance import add_balance_argument, balance_by_sweep
+from common.columns import counts_from_records, counts_to_records, read_dump
+from common.sink import MetadataSink
 
 
 dir_path = "visual_discrimination/sweep/geometric_dataset"
-df = pd.read_csv(os.path.join(dir_path, "dataset_dump.csv"))
 
 '''
 The dataset_dump.csv file contains the following columns:
 1. filename: SVG filename of the image
 2. shape_dictionary: It contains shape name as the key and corresponding count as the value
+The typed dataset_dump.parquet (or .jsonl) holds the same columns without repr strings and is read
+in preference to the csv.
 '''
 
-data = []
-for index, row in df.iterrows():
-    shape_dict = ast.literal_eval(row['shape_dictionary'])
-    filename = row['filename']
-    sweep = ast.literal_eval(row['sweep'])
-    innerlist = []
-    for shape, count in shape_dict.items():
-        question = f"Count the total number of {shape}s in the image, including each concentric {shape} separately. For example, if there is one {shape} with 2 inner concentric rings, that counts as 3 {shape}s. Respond with only a number."
-        answer = count
-        innerlist.append({
-            'filename': filename,
-            'question': question,
-            'answer': answer,
-            'sweep': sweep
-        })
-    innerlist = random.sample(innerlist, 1)
-    data.extend(innerlist)
-
-df = pd.DataFrame(data)
-df.to_csv(os.path.join(dir_path, "dataset_info.csv"), index=False)
+# Encoders for dumps that only have the legacy csv
+DUMP_ENCODERS = {'shape_dictionary': counts_to_records, 'sweep': list}
+
+def question_row(filename, shape, count, sweep):
+    return {
+        'filename': filename,
+        'question': f"Count the total number of {shape}s in the image, including each concentric {shape} separately. For example, if there is one {shape} with 2 inner concentric rings, that counts as 3 {shape}s. Respond with only a number.",
+        'answer': count,
+        'sweep': sweep
+    }
+
+
+def generate_questions(rows):
+    """Yield the dataset_info.csv rows for the typed dataset_dump rows, one question per image."""
+    for row in rows:
+        shape_dict = counts_from_records(row['shape_dictionary'])
+        filename = row['filename']
+        sweep = tuple(row['sweep'])
+        innerlist = []
+        for shape, count in shape_dict.items():
+            innerlist.append(question_row(filename, shape, count, sweep))
+        innerlist = random.sample(innerlist, 1)
+        yield from innerlist
+
+
+def generate_balanced_questions(rows, target):
+    """
+    Yield the dataset_info.csv rows with the answers of each sweep cell balanced to `target`.
+
+    Every shape of an image is a candidate and each cell keeps one question per image, though not
+    necessarily one from every image (see common.balance).
+    """
+    def images():
+        for row in rows:
+            shapes = list(counts_from_records(row['shape_dictionary']).items())
+            sweep = tuple(row['sweep'])
+            yield sweep, [count for _, count in shapes], 1, (row['filename'], sweep, shapes)
+
+    for (filename, sweep, shapes), chosen in balance_by_sweep(images(), target):
+        for i in chosen:
+            shape, count = shapes[i]
+            yield question_row(filename, shape, count, sweep)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the 2D geometric counting questions.")
+    add_balance_argument(parser)
+    args = parser.parse_args(argv)
+
+    random.seed(0)
+    rows = read_dump(dir_path, DUMP_ENCODERS)
+    with MetadataSink(os.path.join(dir_path, "dataset_info.csv")) as sink:
+        if args.balance_answers is None:
+            sink.writerows(generate_questions(rows))
+        else:
+            sink.writerows(generate_balanced_questions(rows, args.balance_answers))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,34 +2,48 @@
 # Licensed under the MIT license.
 
 import os
-import pandas as pd
+import sys
 import random
-from typing import Dict, List, Tuple, Any, Optional
+import argparse
+from typing import Dict, Iterable, Iterator, List, Tuple, Any, Optional, Union
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "scripts"))
+from common.columns import grids_to_records, read_dump
+from common.balance import add_balance_argument, balance_by_sweep
+from common.grids import COUNT_FILTERS, DIRECTIONS, DirectionalCounts, GridSet
+from common.sink import MetadataSink
+
+dir_path = "visual_discrimination/sweep/visual_spatial"
+
+# Encoders for dumps that only have the legacy csv
+DUMP_ENCODERS = {'spatial_dict': grids_to_records, 'sweep': list}
+
+def row_grids(row: Dict[str, Any]) -> GridSet:
+    """Grids of a dataset_dump row, from its 'spatial_dict' or the .npz named in 'grids_npz'"""
+    if row.get('grids_npz'):
+        return GridSet.load_npz(os.path.join(dir_path, row['grids_npz']))
+    return GridSet.from_records(row['spatial_dict'])
+
 
 class MultiGridQuestionGenerator:
-    def __init__(self, spatial_dicts: List[Dict]):
+    def __init__(self, grids: Union[GridSet, List[Dict]]):
         """
-        Initialize with a list of spatial dictionaries, each representing one grid
+        Initialize with the grids of one image
         
         Args:
-            spatial_dicts: List of dictionaries, where each dictionary maps (row, col) 
-                          to (shape, color) for one grid
+            grids: common.grids.GridSet of the grids, or a list of dictionaries, where each
+                   dictionary maps (row, col) to (shape, color) for one grid
         """
-        self.spatial_dicts = spatial_dicts
-        self.num_grids = len(spatial_dicts)
-        self.grid_dimensions = [self._get_grid_dimensions(d) for d in spatial_dicts]
+        self.grids = grids if isinstance(grids, GridSet) else GridSet.from_dicts(grids)
+        self.num_grids = len(self.grids)
+        self.grid_dimensions = [(self.grids.rows, self.grids.cols)] * self.num_grids
+        self.counts = DirectionalCounts(self.grids)
         self.shapes = ['triangle', 'square', 'circle']
         self.colors = ['black', 'white']
-        
-    def _get_grid_dimensions(self, spatial_dict: Dict) -> Tuple[int, int]:
-        """Calculate dimensions for a single grid"""
-        max_row = max(pos[0] for pos in spatial_dict.keys())
-        max_col = max(pos[1] for pos in spatial_dict.keys())
-        return (max_row + 1, max_col + 1)
     
     def _get_object_at_position(self, grid_idx: int, row: int, col: int) -> Tuple[str, str]:
         """Get object at position in specified grid"""
-        return self.spatial_dicts[grid_idx].get((row, col), (None, None))
+        return self.grids.cell(grid_idx, row, col)
 
     def _count_objects_same_row(self, grid_idx: int, row: int, col: int, 
                               direction: str,
@@ -46,22 +60,7 @@ class MultiGridQuestionGenerator:
         if direction == 'left' and col <= 0:
             return -1
             
-        count = 0
-        if direction == 'right':
-            range_to_check = range(col + 1, cols)
-        else:  # left
-            range_to_check = range(col - 1, -1, -1)
-            
-        for c in range_to_check:
-            curr_shape, curr_color = self._get_object_at_position(grid_idx, row, c)
-            matches = True
-            if color and curr_color != color:
-                matches = False
-            if shape and curr_shape != shape:
-                matches = False
-            if matches:
-                count += 1
-        return count
+        return self.counts.count(grid_idx, row, col, direction, color or None, shape or None)
 
     def _count_objects_same_column(self, grid_idx: int, row: int, col: int,
                                  direction: str,
@@ -78,22 +77,7 @@ class MultiGridQuestionGenerator:
         if direction == 'down' and row >= rows - 1:
             return -1
             
-        count = 0
-        if direction == 'up':
-            range_to_check = range(row - 1, -1, -1)
-        else:  # down
-            range_to_check = range(row + 1, rows)
-            
-        for r in range_to_check:
-            curr_shape, curr_color = self._get_object_at_position(grid_idx, r, col)
-            matches = True
-            if color and curr_color != color:
-                matches = False
-            if shape and curr_shape != shape:
-                matches = False
-            if matches:
-                count += 1
-        return count
+        return self.counts.count(grid_idx, row, col, direction, color or None, shape or None)
 
     def _gen_directional_count_question(self) -> Optional[Dict[str, Any]]:
         """Generate a question about counting objects in a specific direction"""
@@ -130,11 +114,19 @@ class MultiGridQuestionGenerator:
         else:
             count = self._count_objects_same_column(grid_idx, row, col, direction, target_color, target_shape)
             
+        return self._directional_count_question(grid_idx, row, col, direction, target_color, target_shape, count)
+
+    def _directional_count_question(self, grid_idx: int, row: int, col: int, direction: str,
+                                    target_color: Optional[str], target_shape: Optional[str],
+                                    count: int) -> Dict[str, Any]:
+        """Question dictionary of a directional count, counting the given color, shape or both"""
+        base_shape, base_color = self._get_object_at_position(grid_idx, row, col)
+        
         # Construct question text
         what_to_count = ""
-        if count_type == 'color':
+        if target_shape is None:
             what_to_count = f"{target_color} objects"
-        elif count_type == 'shape':
+        elif target_color is None:
             what_to_count = f"{target_shape}s"
         else:
             what_to_count = f"{target_color} {target_shape}s"
@@ -152,9 +144,57 @@ class MultiGridQuestionGenerator:
             "grid_idx": grid_idx
         }
 
-    def generate_question_set(self, num_questions: int = 5) -> List[Dict[str, Any]]:
-        """Generate a set of unique questions across all grids"""
+    def enumerate_directional_count_questions(self) -> Dict[str, Any]:
+        """
+        Every valid directional count question of the image, with its answer, as parallel arrays
+
+        Returns:
+            Dictionary of equal-length NumPy arrays: 'grid', 'row', 'col', 'direction' (index into
+            common.grids.DIRECTIONS), 'filter' (index into common.grids.COUNT_FILTERS, never the
+            filter counting every object) and 'answer'
+        """
+        import numpy as np
+
+        # Questions always count a color, a shape or both
+        filters = np.array([i for i, f in enumerate(COUNT_FILTERS) if f != (None, None)])
+        counts = self.counts.all_counts()[:, filters]
+        direction, filter_idx, grid, row, col = np.nonzero(counts >= 0)
+        return {'grid': grid, 'row': row, 'col': col, 'direction': direction, 'filter': filters[filter_idx],
+                'answer': counts[direction, filter_idx, grid, row, col]}
+
+    def _sample_enumerated_questions(self, num_questions: Optional[int]) -> List[Dict[str, Any]]:
+        """Questions drawn without replacement from enumerate_directional_count_questions, all of them if None"""
+        candidates = self.enumerate_directional_count_questions()
+        total = len(candidates['answer'])
+        chosen = range(total) if num_questions is None else random.sample(range(total), min(num_questions, total))
+        return self.enumerated_questions(candidates, chosen)
+
+    def enumerated_questions(self, candidates: Dict[str, Any], chosen: Iterable[int]) -> List[Dict[str, Any]]:
+        """Questions of the chosen indices of enumerate_directional_count_questions"""
+        columns = {key: values.tolist() for key, values in candidates.items()}
+        questions = []
+        for i in chosen:
+            color, shape = COUNT_FILTERS[columns['filter'][i]]
+            questions.append(self._directional_count_question(
+                columns['grid'][i], columns['row'][i], columns['col'][i], DIRECTIONS[columns['direction'][i]],
+                color, shape, columns['answer'][i]))
+        return questions
+
+    def generate_question_set(self, num_questions: Optional[int] = 5,
+                              exhaustive: bool = False) -> List[Dict[str, Any]]:
+        """
+        Generate a set of unique questions across all grids
+
+        By default questions are drawn at random, up to 3 * num_questions times, and repeats are
+        dropped. With exhaustive, every valid question is enumerated with its answer and
+        num_questions of them (all of them if None) are sampled without replacement, so the set
+        is always full when the image has enough questions.
+        """
+        if exhaustive:
+            return self._sample_enumerated_questions(num_questions)
+
         questions = []
+        seen = set()
         attempts = 0
         max_attempts = num_questions * 3
         
@@ -166,50 +206,104 @@ class MultiGridQuestionGenerator:
         while len(questions) < num_questions and attempts < max_attempts:
             gen_func = random.choice(question_generators)
             question = gen_func()
-            if question and not any(self._are_similar_questions(question, q) for q in questions):
+            if question and self._question_key(question) not in seen:
+                seen.add(self._question_key(question))
                 questions.append(question)
             attempts += 1
             
         return questions
 
-    def _are_similar_questions(self, q1: Dict[str, Any], q2: Dict[str, Any]) -> bool:
-        """Check if two questions are too similar"""
-        if q1['type'] != q2['type'] or q1['grid_idx'] != q2['grid_idx']:
-            return False
-        return q1['question'] == q2['question']
+    @staticmethod
+    def _question_key(question: Dict[str, Any]) -> Tuple[str, int, str]:
+        """Questions with the same key are repeats"""
+        return question['type'], question['grid_idx'], question['question']
 
 
-def process_dataset(df: pd.DataFrame) -> pd.DataFrame:
+def process_dataset(rows: Iterable[Dict[str, Any]], exhaustive: bool = False,
+                    num_questions: Optional[int] = None) -> Iterator[Dict[str, Any]]:
     """
     Process the dataset to generate questions for each set of grids
     
     Args:
-        df: DataFrame with 'name' and 'spatial_dict' columns
+        rows: Typed dataset_dump rows with 'name', 'spatial_dict' (or 'grids_npz') and 'sweep' columns
+        exhaustive: Sample the questions from all valid ones, see generate_question_set
+        num_questions: Questions per image, between 1 and 5 at random if None; 0 asks every
+            valid question with exhaustive
         
-    Returns:
-        DataFrame with filename, question, answer columns
+    Yields:
+        Question rows with filename, question, answer and sweep columns
     """
-    dataset = []
-    
-    for idx, row in df.iterrows():
+    for row in rows:
         print(f"Processing {row['name']}")
-        generator = MultiGridQuestionGenerator(row['spatial_dict'])
-        questions = generator.generate_question_set(num_questions=random.randint(1, 5))
+        grids = row_grids(row)
+        sweep = tuple(row['sweep'])
+        generator = MultiGridQuestionGenerator(grids)
+        if num_questions is None:
+            count = random.randint(1, 5)
+        else:
+            count = num_questions or None
+        questions = generator.generate_question_set(num_questions=count, exhaustive=exhaustive)
         
         for q in questions:
             q['filename'] = row['name']
-            q['sweep'] = row['sweep']
-        dataset.extend(questions)
+            q['sweep'] = sweep
+            yield q
         print("=====================================")
-        
-    return pd.DataFrame(dataset)[['filename', 'question', 'answer', 'sweep']]
 
-import ast
 
-df = pd.read_csv("visual_discrimination/sweep/visual_spatial/dataset_dump.csv")
-df['spatial_dict'] = df.apply(lambda x: ast.literal_eval(x['spatial_dict']), axis=1)
-df["sweep"] = df.apply(lambda x: ast.literal_eval(x["sweep"]), axis=1)
+def process_dataset_balanced(rows: Iterable[Dict[str, Any]], target,
+                             num_questions: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Process the dataset with the answers of each sweep cell balanced to `target`
+
+    Every valid directional count question of an image is a candidate and each sweep cell keeps
+    as many questions as the images' quotas add up to (see common.balance).
+
+    Args:
+        rows: Typed dataset_dump rows with 'name', 'spatial_dict' (or 'grids_npz') and 'sweep' columns
+        target: common.balance.UNIFORM or {answer: weight}
+        num_questions: Quota of each image, between 1 and 5 at random if None
+    """
+    def images():
+        for row in rows:
+            generator = MultiGridQuestionGenerator(row_grids(row))
+            answers = generator.enumerate_directional_count_questions()['answer']
+            quota = random.randint(1, 5) if num_questions is None else num_questions
+            yield tuple(row['sweep']), answers, quota, row
+
+    # Only the answers are kept until the cell is balanced; the chosen questions are rebuilt from the row
+    for row, chosen in balance_by_sweep(images(), target):
+        print(f"Processing {row['name']}")
+        generator = MultiGridQuestionGenerator(row_grids(row))
+        candidates = generator.enumerate_directional_count_questions()
+        for q in generator.enumerated_questions(candidates, chosen):
+            q['filename'] = row['name']
+            q['sweep'] = tuple(row['sweep'])
+            yield q
+        print("=====================================")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the 2D visual spatial questions.")
+    parser.add_argument("--exhaustive", action="store_true",
+                        help="Enumerate every valid question of an image and sample from them")
+    parser.add_argument("--num-questions", type=int, default=None,
+                        help="Questions per image (default: 1 to 5 at random); 0 with --exhaustive asks all")
+    add_balance_argument(parser)
+    args = parser.parse_args(argv)
+    if args.num_questions == 0 and not args.exhaustive:
+        parser.error("--num-questions 0 needs --exhaustive")
+    if args.balance_answers is not None and args.num_questions == 0:
+        parser.error("--balance-answers needs a number of questions per image")
+
+    rows = read_dump(dir_path, DUMP_ENCODERS)
+    with MetadataSink(os.path.join(dir_path, "dataset_info.csv"),
+                      fieldnames=['filename', 'question', 'answer', 'sweep']) as sink:
+        if args.balance_answers is not None:
+            sink.writerows(process_dataset_balanced(rows, args.balance_answers, num_questions=args.num_questions))
+        else:
+            sink.writerows(process_dataset(rows, exhaustive=args.exhaustive, num_questions=args.num_questions))
 
-dataset = process_dataset(df)
 
-dataset.to_csv("visual_discrimination/sweep/visual_spatial/dataset_info.csv", index=False)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
+import os
+import sys
+import json
 import random
 import ast
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "scripts"))
+from common.sink import MetadataSink
+
 SEED=51
-random.seed(SEED)
 
 
 def generate_shape_color_question_and_answer(info):
@@ -57,31 +63,29 @@ def generate_shape_question_and_answer(info):
     )
     return question, total
 
-import os
-import json
-
 base_dir = "3D_DoYouSeeMe/color_disambiguation"
 
-os.listdir(base_dir)
-
-data_list = []
-for filename in os.listdir(base_dir):
-    if filename.endswith(".json"):
-        # print(filename)
-        with open(os.path.join(base_dir, filename), "r") as f:
-            data = f.read()
-        data = json.loads(data)
-        q, a = generate_shape_color_question_and_answer(data)
-
-        num_shapes = data["num_shapes"]
-        max_instances_per_shape = data["max_instances_per_shape"]
-        min_visibility = data["min_visibility"]
-        
-        data_list.append({"filename": os.path.splitext(filename)[0] + ".png",
-                          "question": q,
-                          "answer": a,
-                          "sweep": [num_shapes, max_instances_per_shape, min_visibility]})
-
-import pandas as pd
-df = pd.DataFrame(data_list)
-df.to_csv(os.path.join(base_dir, "dataset_info.csv"), index=False)
\ No newline at end of file
+
+def main():
+    random.seed(SEED)
+    with MetadataSink(os.path.join(base_dir, "dataset_info.csv")) as sink:
+        for filename in os.listdir(base_dir):
+            if filename.endswith(".json"):
+                # print(filename)
+                with open(os.path.join(base_dir, filename), "r") as f:
+                    data = f.read()
+                data = json.loads(data)
+                q, a = generate_shape_color_question_and_answer(data)
+
+                num_shapes = data["num_shapes"]
+                max_instances_per_shape = data["max_instances_per_shape"]
+                min_visibility = data["min_visibility"]
+
+                sink.write({"filename": os.path.splitext(filename)[0] + ".png",
+                            "question": q,
+                            "answer": a,
+                            "sweep": [num_shapes, max_instances_per_shape, min_visibility]})
+
+
+if __name__ == "__main__":
+    main()
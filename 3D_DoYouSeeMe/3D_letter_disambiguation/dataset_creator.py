@@ -3,9 +3,12 @@
 
 # variation, dot_size, spacing, letter_number
 import os
-import pandas as pd
+import sys
 import json
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "scripts"))
+from common.sink import MetadataSink
+
 # {
 #     "scene": "skywalk",
 #     "light": "left",
@@ -22,29 +25,32 @@ import json
 
 base_dir = "3D_DoYouSeeMe/letter_disambiguation"
 
-files = os.listdir(base_dir)
-
-data_list = []
-for file in files:
-    if file.endswith(".json"):
-        with open(os.path.join(base_dir, file), "r") as f:
-            data = f.read()
-        data = json.loads(data)
-        
-        question = "In the scene, which letters do you see from left to right?"
-        letters = data["letters"]
-        answer = "".join(letters)
-        
-        variation = data["dot_type"]
-        dot_size = data["dot_size"]
-        spacing = data["spacing"]
-        num_letters = len(letters)
-        data_list.append({
-            "filename": os.path.splitext(file)[0] + ".png",
-            "question": question,
-            "answer": answer,
-            "sweep": [variation, dot_size, spacing, num_letters]
-        })
-
-df = pd.DataFrame(data_list)
-df.to_csv(os.path.join(base_dir, "dataset_info.csv"), index=False)
\ No newline at end of file
+
+def main():
+    files = os.listdir(base_dir)
+
+    with MetadataSink(os.path.join(base_dir, "dataset_info.csv")) as sink:
+        for file in files:
+            if file.endswith(".json"):
+                with open(os.path.join(base_dir, file), "r") as f:
+                    data = f.read()
+                data = json.loads(data)
+
+                question = "In the scene, which letters do you see from left to right?"
+                letters = data["letters"]
+                answer = "".join(letters)
+
+                variation = data["dot_type"]
+                dot_size = data["dot_size"]
+                spacing = data["spacing"]
+                num_letters = len(letters)
+                sink.write({
+                    "filename": os.path.splitext(file)[0] + ".png",
+                    "question": question,
+                    "answer": answer,
+                    "sweep": [variation, dot_size, spacing, num_letters]
+                })
+
+
+if __name__ == "__main__":
+    main()
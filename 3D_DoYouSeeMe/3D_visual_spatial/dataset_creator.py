@@ -1,11 +1,17 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
+import os
+import sys
+import json
 import random
 import re
 from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "scripts"))
+from common.sink import MetadataSink
+
 SEED = 42
-random.seed(SEED)
 
 def generate_question_and_answer(grid_dict):
     """
@@ -89,29 +95,24 @@ def generate_question_and_answer(grid_dict):
 
     return question, count, (max_row, max_col)
 
-import os
-import json
-
 base_dir = "3D_DoYouSeeMe/visual_spatial"
 
-os.listdir(base_dir)
-
-data_list = []
-for filename in os.listdir(base_dir):
-    if filename.endswith(".json"):
-        # print(filename)
-        with open(os.path.join(base_dir, filename), "r") as f:
-            data = f.read()
-        data = json.loads(data)
-        q, a, (max_row, max_col) = generate_question_and_answer(data)
-        data_list.append({"filename": os.path.splitext(filename)[0] + ".png",
-                          "question": q,
-                          "answer": a,
-                          "sweep": [max_row, max_col]})
-
-import pandas as pd
-df = pd.DataFrame(data_list)
-df.to_csv(os.path.join(base_dir, "dataset_info.csv"), index=False)
-
-        
-        
+
+def main():
+    random.seed(SEED)
+    with MetadataSink(os.path.join(base_dir, "dataset_info.csv")) as sink:
+        for filename in os.listdir(base_dir):
+            if filename.endswith(".json"):
+                # print(filename)
+                with open(os.path.join(base_dir, filename), "r") as f:
+                    data = f.read()
+                data = json.loads(data)
+                q, a, (max_row, max_col) = generate_question_and_answer(data)
+                sink.write({"filename": os.path.splitext(filename)[0] + ".png",
+                            "question": q,
+                            "answer": a,
+                            "sweep": [max_row, max_col]})
+
+
+if __name__ == "__main__":
+    main()
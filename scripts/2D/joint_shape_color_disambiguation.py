@@ -4,10 +4,34 @@
 import random
 import re
 from collections import defaultdict
+import functools
 import math
 import csv
 import os
-import pandas as pd
+import sys
+import argparse
+import itertools
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.columns import (counts_from_records, counts_to_records, pair_counts_from_records,
+                            pair_counts_to_records, placement_from_records, placement_to_records, write_dump)
+from common.placement import (MAX_FILL, OccupancyGrid, add_feasibility_argument, add_placement_argument,
+                              fit_scale, placement_stats, rotated_box_area, shortfall_note)
+from common.spatial import SpatialHash
+from common.svg import XLINK_NAMESPACE, add_symbols_argument, symbol_id, symbol_use
+from common.sweep import add_sweep_arguments, run_resumable_sweep
+from common.timing import stage
+from common.writer import write_file
+
+TASK = "2D_color_and_shape_disambiguation"
+
+# How the typed dataset_dump columns read back as the objects shown in dataset_dump.csv
+DUMP_DECODERS = {
+    "shape_dictionary": counts_from_records,
+    "color_dictionary": pair_counts_from_records,
+    "placement": placement_from_records,
+    "sweep": tuple,
+}
 
 def scale_points_from_center(points, center, scale):
     """Scale points relative to center by given scale factor."""
@@ -186,24 +210,58 @@ def calculate_shape_bounds(shape_type, points, scale, rotation_deg):
     return (rotated_width, rotated_height)
 
 
+class CompiledShape:
+    def __init__(self, shape_name, shape_content):
+        """
+        Parse a shape_dictionary entry once: its outline centered on its vertex centroid, as the
+        vertex array that scaled instances are computed from.
+
+        The vertices are the centered points rounded to one decimal, as written in the centered
+        path that scale_shape used to re-parse for every instance, so scaled_path gives the same
+        text.
+        """
+        import numpy as np
+
+        self.name = shape_name
+        path_match = re.search(r'd="([^"]+)"', shape_content)
+        original_points = parse_path_points(path_match.group(1)) if path_match else []
+        cx, cy = calculate_center(original_points)
+        self.centered_points = [(px - cx, py - cy) for px, py in original_points]
+        self.path_data = points_to_path(self.centered_points)
+        self.vertices = np.array(parse_path_points(self.path_data), dtype=float).reshape(-1, 2)
+        if self.centered_points:
+            xs = [x for x, _ in self.centered_points]
+            ys = [y for _, y in self.centered_points]
+            self.size = (max(xs) - min(xs), max(ys) - min(ys))
+
+    def bounds(self, scale):
+        """(width, height) of the unrotated shape at `scale`, as calculate_shape_bounds(..., 0)."""
+        if self.name in ['circle', 'ellipse']:
+            return calculate_shape_bounds(self.name, self.centered_points, scale, 0)
+        return (self.size[0] * scale, self.size[1] * scale)
+
+    def scaled_path(self, scale):
+        """Path data of the shape scaled by `scale` about its center, as scale_shape(name, path_data, scale)."""
+        if self.name in ['circle', 'ellipse']:
+            return scale_shape(self.name, self.path_data, scale)
+        scaled = (self.vertices * scale).tolist()
+        return "M " + " L ".join(f"{x:.1f} {y:.1f}" for x, y in scaled) + " Z"
+
+
+@functools.lru_cache(maxsize=None)
+def compile_shape(shape_name, shape_content):
+    """CompiledShape of a shape_dictionary entry, parsed on first use only."""
+    return CompiledShape(shape_name, shape_content)
+
+
 def check_overlap(new_box, placed_boxes):
     """
     Check if new bounding box overlaps with any placed boxes.
-    Each box is tuple: (x1, y1, x2, y2) representing top-left and bottom-right corners
+    Each box is tuple: (x1, y1, x2, y2) representing top-left and bottom-right corners.
+    placed_boxes is a common.spatial.SpatialHash of the placed boxes, so only the boxes in the
+    grid cells new_box touches are compared; boxes that touch count as overlapping.
     """
-    if not placed_boxes:
-        return False
-        
-    for box in placed_boxes:
-        # Check if one rectangle is to the left of the other
-        if new_box[2] < box[0] or box[2] < new_box[0]:
-            continue
-        # Check if one rectangle is above the other
-        if new_box[3] < box[1] or box[3] < new_box[1]:
-            continue
-        # If we get here, the rectangles overlap
-        return True
-    return False
+    return placed_boxes.intersects(new_box)
 
 def get_bounding_box(x, y, width, height, rotation):
     """
@@ -225,12 +283,25 @@ def get_bounding_box(x, y, width, height, rotation):
     
     return (x1, y1, x2, y2)
 
-def try_place_shape(width, height, canvas_width, canvas_height, padding, placed_boxes, max_attempts=50):
+# Uniform draws tried in free_space placement before drawing from the occupancy grid
+UNIFORM_ATTEMPTS = 10
+
+
+def try_place_shape(width, height, canvas_width, canvas_height, padding, placed_boxes, max_attempts=50,
+                    sampler=None, stats=None):
     """
-    Try to find a valid position for a shape with given dimensions.
-    Returns (x, y, box) if successful, None if failed.
+    Try to find a valid position and rotation for a shape with given dimensions.
+    Positions are drawn uniformly. If `sampler` (a common.placement.OccupancyGrid of the placed
+    boxes) is given, after UNIFORM_ATTEMPTS failed draws they are drawn, after the rotation, from
+    the cells with room for the rotated shape's box, and the search stops early once no cell has
+    room at any rotation. `stats` is the item's common.placement.placement_stats dict; each attempt
+    is counted in its 'attempts' if it is given.
+    Returns (x, y, rotation, box) if successful, with rotation in degrees and box the
+    (xmin, ymin, xmax, ymax) bounding box of the rotated shape, None if failed.
     """
-    for _ in range(max_attempts):
+    for attempt in range(max_attempts):
+        if stats is not None:
+            stats['attempts'] += 1
         # Calculate safe positioning ranges
         x_min = padding + width/2
         x_max = canvas_width - padding - width/2
@@ -241,9 +312,21 @@ def try_place_shape(width, height, canvas_width, canvas_height, padding, placed_
             return None
             
         # Try random position
-        x = random.uniform(x_min, x_max)
-        y = random.uniform(y_min, y_max)
-        rotation = random.uniform(0, 360)
+        if sampler is None or attempt < UNIFORM_ATTEMPTS:
+            x = random.uniform(x_min, x_max)
+            y = random.uniform(y_min, y_max)
+            rotation = random.uniform(0, 360)
+        else:
+            rotation = random.uniform(0, 360)
+            _, _, half_width, half_height = get_bounding_box(0, 0, width, height, rotation)
+            position = sampler.sample(half_width, half_height, x_min, y_min, x_max, y_max)
+            if position is None:
+                # A rotated shape's box is never narrower than its smaller side
+                half_side = min(width, height) / 2
+                if not sampler.has_room(half_side, half_side, x_min, y_min, x_max, y_max):
+                    return None  # No room at any rotation
+                continue
+            x, y = position
         
         # Get bounding box for this position
         box = get_bounding_box(x, y, width, height, rotation)
@@ -256,18 +339,34 @@ def try_place_shape(width, height, canvas_width, canvas_height, padding, placed_
 
 
 def generate_complex_composition(shape_dict=shape_dictionary, canvas_width=800, canvas_height=600, 
-                               num_shapes=None, max_instances=10):  # Increased max_instances
-    """Generate composition with shape-specific scaling and non-overlapping placement."""
+                               num_shapes=None, max_instances=10,  # Increased max_instances
+                               placement="rejection", use_symbols=False, feasibility="place"):
+    """
+    Generate composition with shape-specific scaling and non-overlapping placement.
+
+    Returns the SVG, the shape counts, the (shape, color) counts,
+    {shape: (requested instances, placed instances)} and the common.placement.placement_stats of
+    the composition. With placement="free_space", when a few
+    uniform draws fail, positions are drawn from a common.placement.OccupancyGrid of the placed
+    boxes, only where the shape being placed has room. With use_symbols each selected shape's outline
+    is written once in <defs> and instances are <use> elements scaled by their transform (see
+    common.svg), with the stroke width divided by the scale so it stays 2.
+
+    The fill estimate counts each instance as the mean rotated bounding box of its shape at the
+    expected scale and instance count. When it is above common.placement.MAX_FILL,
+    feasibility="abort" gives up the remaining instances once one fails even at the reduced scale,
+    and feasibility="rescale" shrinks the base scale to fit.
+    """
     if num_shapes is None:
         num_shapes = random.randint(1, len(shape_dict))
     
     selected_shapes = random.sample(list(shape_dict.keys()), num_shapes)
     shape_counts = defaultdict(int)
     color_counts = defaultdict(int)
-    placed_boxes = []  # Keep track of placed shapes
     
+    namespaces = f' {XLINK_NAMESPACE}' if use_symbols else ""
     svg = f"""<?xml version="1.0" encoding="UTF-8"?>
-<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {canvas_width} {canvas_height}">
+<svg xmlns="http://www.w3.org/2000/svg"{namespaces} viewBox="0 0 {canvas_width} {canvas_height}">
     <rect width="{canvas_width}" height="{canvas_height}" fill="white"/>
 """
     
@@ -275,71 +374,104 @@ def generate_complex_composition(shape_dict=shape_dictionary, canvas_width=800,
     total_shapes = sum(random.randint(1, max_instances) for _ in range(num_shapes))
     avg_shape_area = (canvas_width * canvas_height) / (total_shapes * 4)  # Use 1/4 of equal division
     base_scale_factor = math.sqrt(avg_shape_area / (100 * 100))  # Assuming 100x100 is typical shape size
+    placement_counts = {}
+
+    # Mean rotated box area of each shape at scale 1; scales are uniform in [0.5, 1.5] times the
+    # base, whose mean square is 13/12 of the base squared
+    unit_areas = [rotated_box_area(*shape.bounds(1.0)) for shape in
+                  (compile_shape(name, shape_dict[name]) for name in selected_shapes) if shape.centered_points]
+
+    def fill_at(factor):
+        mean_square_scale = (factor * base_scale_factor) ** 2 * 13 / 12
+        area = sum(unit_areas) * (1 + max_instances) / 2 * mean_square_scale
+        return area / ((canvas_width - 20) * (canvas_height - 20))
+
+    fill = fill_at(1.0)
+    scale_factor = fit_scale(fill_at) if feasibility == "rescale" else 1.0
+    base_scale_factor *= scale_factor
+    stats = placement_stats(fill, scale_factor)
+    give_up_when_full = feasibility == "abort" and fill > MAX_FILL
+    full = False
+    # Cells about the size of an average shape
+    placed_boxes = SpatialHash(100 * base_scale_factor)
+
+    sampler = None
+    if placement == "free_space":
+        # Cells an eighth of the side of an average shape, at most 128 across the canvas
+        sampler = OccupancyGrid(0, 0, canvas_width, canvas_height,
+                                max(12.5 * base_scale_factor, max(canvas_width, canvas_height) / 128))
     
-    for shape_name in selected_shapes:
-        num_instances = random.randint(1, max_instances)
-        shape_content = shape_dict[shape_name]
-        
-        path_match = re.search(r'd="([^"]+)"', shape_content)
-        if not path_match:
-            continue
-        
-        original_path_data = path_match.group(1)
-        original_points = parse_path_points(original_path_data)
-        
-        if not original_points:
-            continue
+    with stage("placement"):
+        for shape_name in selected_shapes:
+            num_instances = random.randint(1, max_instances)
+            placement_counts[shape_name] = (num_instances, 0)
+            shape = compile_shape(shape_name, shape_dict[shape_name])
         
-        # Center the shape
-        cx, cy = calculate_center(original_points)
-        centered_points = [(px - cx, py - cy) for px, py in original_points]
-        path_data = points_to_path(centered_points)
+            if not shape.centered_points:
+                continue
         
-        svg += f"\n    <!-- {shape_name} instances -->\n"
+            svg += f"\n    <!-- {shape_name} instances -->\n"
+            if use_symbols:
+                svg += f'    <defs><path id="{symbol_id(shape_name)}" d="{shape.scaled_path(1.0)}"/></defs>\n'
         
-        for _ in range(num_instances):
-            # Calculate initial scale
-            scale = random.uniform(base_scale_factor * 0.5, base_scale_factor * 1.5)
+            placed = 0
+            for _ in range(num_instances):
+                if full or (sampler is not None and not sampler):
+                    stats['skipped'] += 1
+                    continue
+                # Calculate initial scale
+                scale = random.uniform(base_scale_factor * 0.5, base_scale_factor * 1.5)
             
-            # Calculate bounding box dimensions
-            bounds_width, bounds_height = calculate_shape_bounds(shape_name, centered_points, scale, 0)
-            padding = max(10, bounds_width * 0.05, bounds_height * 0.05)  # Reduced padding
+                # Calculate bounding box dimensions
+                bounds_width, bounds_height = shape.bounds(scale)
+                padding = max(10, bounds_width * 0.05, bounds_height * 0.05)  # Reduced padding
             
-            # Try to place the shape
-            placement = try_place_shape(bounds_width, bounds_height, 
-                                     canvas_width, canvas_height,
-                                     padding, placed_boxes)
+                # Try to place the shape
+                position = try_place_shape(bounds_width, bounds_height, 
+                                        canvas_width, canvas_height,
+                                        padding, placed_boxes, sampler=sampler, stats=stats)
             
-            if placement is None:
-                # Try with reduced scale if initial placement fails
-                scale *= 0.8
-                bounds_width *= 0.8
-                bounds_height *= 0.8
-                placement = try_place_shape(bounds_width, bounds_height,
-                                         canvas_width, canvas_height,
-                                         padding, placed_boxes)
+                if position is None:
+                    # Try with reduced scale if initial placement fails
+                    stats['fallbacks'] += 1
+                    scale *= 0.8
+                    bounds_width *= 0.8
+                    bounds_height *= 0.8
+                    position = try_place_shape(bounds_width, bounds_height,
+                                            canvas_width, canvas_height,
+                                            padding, placed_boxes, sampler=sampler, stats=stats)
                 
-                if placement is None:
-                    continue  # Skip this shape if still can't place
+                    if position is None:
+                        full = give_up_when_full
+                        continue  # Skip this shape if still can't place
             
-            x, y, rotation, box = placement
-            placed_boxes.append(box)
+                x, y, rotation, box = position
+                placed_boxes.insert(box, box)
+                placed += 1
+                placement_counts[shape_name] = (num_instances, placed)
+                if sampler is not None:
+                    sampler.block_box(*box)
             
-            # Select color and update counts
-            color_name = random.choice(list(color_dictionary.keys()))
-            color_value = color_dictionary[color_name]
+                # Select color and update counts
+                color_name = random.choice(list(color_dictionary.keys()))
+                color_value = color_dictionary[color_name]
             
-            shape_counts[shape_name] += 1
-            color_counts[(shape_name, color_name)] += 1
+                shape_counts[shape_name] += 1
+                color_counts[(shape_name, color_name)] += 1
             
-            scaled_path = scale_shape(shape_name, path_data, scale)
-            svg += f"""    <g transform="translate({x:.1f} {y:.1f}) rotate({rotation:.1f})">
+                if use_symbols:
+                    transform = f"translate({x:.1f} {y:.1f}) rotate({rotation:.1f}) scale({scale:.4g})"
+                    svg += "    " + symbol_use(shape_name, transform, fill=color_value, stroke="black",
+                                               stroke_width=f"{2 / scale:.4g}") + "\n"
+                else:
+                    scaled_path = shape.scaled_path(scale)
+                    svg += f"""    <g transform="translate({x:.1f} {y:.1f}) rotate({rotation:.1f})">
         <path d="{scaled_path}" fill="{color_value}" stroke="black" stroke-width="2"/>
     </g>
 """
     
     svg += "</svg>"
-    return svg, dict(shape_counts), dict(color_counts)
+    return svg, dict(shape_counts), dict(color_counts), placement_counts, stats
 
 
 def generate_easy_example(index, shape_dict):
@@ -351,7 +483,7 @@ def generate_easy_example(index, shape_dict):
     # Random number of instances (1-4)
     num_instances = random.randint(1, 5)
     
-    composition, shape_counts, color_counts = generate_complex_composition(
+    composition, shape_counts, color_counts, _, _ = generate_complex_composition(
         shape_dict=selected_dict,
         canvas_width=400,
         canvas_height=400,
@@ -369,7 +501,7 @@ def generate_medium_example(index, shape_dict):
     selected_shapes = random.sample(list(shape_dict.keys()), num_shapes)
     selected_dict = {name: shape_dict[name] for name in selected_shapes}
     
-    composition, shape_counts, color_counts = generate_complex_composition(
+    composition, shape_counts, color_counts, _, _ = generate_complex_composition(
         shape_dict=selected_dict,
         canvas_width=400,
         canvas_height=400,
@@ -387,7 +519,7 @@ def generate_hard_example(index, shape_dict):
     selected_shapes = random.sample(list(shape_dict.keys()), num_shapes)
     selected_dict = {name: shape_dict[name] for name in selected_shapes}
     
-    composition, shape_counts, color_counts = generate_complex_composition(
+    composition, shape_counts, color_counts, _, _ = generate_complex_composition(
         shape_dict=selected_dict,
         canvas_width=400,
         canvas_height=400,
@@ -471,38 +603,60 @@ def generate_base_shape_files(output_dir="geometric_dataset"):
         print(f"Generated base shape: {filename}")
 
 
-num_shapes_list = [2, 4, 6]
-num_instances = [2, 4, 6]
+def generate_sweep_item(item):
+    """Generate one sweep image and return its typed dataset_dump row."""
+    num_shapes, num_instances = item['sweep']
+    composition, shape_counts, color_counts, placement_counts, stats = generate_complex_composition(
+        shape_dict=shape_dictionary,
+        canvas_width=400,
+        canvas_height=400,
+        num_shapes=num_shapes,
+        max_instances=num_instances,
+        placement=item.get('placement', "rejection"),
+        use_symbols=item.get('symbols', False),
+        feasibility=item.get('feasibility', "place")
+    )
+
+    write_file(os.path.join(item['output_dir'], item['filename']), composition)
+    note = shortfall_note(placement_counts)
+    if note:
+        print(f"Generated {item['filename']}{note}")
 
-import itertools
-dir_name = "visual_discrimination/sweep/color_and_shape_disambiguation"
-if not os.path.exists(dir_name):
-    os.makedirs(dir_name)
-
-sweep_list = itertools.product(num_shapes_list, num_instances)
-csv_data = []
-idx = 0
-for sweep in sweep_list:
-    for _ in range(10):
-        num_shapes, num_instances = sweep
-        composition, shape_counts, color_counts = generate_complex_composition(
-            shape_dict=shape_dictionary,
-            canvas_width=400,
-            canvas_height=400,
-            num_shapes=num_shapes,
-            max_instances=num_instances
-        )
-
-        filename = f"{idx}.svg"
-        with open(os.path.join(dir_name, filename), 'w') as f:
-            f.write(composition)
-        idx+=1
+    return {
+            'filename': item['filename'],
+            'shape_dictionary': counts_to_records(shape_counts),
+            'color_dictionary': pair_counts_to_records(color_counts),
+            'placement': placement_to_records(placement_counts),
+            'placement_stats': stats,
+            'sweep': list(item['sweep'])
+        }
+
+
+def main(argv=None):
+    """Generate the 2D joint shape and color disambiguation sweep."""
+    parser = argparse.ArgumentParser(description="Generate the 2D joint shape and color disambiguation sweep.")
+    args = add_feasibility_argument(add_symbols_argument(add_placement_argument(add_sweep_arguments(parser)))
+                                    ).parse_args(argv)
+
+    num_shapes_list = [2, 4, 6]
+    num_instances = [2, 4, 6]
+
+    dir_name = "visual_discrimination/sweep/color_and_shape_disambiguation"
+    if not os.path.exists(dir_name):
+        os.makedirs(dir_name)
+
+    sweep_list = itertools.product(num_shapes_list, num_instances)
+    items = [
+        {'output_dir': dir_name, 'filename': f"{idx}.svg", 'sweep': sweep, 'instance': instance,
+         'placement': args.placement, 'symbols': args.svg_symbols, 'feasibility': args.feasibility}
+        for idx, (sweep, instance) in enumerate(itertools.product(sweep_list, range(10)))
+    ]
+    rows = run_resumable_sweep(generate_sweep_item, items, TASK, os.path.join(dir_name, "manifest.jsonl"),
+                               num_workers=args.num_workers, seed=args.seed, chunksize=args.chunksize,
+                               restart=args.restart, shard_dir=args.shard_dir,
+                               shard_size=args.shard_size, timings_path=args.timings)
+    write_dump(rows, dir_name, DUMP_DECODERS)
 
-        csv_data.append({
-                'filename': filename,
-                'shape_dictionary': str(shape_counts),
-                'color_dictionary': str(color_counts),
-                'sweep': sweep
-            })
 
-pd.DataFrame(csv_data).to_csv(os.path.join(dir_name, "dataset_dump.csv"), index=False)
+if __name__ == "__main__":
+    main()
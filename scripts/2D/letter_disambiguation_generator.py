@@ -5,7 +5,17 @@ import json
 import colorsys
 import string
 import itertools
-import pandas as pd
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.sink import MetadataSink
+from common.sweep import add_sweep_arguments, run_resumable_sweep
+from common.writer import write_file
+
+TASK = "2D_letter_disambiguation"
+
 def hex_to_hsv(hex_color):
     """Convert hex color to HSV."""
     # Remove '#' if present
@@ -432,12 +442,8 @@ class LetterIconGenerator:
         return svg
 
 
-# Example usage
 generator = LetterIconGenerator()
 
-# # # Generate preview of all letters
-generator.generate_preview()
-
 
 
 import random
@@ -485,43 +491,62 @@ def generate_word_svg(word_len, background_color, square_color, box_spacing):
     return word, svg
 
 
-base_dir = "visual_discrimination/sweep"
-sweep_dir = "letter_disambiguation"
-save_path = os.path.join(base_dir, sweep_dir)
-
-if not os.path.exists(save_path):
-    os.makedirs(save_path)
-
-sweep_list = itertools.product(letter_to_display, color, box_spacing)
-data = []
-idx = 0
-
-for sweep in sweep_list:
-    for i in range(5):
-        letter_display, color_choice, spacing_choice = sweep
-        generator = LetterIconGenerator()
-        background_color = random.choice(background_color_list)
-        color_map = generate_variations(base_color=background_color)
-        if color_choice == 1:
-            square_color = color_map["easy"]
-        elif color_choice == 2:
-            square_color = color_map["medium"]
-        else:
-            square_color = color_map["hard"]
-        print(square_color)
-
-        # if square_color == background_color:
-        print(square_color, background_color)
-
-
-        if letter_display == 1:
-            letter, svg = generate_letter_svg(background_color, square_color, spacing_choice)
-        else:
-            letter, svg = generate_word_svg(letter_display, background_color, square_color, spacing_choice)
-        filename = os.path.join(save_path, f'{idx}.svg')
-        with open(filename, 'w') as f:
-            f.write(svg)
-
-        data.append({"filename": f'{idx}.svg', "answer": letter, "sweep": sweep})
-        idx+=1
-pd.DataFrame(data).to_csv(os.path.join(save_path, "dataset_info.csv"), index=False)
+def generate_sweep_item(item):
+    """Generate one sweep image and return its dataset_info.csv row."""
+    letter_display, color_choice, spacing_choice = item['sweep']
+    background_color = random.choice(background_color_list)
+    color_map = generate_variations(base_color=background_color)
+    if color_choice == 1:
+        square_color = color_map["easy"]
+    elif color_choice == 2:
+        square_color = color_map["medium"]
+    else:
+        square_color = color_map["hard"]
+    print(square_color)
+
+    # if square_color == background_color:
+    print(square_color, background_color)
+
+
+    if letter_display == 1:
+        letter, svg = generate_letter_svg(background_color, square_color, spacing_choice)
+    else:
+        letter, svg = generate_word_svg(letter_display, background_color, square_color, spacing_choice)
+    write_file(os.path.join(item['output_dir'], item['filename']), svg)
+
+    return {"filename": item['filename'], "answer": letter, "sweep": item['sweep']}
+
+
+def main(argv=None):
+    """Generate the 2D letter disambiguation sweep."""
+    parser = argparse.ArgumentParser(description="Generate the 2D letter disambiguation sweep.")
+    parser.add_argument("--no-preview", action="store_true",
+                        help="Skip writing alphabet_preview.svg")
+    args = add_sweep_arguments(parser).parse_args(argv)
+
+    # Generate preview of all letters
+    if not args.no_preview:
+        generator.generate_preview()
+
+    base_dir = "visual_discrimination/sweep"
+    sweep_dir = "letter_disambiguation"
+    save_path = os.path.join(base_dir, sweep_dir)
+
+    if not os.path.exists(save_path):
+        os.makedirs(save_path)
+
+    sweep_list = itertools.product(letter_to_display, color, box_spacing)
+    items = [
+        {"output_dir": save_path, "filename": f'{idx}.svg', "sweep": sweep, "instance": instance}
+        for idx, (sweep, instance) in enumerate(itertools.product(sweep_list, range(5)))
+    ]
+    rows = run_resumable_sweep(generate_sweep_item, items, TASK, os.path.join(save_path, "manifest.jsonl"),
+                               num_workers=args.num_workers, seed=args.seed, chunksize=args.chunksize,
+                               restart=args.restart, shard_dir=args.shard_dir,
+                               shard_size=args.shard_size, timings_path=args.timings)
+    with MetadataSink(os.path.join(save_path, "dataset_info.csv")) as sink:
+        sink.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
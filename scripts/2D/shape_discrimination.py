@@ -1,7 +1,6 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
-import svgwrite
 import random
 import math
 from collections import defaultdict
@@ -10,14 +9,89 @@ import csv
 import os
 from collections import defaultdict
 import itertools
-import pandas as pd
+import argparse
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.columns import (counts_from_records, counts_to_records, placement_from_records,
+                            placement_to_records, write_dump)
+from common.placement import (MAX_FILL, FreeSpaceSampler, add_feasibility_argument, add_placement_argument,
+                              fit_scale, placement_stats, shortfall_note)
+from common.spatial import PlacedPolygons, sat_overlap
+from common.svg import Drawing, add_symbols_argument, symbol_id
+from common.sweep import add_sweep_arguments, run_resumable_sweep
+from common.timing import stage
+from common.writer import write_file
+
+TASK = "2D_shape_discrimination"
+
+# How the typed dataset_dump columns read back as the objects shown in dataset_dump.csv
+DUMP_DECODERS = {"shape_dictionary": counts_from_records, "placement": placement_from_records, "sweep": tuple}
+
 shape_types = ['circle', 'rectangle', 'triangle', 'hexagon', 
                 'star', 'pentagon', 'octagon']
 
+def points_to_path(points):
+    """SVG path data of a closed polygon, coordinates to one decimal."""
+    if not points:
+        return ""
+    path = f"M{points[0][0]:.1f},{points[0][1]:.1f}"
+    for x, y in points[1:]:
+        path += f" L{x:.1f},{y:.1f}"
+    path += " Z"
+    return path
+
+def polar_points(count, radius, offset, radius_of=None):
+    """
+    `count` points evenly spaced in angle around the origin, starting at angle `offset`, at
+    `radius` or at radius_of(i) for point i.
+    """
+    points = []
+    for i in range(count):
+        angle = 2 * math.pi * i / count + offset
+        r = radius if radius_of is None else radius_of(i)
+        points.append((math.cos(angle) * r, math.sin(angle) * r))
+    return points
+
+class ShapeTemplate:
+    def __init__(self, shape_type, path, footprint=(-30, -30, 60, 60)):
+        """
+        Unit-scale geometry of one shape type, centered on the origin.
+
+        Args:
+            shape_type: Shape type name
+            path: SVG path data of the outline
+            footprint: (x, y, width, height) box that placement keeps apart, the generic 60x60 box
+                that min_distance_inwards is measured from
+        """
+        self.type = shape_type
+        self.path = path
+        self.footprint = footprint
+
+def _build_templates():
+    """Build the template of every shape type, once at import."""
+    star = polar_points(10, 30, -math.pi / 2, lambda i: 30 if i % 2 == 0 else 15)
+    pentagon = polar_points(5, 30, -math.pi / 2)
+    octagon = polar_points(8, 30, -math.pi / 8)
+    templates = [
+        ShapeTemplate('circle', "M0,0 m-30,0 a30,30 0 1,0 60,0 a30,30 0 1,0 -60,0"),
+        ShapeTemplate('rectangle', "M-30,-20 h60 v40 h-60 Z"),
+        ShapeTemplate('triangle', "M0,-30 L30,30 L-30,30 Z"),
+        ShapeTemplate('hexagon', "M30,0 L15,-26 L-15,-26 L-30,0 L-15,26 L15,26 Z"),
+        ShapeTemplate('star', points_to_path(star)),
+        ShapeTemplate('pentagon', points_to_path(pentagon)),
+        ShapeTemplate('octagon', points_to_path(octagon)),
+    ]
+    return {template.type: template for template in templates}
+
+# Geometry of every shape type, shared by all instances and concentric rings
+SHAPE_TEMPLATES = _build_templates()
+
 class Shape:
     def __init__(self, shape_type, base_path=None):
         self.type = shape_type
         self.base_path = base_path
+        self.template = SHAPE_TEMPLATES.get(shape_type)
         self.center = (0, 0)
         self.scale = 1.0
         self.rotation = 0
@@ -26,62 +100,14 @@ class Shape:
         self.fill = 'none'
 
     def get_path_data(self):
-        if self.type == 'circle':
-            return f"M0,0 m-30,0 a30,30 0 1,0 60,0 a30,30 0 1,0 -60,0"
-        elif self.type == 'rectangle':
-            return "M-30,-20 h60 v40 h-60 Z"
-        elif self.type == 'triangle':
-            return "M0,-30 L30,30 L-30,30 Z"
-        elif self.type == 'hexagon':
-            return "M30,0 L15,-26 L-15,-26 L-30,0 L-15,26 L15,26 Z"
-        elif self.type == 'star':
-            points = []
-            points_count = 5
-            outer_radius = 30
-            inner_radius = 15
-            for i in range(points_count * 2):
-                angle = math.pi * i / points_count - math.pi / 2
-                radius = outer_radius if i % 2 == 0 else inner_radius
-                x = math.cos(angle) * radius
-                y = math.sin(angle) * radius
-                points.append((x, y))
-            return self._points_to_path(points)
-        elif self.type == 'pentagon':
-            points = []
-            for i in range(5):
-                angle = 2 * math.pi * i / 5 - math.pi / 2
-                x = math.cos(angle) * 30
-                y = math.sin(angle) * 30
-                points.append((x, y))
-            return self._points_to_path(points)
-        elif self.type == 'octagon':
-            points = []
-            for i in range(8):
-                angle = 2 * math.pi * i / 8 - math.pi / 8
-                x = math.cos(angle) * 30
-                y = math.sin(angle) * 30
-                points.append((x, y))
-            return self._points_to_path(points)
+        if self.template is not None:
+            return self.template.path
         return self.base_path
 
-    def _points_to_path(self, points):
-        if not points:
-            return ""
-        path = f"M{points[0][0]:.1f},{points[0][1]:.1f}"
-        for x, y in points[1:]:
-            path += f" L{x:.1f},{y:.1f}"
-        path += " Z"
-        return path
-
     def get_bounding_box(self):
         """Calculate bounding box after transformations."""
-        base_size = 60  # Base size for all shapes
-        if self.type == 'circle':
-            radius = 30 * self.scale
-            return (-radius, -radius, radius * 2, radius * 2)
-        else:
-            return (-base_size/2 * self.scale, -base_size/2 * self.scale,
-                   base_size * self.scale, base_size * self.scale)
+        x, y, width, height = self.template.footprint if self.template is not None else (-30, -30, 60, 60)
+        return (x * self.scale, y * self.scale, width * self.scale, height * self.scale)
 
     def get_transformed_corners(self):
         """Get corners of bounding box after rotation."""
@@ -109,44 +135,64 @@ def check_overlap(shape1, shape2, min_distance_inwards):
     #  this to negative will allow the shapes to overlap in a controlled manner.
 
     """Check if two shapes overlap using Separating Axis Theorem (SAT)."""
-    corners1 = shape1.get_transformed_corners()
-    corners2 = shape2.get_transformed_corners()
-
-    def get_axes(corners):
-        axes = []
-        for i in range(len(corners)):
-            p1 = corners[i]
-            p2 = corners[(i + 1) % len(corners)]
-            edge = (p2[0] - p1[0], p2[1] - p1[1])
-            normal = (-edge[1], edge[0])
-            length = math.sqrt(normal[0]**2 + normal[1]**2)
-            if length > 0:
-                axes.append((normal[0]/length, normal[1]/length))
-        return axes
-
-    def project(corners, axis):
-        dots = [axis[0] * x + axis[1] * y for x, y in corners]
-        return min(dots), max(dots)
-
-    axes = get_axes(corners1) + get_axes(corners2)
-
-    for axis in axes:
-        p1_min, p1_max = project(corners1, axis)
-        p2_min, p2_max = project(corners2, axis)
-        # out of all the axes, there exists atleast one axis where the projection between all the points of polygon 1 do not overalp with projections of polygon 2
-        if p1_min > p2_max + min_distance_inwards  or p2_min  > p1_max + min_distance_inwards :
-            return False
-    # if the if condition is never triggered, it means that there is an overlap and the function returns True
-    return True
+    return sat_overlap(shape1.get_transformed_corners(), shape2.get_transformed_corners(), min_distance_inwards)
+
+def random_pose(shape_type, canvas_width, canvas_height, min_scale, max_scale, sampler=None):
+    """
+    Draw a random scale, rotation and position for a shape, keeping it inside the canvas. With a
+    FreeSpaceSampler the position is drawn from its free cells instead of the whole canvas.
+    """
+    shape = Shape(shape_type)
+    shape.scale = random.uniform(min_scale, max_scale)
+    shape.rotation = random.uniform(0, 360)
+
+    # Calculate safe boundaries for placement
+    bbox = shape.get_bounding_box()
+    max_dim = max(abs(bbox[2]), abs(bbox[3])) * 1.2  # Add 20% padding
+
+    if sampler is None:
+        x = random.uniform(max_dim, canvas_width - max_dim)
+        y = random.uniform(max_dim, canvas_height - max_dim)
+        shape.center = (x, y)
+    else:
+        shape.center = sampler.sample(max_dim, max_dim, canvas_width - max_dim, canvas_height - max_dim)
+    return shape
+
 
 def generate_complex_composition(canvas_width=800, canvas_height=600, 
                     num_shapes=None, max_instances=5,
                     max_concentric=3, concentric_probability=0.6,
                     min_scale=0.8, max_scale=2.0,
-                    max_placement_attempts=50, min_distance_inwards=4):
-    """Generate a pattern of shapes with overlap prevention."""
-    
-    dwg = svgwrite.Drawing(size=(canvas_width, canvas_height))
+                    max_placement_attempts=50, min_distance_inwards=4,
+                    candidates_per_round=32, placement="rejection", use_symbols=False,
+                    feasibility="place"):
+    """
+    Generate a pattern of shapes with overlap prevention.
+
+    Returns the SVG, the number of shapes drawn of each type (rings included),
+    {shape type: (requested instances, placed instances)} and the common.placement.placement_stats
+    of the composition; instances that found no free spot within max_placement_attempts are left
+    out.
+
+    Each placement round draws a batch of poses and tests them all at once against the nearby
+    shapes, keeping the first that fits. Rounds start with one pose and grow fourfold up to
+    `candidates_per_round` while they fail, so crowded areas are searched in large batches. The
+    random stream is then rewound to just after the chosen pose, so a seed gives the same
+    composition as trying one pose at a time.
+
+    With placement="free_space" candidate centers are drawn by a common.placement.FreeSpaceSampler,
+    which leaves out the space around placed shapes where any shape would overlap them, and the
+    instances still unplaced when no free space is left are given up at once.
+
+    With use_symbols the outline of each selected shape type is written once in <defs> and every
+    shape and ring is a <use> of it (see common.svg).
+
+    The fill estimate counts each instance as its rotated 60x60 footprint grown by half of
+    min_distance_inwards on every side, at the expected scale and instance count. When it is above
+    common.placement.MAX_FILL, feasibility="abort" gives up the remaining instances once one fails
+    and feasibility="rescale" shrinks min_scale and max_scale to fit.
+    """
+    dwg = Drawing(size=(canvas_width, canvas_height))
     dwg.add(dwg.rect(insert=(0, 0), size=('100%', '100%'), fill='white'))
     
 
@@ -154,69 +200,105 @@ def generate_complex_composition(canvas_width=800, canvas_height=600,
         num_shapes = random.randint(1, len(shape_types))
     
     selected_shapes = random.sample(shape_types, num_shapes)
-    placed_shapes = []
+    if use_symbols:
+        for shape_type in selected_shapes:
+            # Every shape has the default paint, so it goes on the definition
+            template = Shape(shape_type)
+            dwg.defs.add(dwg.path(d=template.get_path_data(), id=symbol_id(shape_type),
+                                  fill=template.fill, stroke=template.stroke_color))
+
+    mean_scale = (min_scale + max_scale) / 2
+    scale_variance = (max_scale - min_scale) ** 2 / 12
+    expected_instances = len(selected_shapes) * (1 + max_instances) / 2
+
+    def fill_at(factor):
+        side = max(0.0, 60 * factor * mean_scale + min_distance_inwards)
+        area = side ** 2 + 3600 * factor ** 2 * scale_variance
+        return expected_instances * area / (canvas_width * canvas_height)
+
+    fill = fill_at(1.0)
+    scale_factor = fit_scale(fill_at) if feasibility == "rescale" else 1.0
+    min_scale, max_scale = min_scale * scale_factor, max_scale * scale_factor
+    stats = placement_stats(fill, scale_factor)
+    give_up_when_full = feasibility == "abort" and fill > MAX_FILL
+    full = False
+    # Broadphase cells the size of the largest rotated shape
+    placed_shapes = PlacedPolygons(60 * max_scale * math.sqrt(2))
+    # Two shapes the SAT test calls overlapping have bounding boxes less than sqrt(2) *
+    # min_distance_inwards apart, so queries grow the candidate's box by a bit more than that
+    reach = max(0, min_distance_inwards) * math.sqrt(2) + 1
     shape_counts = defaultdict(int)
+    placement_counts = {}
+    sampler = None
+    if placement == "free_space":
+        # Centers stay the margin of random_pose away from the edges; cells a quarter of the
+        # smallest shape's side
+        margin = 72 * min_scale
+        sampler = FreeSpaceSampler(margin, margin, canvas_width - margin, canvas_height - margin, 15 * min_scale)
     
     def add_shape_to_drawing(shape, group=None):
         """Add a shape to the SVG drawing."""
-        path = dwg.path(d=shape.get_path_data())
-        path.fill(shape.fill)
-        path.stroke(shape.stroke_color)
+        if use_symbols:
+            path = dwg.use(f"#{symbol_id(shape.type)}")
+        else:
+            path = dwg.path(d=shape.get_path_data())
+            path.fill(shape.fill)
+            path.stroke(shape.stroke_color)
         # path.stroke_width(shape.stroke_width)
         
-        transform = f"translate({shape.center[0]},{shape.center[1]}) "
-        transform += f"rotate({shape.rotation}) "
-        transform += f"scale({shape.scale})"
-        
-        path['transform'] = transform
+        # The transform helpers write the numbers with common.svg.number
+        path.translate(shape.center[0], shape.center[1])
+        path.rotate(shape.rotation)
+        path.scale(shape.scale)
         
         if group:
             group.add(path)
         else:
             dwg.add(path)
     
-    for shape_type in selected_shapes:
-        num_instances = random.randint(1, max_instances)
+    with stage("placement"):
+        for shape_type in selected_shapes:
+            num_instances = random.randint(1, max_instances)
+            placed = 0
         
-        for _ in range(num_instances):
-            base_shape = Shape(shape_type)
-            placement_success = False
-            attempts = 0
-            
-            while not placement_success and attempts < max_placement_attempts:
-                # Generate random parameters
-                scale = random.uniform(min_scale, max_scale)
-                rotation = random.uniform(0, 360)
-                
-                # Adjust base_shape properties
-                base_shape.scale = scale
-                base_shape.rotation = rotation
-                
-                # Calculate safe boundaries for placement
-                bbox = base_shape.get_bounding_box()
-                max_dim = max(abs(bbox[2]), abs(bbox[3])) * 1.2  # Add 20% padding
-                
-                # Try random position
-                x = random.uniform(max_dim, canvas_width - max_dim)
-                y = random.uniform(max_dim, canvas_height - max_dim)
-                base_shape.center = (x, y)
-                
-                # Check for overlaps
-                overlaps = False
-                for existing_shape in placed_shapes:
-                    if check_overlap(base_shape, existing_shape, min_distance_inwards):
-                        overlaps = True
-                        break
-                
-                if not overlaps:
-                    placement_success = True
-                    placed_shapes.append(base_shape)
-                    
+            for _ in range(num_instances):
+                if full or (sampler is not None and not sampler):
+                    stats['skipped'] += 1
+                    continue
+                attempts = 0
+                batch = 1
+                while attempts < max_placement_attempts:
+                    batch = min(batch, max_placement_attempts - attempts)
+                    state = random.getstate()
+                    candidates = [random_pose(shape_type, canvas_width, canvas_height, min_scale, max_scale,
+                                              sampler)
+                                  for _ in range(batch)]
+                    corners = [candidate.get_transformed_corners() for candidate in candidates]
+                    first = placed_shapes.first_free(corners, reach, min_distance_inwards)
+                    if first is None:
+                        attempts += batch
+                        batch = min(4 * batch, candidates_per_round)
+                        continue
+
+                    # Rewind to just after the chosen pose, as if the later ones had never been drawn
+                    attempts += first + 1
+                    random.setstate(state)
+                    for _ in range(first + 1):
+                        random_pose(shape_type, canvas_width, canvas_height, min_scale, max_scale, sampler)
+                    base_shape = candidates[first]
+                    placed_shapes.add(corners[first])
+                    placed += 1
+                    if sampler is not None:
+                        # Bounding boxes contain the disk of half their side, so a shape of any
+                        # scale centered this close overlaps the new one
+                        sampler.block_disk(*base_shape.center,
+                                           30 * base_shape.scale + 30 * min_scale + min_distance_inwards)
+
                     # Handle concentric patterns
                     if random.random() < concentric_probability:
                         num_rings = random.randint(2, max_concentric)
                         group = dwg.g()
-                        
+                    
                         for i in range(num_rings):
                             ring_shape = Shape(shape_type)
                             ring_shape.center = base_shape.center
@@ -224,15 +306,20 @@ def generate_complex_composition(canvas_width=800, canvas_height=600,
                             ring_shape.scale = base_shape.scale * (1 - i * 0.3)
                             add_shape_to_drawing(ring_shape, group)
                             shape_counts[shape_type] += 1
-                        
+                    
                         dwg.add(group)
                     else:
                         add_shape_to_drawing(base_shape)
                         shape_counts[shape_type] += 1
-                
-                attempts += 1
+                    break
+                else:
+                    full = give_up_when_full
+                stats['attempts'] += attempts
+            placement_counts[shape_type] = (num_instances, placed)
     
-    return dwg.tostring(), dict(shape_counts)
+    with stage("serialization"):
+        svg = dwg.tostring()
+    return svg, dict(shape_counts), placement_counts, stats
 
 
 
@@ -243,7 +330,7 @@ def generate_easy_example(index):
     # Random number of instances (1-4)
     num_instances = random.randint(1, 4)
     
-    composition, shape_counts = generate_complex_composition(
+    composition, shape_counts, _, _ = generate_complex_composition(
         canvas_width=400,
         canvas_height=400,
         num_shapes=1,
@@ -259,7 +346,7 @@ def generate_medium_example(index):
     """Generate a medium example with 2-3 shape types"""
     num_shapes = random.randint(2, len(shape_types))
     
-    composition, shape_counts = generate_complex_composition(
+    composition, shape_counts, _, _ = generate_complex_composition(
         canvas_width=400,
         canvas_height=400,
         num_shapes=num_shapes,
@@ -275,7 +362,7 @@ def generate_hard_example(index):
     # Select 3 or more shapes
     num_shapes = random.randint(5, len(shape_types))
     
-    composition, shape_counts = generate_complex_composition(
+    composition, shape_counts, _, _ = generate_complex_composition(
         canvas_width=400,
         canvas_height=400,
         num_shapes=num_shapes,
@@ -338,39 +425,58 @@ def generate_dataset(output_dir="geometric_dataset"):
     print(f"\nGenerated {len(csv_data)} examples")
     print(f"Dataset information saved to {csv_path}")
 
-if __name__ == "__main__":
+def generate_sweep_item(item):
+    """Generate one sweep image and return its typed dataset_dump row."""
+    num_shapes, num_instances, min_distance_inwards = item['sweep']
+    composition, shape_counts, placement_counts, stats = generate_complex_composition(
+        canvas_width=400,
+        canvas_height=400,
+        num_shapes=num_shapes,
+        max_instances=num_instances,
+        max_concentric=3,  # Up to two rings for concentric shapes
+        concentric_probability=0.4,
+        min_distance_inwards = min_distance_inwards,
+        placement=item.get('placement', "rejection"),
+        use_symbols=item.get('symbols', False),
+        feasibility=item.get('feasibility', "place")
+    )
+    write_file(os.path.join(item['output_dir'], item['filename']), composition)
+    print(f"Generated {item['filename']}{shortfall_note(placement_counts)}")
+    return {
+        'filename': item['filename'],
+        'shape_dictionary': counts_to_records(shape_counts),
+        'placement': placement_to_records(placement_counts),
+        'placement_stats': stats,
+        'sweep': list(item['sweep'])
+    }
+
+def main(argv=None):
+    """Generate the 2D shape discrimination sweep."""
+    parser = argparse.ArgumentParser(description="Generate the 2D shape discrimination sweep.")
+    args = add_feasibility_argument(add_symbols_argument(add_placement_argument(add_sweep_arguments(parser)))
+                                    ).parse_args(argv)
 
     min_distance_inwards_lst = [10, -20, -30, -40]
     num_shapes_lst = [3, 7]
     num_instances_lst = [3, 6, 10]
     
     sweep_lst = list(itertools.product(num_shapes_lst, num_instances_lst, min_distance_inwards_lst))
-    csv_data = []
-    if not os.path.exists("visual_discrimination/sweep/geometric_dataset"):
-        os.makedirs("visual_discrimination/sweep/geometric_dataset")
-    
-    for i, sweep in enumerate(sweep_lst):
-        for j in range(10):
-            num_shapes, num_instances, min_distance_inwards = sweep
-            composition, shape_counts = generate_complex_composition(
-                canvas_width=400,
-                canvas_height=400,
-                num_shapes=num_shapes,
-                max_instances=num_instances,
-                max_concentric=3,  # Up to two rings for concentric shapes
-                concentric_probability=0.4,
-                min_distance_inwards = min_distance_inwards
-            )
-            filename = f"sweep_{i}_{j}.svg"
-            with open(os.path.join("visual_discrimination/sweep/geometric_dataset", filename), 'w') as f:
-                f.write(composition)
-            print(f"Generated {filename}")
-            csv_data.append({
-                'filename': filename,
-                'shape_dictionary': str(shape_counts),
-                'sweep': sweep
-            })
+    output_dir = "visual_discrimination/sweep/geometric_dataset"
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
     
-    csv_path = os.path.join("visual_discrimination/sweep/geometric_dataset", 'dataset_dump.csv')
-    pd.DataFrame(csv_data).to_csv(csv_path, index=False)
+    items = [
+        {'output_dir': output_dir, 'filename': f"sweep_{i}_{j}.svg", 'sweep': sweep, 'instance': j,
+         'placement': args.placement, 'symbols': args.svg_symbols, 'feasibility': args.feasibility}
+        for i, sweep in enumerate(sweep_lst)
+        for j in range(10)
+    ]
+    rows = run_resumable_sweep(generate_sweep_item, items, TASK, os.path.join(output_dir, "manifest.jsonl"),
+                               num_workers=args.num_workers, seed=args.seed, chunksize=args.chunksize,
+                               restart=args.restart, shard_dir=args.shard_dir,
+                               shard_size=args.shard_size, timings_path=args.timings)
+    write_dump(rows, output_dir, DUMP_DECODERS)
 
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,21 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
-import matplotlib.pyplot as plt
+import io
 import itertools
 import os
-from tqdm import tqdm
-
-import matplotlib.pyplot as plt
-import numpy as np
+import sys
+import argparse
 import math
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.sink import MetadataSink
+from common.sweep import add_sweep_arguments, run_resumable_sweep
+from common.timing import stage
+from common.writer import write_file
+
+TASK = "2D_visual_closure"
+
 def define_rectangle(x=0.0, y=0.0, width=1.0, height=1.0, subdivisions=4):
     """
     Define a rectangle as a list of (x, y) vertices, subdividing each edge.
@@ -458,6 +464,8 @@ def distort_shape(vertices, max_offset=1, num_edges_to_distort=1, omit_edges=[],
 
 
 def visual_closure_fn(fname, base_vertices, visual_closure_offset, num_edges_to_distort=1, num_edges_to_remove_complete=1, num_edges_to_remove_partial=1):    
+    import matplotlib.pyplot as plt
+
     max_vertices = len(base_vertices)
     omit_partial = []
     vertex_init_list = random.sample(range(max_vertices-2), num_edges_to_remove_partial)
@@ -508,37 +516,57 @@ def visual_closure_fn(fname, base_vertices, visual_closure_offset, num_edges_to_
     
     plt.tight_layout()
     # plt.show()
-    plt.savefig(fname)
+    buf = io.BytesIO()
+    with stage("savefig"):
+        plt.savefig(buf, format=os.path.splitext(fname)[1][1:])
     plt.close()
+    write_file(fname, buf.getvalue())
     return correct_option+1
 
-shapes_list = [define_capsule, define_fine_grained_star, define_regular_hexagon, define_circle_approx, define_regular_pentagon, define_regular_rectangle, define_regular_triangle]
-visual_closure_offset_list = [0.1, 0.12, 0.14]
-num_edges_to_distort_list = [1, 3]
-num_edges_to_remove_complete_list = [1, 3]
-num_edges_to_remove_partial_list = [1, 3]
-
-
-
-sweep_list = itertools.product(shapes_list, visual_closure_offset_list, num_edges_to_distort_list, num_edges_to_remove_complete_list, num_edges_to_remove_partial_list)
-base_dir = "visual_discrimination/sweep/visual_closure"
-if not os.path.exists(base_dir):
-    os.makedirs(base_dir)
-idx = 0
-
-data = []
-for sweep in tqdm(sweep_list):
-    define_shape, visual_closure_offset, num_edges_to_distort, num_edges_to_remove_complete, num_edges_to_remove_partial = sweep
+def generate_sweep_item(item):
+    """Generate one sweep image and return its dataset_info.csv row."""
+    define_shape, visual_closure_offset, num_edges_to_distort, num_edges_to_remove_complete, num_edges_to_remove_partial = item['sweep']
     base_vertices = define_shape()
-    fname = os.path.join(base_dir, f"{idx}.png")
+    fname = os.path.join(item['output_dir'], item['filename'])
     answer = visual_closure_fn(fname, base_vertices, visual_closure_offset=visual_closure_offset, num_edges_to_distort=num_edges_to_distort, num_edges_to_remove_complete=num_edges_to_remove_complete, num_edges_to_remove_partial=num_edges_to_remove_partial)
-    data.append({
-        "filename": f"{idx}.png",
+    return {
+        "filename": item['filename'],
         "answer": answer,
         "sweep": [visual_closure_offset, num_edges_to_distort, num_edges_to_remove_complete, num_edges_to_remove_partial]
-    })
+    }
+
+
+def main(argv=None):
+    """Generate the 2D visual closure sweep."""
+    parser = argparse.ArgumentParser(description="Generate the 2D visual closure sweep.")
+    args = add_sweep_arguments(parser).parse_args(argv)
+
+    from tqdm import tqdm
+
+    shapes_list = [define_capsule, define_fine_grained_star, define_regular_hexagon, define_circle_approx, define_regular_pentagon, define_regular_rectangle, define_regular_triangle]
+    visual_closure_offset_list = [0.1, 0.12, 0.14]
+    num_edges_to_distort_list = [1, 3]
+    num_edges_to_remove_complete_list = [1, 3]
+    num_edges_to_remove_partial_list = [1, 3]
+
+
+
+    sweep_list = itertools.product(shapes_list, visual_closure_offset_list, num_edges_to_distort_list, num_edges_to_remove_complete_list, num_edges_to_remove_partial_list)
+    base_dir = "visual_discrimination/sweep/visual_closure"
+    if not os.path.exists(base_dir):
+        os.makedirs(base_dir)
+
+    items = [
+        {"output_dir": base_dir, "filename": f"{idx}.png", "sweep": sweep, "instance": 0}
+        for idx, sweep in enumerate(sweep_list)
+    ]
+    rows = run_resumable_sweep(generate_sweep_item, items, TASK, os.path.join(base_dir, "manifest.jsonl"),
+                               num_workers=args.num_workers, seed=args.seed, chunksize=args.chunksize,
+                               restart=args.restart, progress=tqdm, shard_dir=args.shard_dir,
+                               shard_size=args.shard_size, timings_path=args.timings)
+    with MetadataSink(os.path.join(base_dir, "dataset_info.csv")) as sink:
+        sink.writerows(rows)
 
-    idx += 1
 
-import pandas as pd
-pd.DataFrame(data).to_csv(os.path.join(base_dir, "dataset_info.csv") , index=False)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
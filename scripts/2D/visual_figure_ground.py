@@ -1,13 +1,22 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
-import svgwrite
+from __future__ import annotations
+
 import random
 from typing import List, Dict, Any, Tuple
 import os
-import numpy as np
-import pandas as pd
-from tqdm import tqdm 
+import sys
+import argparse
+import itertools
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.sink import MetadataSink
+from common.svg import Drawing, Element
+from common.sweep import add_sweep_arguments, run_resumable_sweep
+from common.writer import save_drawing
+
+TASK = "2D_visual_figure_ground"
 
 class VisualDiscriminationTestGenerator:
     def __init__(self, size: int = 200):
@@ -32,7 +41,7 @@ class VisualDiscriminationTestGenerator:
             'rotation': self.get_random_coord(360)
         }
     
-    def create_circle(self, dwg: svgwrite.Drawing, params: Dict[str, Any]) -> svgwrite.shapes.Circle:
+    def create_circle(self, dwg: Drawing, params: Dict[str, Any]) -> Element:
         """Create a circle shape."""
         return dwg.circle(
             center=(params['x'], params['y']),
@@ -42,7 +51,7 @@ class VisualDiscriminationTestGenerator:
             stroke_width=2
         )
     
-    def create_square(self, dwg: svgwrite.Drawing, params: Dict[str, Any]) -> svgwrite.shapes.Rect:
+    def create_square(self, dwg: Drawing, params: Dict[str, Any]) -> Element:
         """Create a square/rectangle shape."""
         width = params['size']
         height = params['size']
@@ -69,7 +78,7 @@ class VisualDiscriminationTestGenerator:
         
         return rect
     
-    def create_triangle(self, dwg: svgwrite.Drawing, params: Dict[str, Any]) -> svgwrite.shapes.Polygon:
+    def create_triangle(self, dwg: Drawing, params: Dict[str, Any]) -> Element:
         width = params['size']
         height = params['size']
         if 'aspect_ratio' in params:
@@ -102,7 +111,7 @@ class VisualDiscriminationTestGenerator:
             
         return triangle
     
-    def create_line(self, dwg: svgwrite.Drawing, params: Dict[str, Any]) -> svgwrite.shapes.Line:
+    def create_line(self, dwg: Drawing, params: Dict[str, Any]) -> Element:
         """Create a line shape."""
         line = dwg.line(
             start=(params['x'], params['y']),
@@ -132,7 +141,7 @@ class VisualDiscriminationTestGenerator:
         """Generate random coordinate within bounds."""
         return random.randint(10, max_val)
     
-    def generate_background(self, dwg: svgwrite.Drawing, density: float = 0.1) -> List[svgwrite.base.BaseElement]:
+    def generate_background(self, dwg: Drawing, density: float = 0.1) -> List[Element]:
         """
         Generate background noise elements.
         
@@ -195,7 +204,7 @@ class VisualDiscriminationTestGenerator:
                              include_background: bool = False,
                              background_density: float = 0.1) -> None:
         """Create SVG file from shape data with optional background."""
-        dwg = svgwrite.Drawing(filename, size=(f"{self.size}px", f"{self.size}px"))
+        dwg = Drawing(filename, size=(f"{self.size}px", f"{self.size}px"), precision=None)
         
         # Add background first if included
         if include_background:
@@ -218,7 +227,7 @@ class VisualDiscriminationTestGenerator:
             except Exception as e:
                 print(f"Error creating shape: {e}")
                 
-        dwg.save()
+        save_drawing(dwg)
     
 
     def generate_variations(self, base_pattern: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
@@ -325,7 +334,7 @@ class VisualDiscriminationTestGenerator:
 
     def create_test_presentation(self, shapes_data: Dict[str, List[Dict[str, Any]]], output_file: str, background_density) -> None:
         """Create a single SVG combining target and options in test presentation format."""
-        dwg = svgwrite.Drawing(output_file, size=("600px", "1000px"))
+        dwg = Drawing(output_file, size=("600px", "1000px"), precision=None)
         
         # Add white background
         dwg.add(dwg.rect(insert=(0, 0), size=('100%', '100%'), fill='white'))
@@ -407,38 +416,51 @@ class VisualDiscriminationTestGenerator:
             
             dwg.add(option_group)
         
-        dwg.save()
+        save_drawing(dwg)
         return correct_option
 
 
-import itertools
+def generate_sweep_item(item):
+    """Generate one sweep image and return its dataset_info.csv row."""
+    num_shapes, background_density = item['sweep']
+    generator = VisualDiscriminationTestGenerator()
+    response = generator.generate_complete_test_item(num_shapes, os.path.join(item['output_dir'], item['filename']), background_density)
+    return {
+        'filename': item['filename'],
+        'answer': response['correct_answer'],
+        'background_density': background_density,
+        "sweep": item['sweep']
+    }
 
-num_shapes_list = [2, 6, 10]
-background_density_list = [0.1, 0.3, 0.5]
 
-sweep_list = itertools.product(num_shapes_list, background_density_list)
+def main(argv=None):
+    """Generate the 2D visual figure-ground sweep."""
+    parser = argparse.ArgumentParser(description="Generate the 2D visual figure-ground sweep.")
+    args = add_sweep_arguments(parser).parse_args(argv)
 
-base_dir = "visual_discrimination/sweep/visual_figure_ground"
+    from tqdm import tqdm
+
+    num_shapes_list = [2, 6, 10]
+    background_density_list = [0.1, 0.3, 0.5]
+
+    sweep_list = itertools.product(num_shapes_list, background_density_list)
+
+    base_dir = "visual_discrimination/sweep/visual_figure_ground"
+
+    if not os.path.exists(base_dir):
+        os.makedirs(base_dir)
+    items = [
+        {'output_dir': base_dir, 'filename': f"{idx}.svg", 'sweep': sweep, 'instance': instance}
+        for idx, (sweep, instance) in enumerate(itertools.product(sweep_list, range(10)))
+    ]
+    rows = run_resumable_sweep(generate_sweep_item, items, TASK, os.path.join(base_dir, "manifest.jsonl"),
+                               num_workers=args.num_workers, seed=args.seed, chunksize=args.chunksize,
+                               restart=args.restart, progress=tqdm, shard_dir=args.shard_dir,
+                               shard_size=args.shard_size, timings_path=args.timings)
+    # Save metadata to CSV
+    with MetadataSink(os.path.join(base_dir, 'dataset_info.csv')) as sink:
+        sink.writerows(rows)
 
-if not os.path.exists(base_dir):
-    os.makedirs(base_dir)
-idx = 0
-data = []
-for sweep in sweep_list:
-    num_shapes, background_density = sweep
-    generator = VisualDiscriminationTestGenerator()
-    for i in tqdm(range(10)):
-        fname = f"{idx}.svg"
-        response = generator.generate_complete_test_item(num_shapes, os.path.join(base_dir, fname), background_density)
-        answer = response['correct_answer']
-        data.append({
-            'filename': fname,
-            'answer': answer,
-            'background_density': background_density,
-            "sweep": sweep
-        })
-        idx += 1
-# Save metadata to CSV
-df = pd.DataFrame(data)
-df.to_csv(os.path.join(base_dir, 'dataset_info.csv'), index=False)
 
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,22 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
-import svgwrite
+from __future__ import annotations
+
 import random
 from typing import List, Dict, Any
 import os
-import pandas as pd
+import sys
+import argparse
+import itertools
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.sink import MetadataSink
+from common.svg import Drawing, Element
+from common.sweep import add_sweep_arguments, run_resumable_sweep
+from common.writer import save_drawing
+
+TASK = "2D_visual_form_constancy"
 
 
 
@@ -32,7 +43,7 @@ class VisualDiscriminationTestGenerator:
                 'rotation': self.get_random_coord(360)
             }
     
-    def create_circle(self, dwg: svgwrite.Drawing, params: Dict[str, Any]) -> svgwrite.shapes.Circle:
+    def create_circle(self, dwg: Drawing, params: Dict[str, Any]) -> Element:
         """Create a circle shape."""
         return dwg.circle(
             center=(params['x'], params['y']),
@@ -42,7 +53,7 @@ class VisualDiscriminationTestGenerator:
             stroke_width=2
         )
     
-    def create_square(self, dwg: svgwrite.Drawing, params: Dict[str, Any]) -> svgwrite.shapes.Rect:
+    def create_square(self, dwg: Drawing, params: Dict[str, Any]) -> Element:
         """Create a square/rectangle shape."""
         # Apply aspect ratio modification if specified
         width = params['size']
@@ -70,7 +81,7 @@ class VisualDiscriminationTestGenerator:
         
         return rect
     
-    def create_triangle(self, dwg: svgwrite.Drawing, params: Dict[str, Any]) -> svgwrite.shapes.Polygon:
+    def create_triangle(self, dwg: Drawing, params: Dict[str, Any]) -> Element:
         """Create a triangle shape with possible modifications."""
         # Calculate base size with aspect ratio if specified
         width = params['size']
@@ -105,7 +116,7 @@ class VisualDiscriminationTestGenerator:
             
         return triangle
     
-    def create_line(self, dwg: svgwrite.Drawing, params: Dict[str, Any]) -> svgwrite.shapes.Line:
+    def create_line(self, dwg: Drawing, params: Dict[str, Any]) -> Element:
         """Create a line shape."""
         line = dwg.line(
             start=(params['x'], params['y']),
@@ -135,7 +146,7 @@ class VisualDiscriminationTestGenerator:
     
     def create_svg_from_shapes(self, shapes_data: List[Dict[str, Any]], filename: str) -> None:
         """Create SVG file from shape data."""
-        dwg = svgwrite.Drawing(filename, size=(f"{self.size}px", f"{self.size}px"))
+        dwg = Drawing(filename, size=(f"{self.size}px", f"{self.size}px"), precision=None)
         
         for params in shapes_data:
             shape_type = params['shape_type']
@@ -152,7 +163,7 @@ class VisualDiscriminationTestGenerator:
             except Exception as e:
                 print(e)
                 # print("fail", params)    
-        dwg.save()
+        save_drawing(dwg)
     
     def generate_variations(self, base_pattern: List[Dict[str, Any]], sweep) -> List[List[Dict[str, Any]]]:
 
@@ -232,7 +243,7 @@ class VisualDiscriminationTestGenerator:
                 output_file: Path to save the combined SVG
             """
             # Create larger SVG for the complete test item
-            dwg = svgwrite.Drawing(output_file, size=("600px", "1000px"))
+            dwg = Drawing(output_file, size=("600px", "1000px"), precision=None)
                 # Add white background
             dwg.add(dwg.rect(insert=(0, 0), size=('100%', '100%'), fill='white'))
             
@@ -304,7 +315,7 @@ class VisualDiscriminationTestGenerator:
                 
                 dwg.add(option_group)
             
-            dwg.save()
+            save_drawing(dwg)
 
     def generate_complete_test_item(self, sweep, output_file: str = "test_item.svg") -> Dict[str, Any]:
         """
@@ -341,32 +352,44 @@ class VisualDiscriminationTestGenerator:
         # }
         return correct_option+1
 
-rotation_list = [5, 25, 50]
-aspect_ratio_list = [0.8, 1.1, 1.4]
-size_list = [0.8, 1.1, 1.4]
-shape_change = [0, 1]
+def generate_sweep_item(item):
+    """Generate one sweep image and return its dataset_info.csv row."""
+    generator = VisualDiscriminationTestGenerator()
+    answer = generator.generate_complete_test_item(output_file=os.path.join(item['output_dir'], item['filename']), sweep=item['sweep'])
+    return {
+        'filename': item['filename'],
+        'answer': answer,
+        'sweep': item['sweep']
+    }
 
 
-import itertools
-sweep_list = itertools.product(rotation_list, aspect_ratio_list, size_list, shape_change)
+def main(argv=None):
+    """Generate the 2D visual form constancy sweep."""
+    parser = argparse.ArgumentParser(description="Generate the 2D visual form constancy sweep.")
+    args = add_sweep_arguments(parser).parse_args(argv)
+
+    rotation_list = [5, 25, 50]
+    aspect_ratio_list = [0.8, 1.1, 1.4]
+    size_list = [0.8, 1.1, 1.4]
+    shape_change = [0, 1]
+
+    sweep_list = itertools.product(rotation_list, aspect_ratio_list, size_list, shape_change)
 
+    base_dir = "visual_discrimination/sweep/visual_form_constancy"
+    if not os.path.exists(base_dir):
+        os.makedirs(base_dir)
 
-generator = VisualDiscriminationTestGenerator()
-idx = 0
-base_dir = "visual_discrimination/sweep/visual_form_constancy"
-if not os.path.exists(base_dir):
-    os.makedirs(base_dir)
+    items = [
+        {'output_dir': base_dir, 'filename': f"{idx}.svg", 'sweep': sweep, 'instance': instance}
+        for idx, (sweep, instance) in enumerate(itertools.product(sweep_list, range(5)))
+    ]
+    rows = run_resumable_sweep(generate_sweep_item, items, TASK, os.path.join(base_dir, "manifest.jsonl"),
+                               num_workers=args.num_workers, seed=args.seed, chunksize=args.chunksize,
+                               restart=args.restart, shard_dir=args.shard_dir,
+                               shard_size=args.shard_size, timings_path=args.timings)
+    with MetadataSink(os.path.join(base_dir, "dataset_info.csv")) as sink:
+        sink.writerows(rows)
 
-data = []
-for sweep in sweep_list:
-    for _ in range(5):
-        fname = f"{idx}.svg"
-        answer = generator.generate_complete_test_item(output_file=os.path.join(base_dir, fname), sweep=sweep)
-        data.append({
-            'filename': fname,
-            'answer': answer,
-            'sweep': sweep
-        })
-        idx+=1
 
-pd.DataFrame(data).to_csv(os.path.join(base_dir, "dataset_info.csv"), index=False)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
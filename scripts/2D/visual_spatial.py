@@ -2,15 +2,43 @@
 # Licensed under the MIT license.
 
 import random
+import io
+import math
 import os
-import pandas as pd
+import sys
+import argparse
+import itertools
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.columns import grids_from_records, write_dump
+from common.grids import FILLS, SHAPES, GridSet, records_arrow_type
+from common.timing import stage
+from common.svg import XLINK_NAMESPACE, add_symbols_argument, symbol_id, symbol_use
+from common.sweep import add_sweep_arguments, item_outputs, run_resumable_sweep
+from common.writer import write_file
 
-import random
+TASK = "2D_visual_spatial"
 
-import random
+# How the typed dataset_dump columns read back as the objects shown in dataset_dump.csv
+DUMP_DECODERS = {"spatial_dict": grids_from_records, "sweep": tuple}
 
-def generate_multiple_grids(k=3, rows=4, cols=4, cell_size=50, padding=10, grid_spacing=30, boundary_padding=20):
+# Sweep lists of --large-grids
+LARGE_GRID_SIDES = [32, 64, 128]
+LARGE_GRID_COUNTS = [10, 16]
+
+
+def cell_symbols(cell_size):
+    """<defs> block with the outlined square, circle and triangle of a cell at the origin, for use_symbols."""
+    half = cell_size/2
+    return f'''    <defs>
+        <rect id="{symbol_id('square')}" width="{cell_size}" height="{cell_size}" stroke="black" stroke-width="2"/>
+        <circle id="{symbol_id('circle')}" cx="{half}" cy="{half}" r="{half}" stroke="black" stroke-width="2"/>
+        <polygon id="{symbol_id('triangle')}" points="{half},0 0,{cell_size} {cell_size},{cell_size}" stroke="black" stroke-width="2"/>
+    </defs>
+'''
+
+def generate_multiple_grids(k=3, rows=4, cols=4, cell_size=50, padding=10, grid_spacing=30, boundary_padding=20,
+                            use_symbols=False):
     """
     Generate K grids in a horizontal layout within a single SVG.
     
@@ -22,9 +50,10 @@ def generate_multiple_grids(k=3, rows=4, cols=4, cell_size=50, padding=10, grid_
         padding (int): Padding between cells
         grid_spacing (int): Spacing between grids
         boundary_padding (int): Padding at the left and right edges of the SVG
+        use_symbols (bool): Define the three cell shapes once in <defs> and draw the cells as <use>
     
     Returns:
-        tuple: (svg_content, list_of_spatial_dicts)
+        tuple: (svg_content, common.grids.GridSet of the k grids)
     """
     # 1. Calculate dimensions
     single_grid_width = cols * (cell_size + padding)
@@ -32,19 +61,23 @@ def generate_multiple_grids(k=3, rows=4, cols=4, cell_size=50, padding=10, grid_
     total_width = k * single_grid_width + (k-1) * grid_spacing + 2 * boundary_padding  # Add padding to both sides
     
     # 2. Initialize SVG
+    namespaces = f' {XLINK_NAMESPACE}' if use_symbols else ""
     svg_content = f'''<?xml version="1.0" encoding="UTF-8" standalone="no"?>
-<svg width="{total_width}" height="{single_grid_height}" xmlns="http://www.w3.org/2000/svg">
+<svg width="{total_width}" height="{single_grid_height}" xmlns="http://www.w3.org/2000/svg"{namespaces}>
     <!-- White background -->
     <rect width="{total_width}" height="{single_grid_height}" fill="white"/>
 '''
+    if use_symbols:
+        svg_content += cell_symbols(cell_size)
     
-    # 3. Initialize list to store spatial dictionaries
-    spatial_dicts = []
+    # 3. Initialize the shape and fill codes of the cells
+    grids = GridSet.empty(k, rows, cols)
     
     # 4. Generate each grid
     for grid_num in range(k):
-        # Initialize spatial dictionary for this grid
-        current_spatial_dict = {}
+        # Shape and fill codes of this grid's cells, row by row
+        shape_codes = []
+        fill_codes = []
         
         # Calculate grid offset (include boundary padding)
         grid_offset_x = boundary_padding + grid_num * (single_grid_width + grid_spacing)
@@ -63,14 +96,17 @@ def generate_multiple_grids(k=3, rows=4, cols=4, cell_size=50, padding=10, grid_
                 y = row * (cell_size + padding)
                 
                 # Generate random shape and fill
-                shape = random.choice(['square', 'circle', 'triangle'])
-                fill = random.choice(['white', 'black'])
-                
-                # Store in spatial dictionary
-                current_spatial_dict[(row, col)] = (shape, fill)
+                shape_code = random.randrange(len(SHAPES))
+                fill_code = random.randrange(len(FILLS))
+                shape = SHAPES[shape_code]
+                fill = FILLS[fill_code]
+                shape_codes.append(shape_code)
+                fill_codes.append(fill_code)
                 
                 # Generate SVG element based on shape
-                if shape == 'square':
+                if use_symbols:
+                    svg_content += "    " + symbol_use(shape, f"translate({x} {y})", fill=fill) + "\n"
+                elif shape == 'square':
                     svg_content += f'''    <rect x="{x}" y="{y}" 
                         width="{cell_size}" height="{cell_size}" 
                         fill="{fill}" stroke="black" stroke-width="2"/>
@@ -88,41 +124,155 @@ def generate_multiple_grids(k=3, rows=4, cols=4, cell_size=50, padding=10, grid_
                         fill="{fill}" stroke="black" stroke-width="2"/>
 '''
         
-        # Add current grid's spatial dictionary to list
-        spatial_dicts.append(current_spatial_dict)
+        grids.shapes[grid_num].flat = shape_codes
+        grids.fills[grid_num].flat = fill_codes
     
     # 5. Close SVG
     svg_content += '</svg>'
     
-    # 6. Save to file (optional)
-    with open('multiple_grids.svg', 'w') as f:
-        f.write(svg_content)
-    
-    return svg_content, spatial_dicts
+    return svg_content, grids
 
-rows_list = [3, 6, 9]
-cols_list = [3, 6, 9]
-num_grids_list = [1, 3, 5]
+def large_cell_symbols(cell_size):
+    """<defs> block with one filled and outlined symbol per shape and fill, for write_large_grids."""
+    half = cell_size/2
+    outlines = {
+        'square': f'<rect width="{cell_size}" height="{cell_size}"',
+        'circle': f'<circle cx="{half}" cy="{half}" r="{half}"',
+        'triangle': f'<polygon points="{half},0 0,{cell_size} {cell_size},{cell_size}"',
+    }
+    symbols = "".join(f'{outlines[shape]} id="{symbol_id(f"{shape}-{fill}")}" fill="{fill}" stroke="black" stroke-width="1"/>'
+                      for shape in SHAPES for fill in FILLS)
+    return f"<defs>{symbols}</defs>\n"
 
-import itertools
+def write_large_grids(out, k=10, rows=64, cols=64, cell_size=10, padding=1, grid_spacing=20, boundary_padding=20):
+    """
+    Draw K grids of random cells to a text file object, for grids too large for generate_multiple_grids.
 
-sweep_list = itertools.product(rows_list, cols_list, num_grids_list)
+    The grids are tiled in reading order, ceil(sqrt(K)) to a row. Each (shape, fill) pair is one
+    symbol in <defs>; a cell is a <use> of its symbol with only its x offset, inside a <g> per grid
+    row, so the cell texts are formatted once per image and every row is written with a single
+    out.write. Cells are drawn with NumPy from a generator seeded by `random`, so a seed gives the
+    same image, but not the same cells as generate_multiple_grids.
 
-idx = 0
-data = []
+    Args:
+        out: Text file object, e.g. io.StringIO
+        k (int): Number of grids to generate
+        rows (int): Number of rows in each grid
+        cols (int): Number of columns in each grid
+        cell_size (int): Size of each cell
+        padding (int): Padding between cells
+        grid_spacing (int): Spacing between grids
+        boundary_padding (int): Padding around the tiled grids
 
-base_dir = "visual_discrimination/sweep/visual_spatial"
-if not os.path.exists(base_dir):
-    os.makedirs(base_dir)
-    
-for sweep in sweep_list:
-    for _ in range(10):
-        fname = f"{idx}.svg"
-        rows, cols, num_grids = sweep
-        svg, dict = generate_multiple_grids(k=num_grids, rows=rows, cols=cols, cell_size=50, padding=5, grid_spacing=50)
-        with open(os.path.join(base_dir, fname), 'w') as f:
-            f.write(svg)
-        data.append({"name": fname, "spatial_dict": dict, "sweep": sweep})
-        idx += 1
-df = pd.DataFrame(data)
-df.to_csv(os.path.join(base_dir, "dataset_dump.csv"), index=False)
+    Returns:
+        common.grids.GridSet of the k grids
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(random.getrandbits(64))
+    grids = GridSet(rng.integers(len(SHAPES), size=(k, rows, cols), dtype=np.uint8),
+                    rng.integers(len(FILLS), size=(k, rows, cols), dtype=np.uint8))
+    # Symbol of each cell, shape code * len(FILLS) + fill code
+    symbols = grids.shapes * len(FILLS) + grids.fills
+
+    pitch = cell_size + padding
+    grid_width, grid_height = cols * pitch, rows * pitch
+    per_row = math.ceil(math.sqrt(k))
+    total_width = per_row * grid_width + (per_row - 1) * grid_spacing + 2 * boundary_padding
+    total_height = (math.ceil(k / per_row) * (grid_height + grid_spacing) - grid_spacing + 2 * boundary_padding)
+
+    out.write(f'<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n'
+              f'<svg width="{total_width}" height="{total_height}" xmlns="http://www.w3.org/2000/svg" {XLINK_NAMESPACE}>\n'
+              f'<rect width="{total_width}" height="{total_height}" fill="white"/>\n')
+    out.write(large_cell_symbols(cell_size))
+    # cell_texts[symbol][col]: the <use> of a cell in column col of any grid row
+    cell_texts = [[f'<use xlink:href="#{symbol_id(f"{shape}-{fill}")}" x="{col * pitch}"/>' for col in range(cols)]
+                  for shape in SHAPES for fill in FILLS]
+
+    for grid_num in range(k):
+        x = boundary_padding + (grid_num % per_row) * (grid_width + grid_spacing)
+        y = boundary_padding + (grid_num // per_row) * (grid_height + grid_spacing)
+        out.write(f'<rect x="{x}" y="{y}" width="{grid_width}" height="{grid_height}" '
+                  f'fill="none" stroke="black" stroke-width="2"/>\n')
+        for row, row_symbols in enumerate(symbols[grid_num].tolist()):
+            cells = "".join([cell_texts[symbol][col] for col, symbol in enumerate(row_symbols)])
+            out.write(f'<g transform="translate({x} {y + row * pitch})">{cells}</g>\n')
+    out.write('</svg>')
+    return grids
+
+def npz_name(item):
+    """File name of the grids .npz written next to an item's image."""
+    return os.path.splitext(item['filename'])[0] + ".npz"
+
+
+def sweep_item_outputs(item):
+    """Output files of a sweep item: the image, and its grids .npz when one is written."""
+    paths = item_outputs(item)
+    if item.get('grids_npz', False) or item.get('large_grids', False):
+        paths.append(os.path.join(item['output_dir'], npz_name(item)))
+    return paths
+
+
+def generate_sweep_item(item):
+    """
+    Generate one sweep image and return its typed dataset_dump row.
+
+    The row holds the grid codes in 'spatial_dict'. Large grids would make that column megabytes
+    per row, so their rows name the image's .npz in 'grids_npz' instead, always written in that mode.
+    """
+    rows, cols, num_grids = item['sweep']
+    if item.get('large_grids', False):
+        buf = io.StringIO()
+        with stage("serialization"):
+            grids = write_large_grids(buf, k=num_grids, rows=rows, cols=cols)
+        svg = buf.getvalue()
+    else:
+        svg, grids = generate_multiple_grids(k=num_grids, rows=rows, cols=cols, cell_size=50, padding=5, grid_spacing=50,
+                                             use_symbols=item.get('symbols', False))
+    write_file(os.path.join(item['output_dir'], item['filename']), svg)
+    if item.get('grids_npz', False) or item.get('large_grids', False):
+        buf = io.BytesIO()
+        grids.save_npz(buf)
+        write_file(os.path.join(item['output_dir'], npz_name(item)), buf.getvalue())
+    if item.get('large_grids', False):
+        return {"name": item['filename'], "grids_npz": npz_name(item), "sweep": list(item['sweep'])}
+    return {"name": item['filename'], "spatial_dict": grids.to_records(), "sweep": list(item['sweep'])}
+
+
+def main(argv=None):
+    """Generate the 2D visual spatial sweep."""
+    parser = argparse.ArgumentParser(description="Generate the 2D visual spatial sweep.")
+    parser.add_argument("--grids-npz", action="store_true",
+                        help="Also write each image's grids as <name>.npz (uint8 shape and fill codes, see common.grids)")
+    parser.add_argument("--large-grids", action="store_true",
+                        help="Sweep 32x32 to 128x128 grids, 10 or more per image, drawn with write_large_grids; "
+                             "their grids are kept in the .npz files only")
+    args = add_symbols_argument(add_sweep_arguments(parser)).parse_args(argv)
+
+    rows_list = [3, 6, 9]
+    cols_list = [3, 6, 9]
+    num_grids_list = [1, 3, 5]
+    if args.large_grids:
+        rows_list = cols_list = LARGE_GRID_SIDES
+        num_grids_list = LARGE_GRID_COUNTS
+
+    sweep_list = itertools.product(rows_list, cols_list, num_grids_list)
+
+    base_dir = "visual_discrimination/sweep/visual_spatial"
+    if not os.path.exists(base_dir):
+        os.makedirs(base_dir)
+
+    items = [
+        {"output_dir": base_dir, "filename": f"{idx}.svg", "sweep": sweep, "instance": instance,
+         "symbols": args.svg_symbols, "grids_npz": args.grids_npz, "large_grids": args.large_grids}
+        for idx, (sweep, instance) in enumerate(itertools.product(sweep_list, range(10)))
+    ]
+    rows = run_resumable_sweep(generate_sweep_item, items, TASK, os.path.join(base_dir, "manifest.jsonl"),
+                               num_workers=args.num_workers, seed=args.seed, chunksize=args.chunksize,
+                               restart=args.restart, outputs=sweep_item_outputs, shard_dir=args.shard_dir,
+                               shard_size=args.shard_size, timings_path=args.timings)
+    write_dump(rows, base_dir, DUMP_DECODERS, arrow_types={"spatial_dict": records_arrow_type})
+
+
+if __name__ == "__main__":
+    main()
@@ -12,8 +12,16 @@ import math
 import json
 import logging
 from collections import defaultdict
+import sys
+import argparse
 
-logging.basicConfig(level=logging.INFO)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.shards import add_shard_arguments
+from common.seeding import seed_item
+from common.sweep import add_restart_argument, add_seed_argument, run_render_sweep, script_argv
+from common.timing import add_timing_argument, stage
+
+TASK = "3D_form_constancy"
 
 # Configuration
 data_dir = "data"
@@ -449,7 +457,8 @@ def generate_form_constancy_task(scene_name, light_type,
         ground = bpy.context.active_object
         ground.name = "Ground"
     else:
-        bpy.ops.wm.open_mainfile(filepath=scene_file)
+        with stage("open_mainfile"):
+            bpy.ops.wm.open_mainfile(filepath=scene_file)
     
     # Clear selection
     bpy.ops.object.select_all(action='DESELECT')
@@ -631,7 +640,8 @@ def generate_form_constancy_task(scene_name, light_type,
         output_path = os.path.join(output_dir, f"form_constancy_{scene_name}_{light_type}_{same_str}.png")
     
     bpy.context.scene.render.filepath = output_path
-    bpy.ops.render.render(write_still=True)
+    with stage("render"):
+        bpy.ops.render.render(write_still=True)
     
     # Save JSON with ground truth
     ground_truth = {
@@ -655,44 +665,39 @@ def generate_form_constancy_task(scene_name, light_type,
 
 from itertools import product
 # Example usage
-if __name__ == "__main__":
-    # Create output directory
-    os.makedirs(output_dir, exist_ok=True)
+def main(argv=None):
+    """Generate the 3D visual form constancy sweep."""
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Generate the 3D visual form constancy sweep.")
+    add_timing_argument(add_shard_arguments(add_restart_argument(add_seed_argument(parser))))
+    args = parser.parse_args(script_argv() if argv is None else argv)
+
     
     # Generate a single image with random parameters
+    seed_item(TASK, master_seed=args.seed)
     scene = random.choice(scenes)
     light = random.choice(lights)
     output_dir = "3D_DoYouSeeMe/form_constancy"
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    
+
     rotation_list = [5, 7.5, 10, 12.5, 15]
     num_shapes = [1, 2, 3, 4]
     product_list = list(product(rotation_list, num_shapes))
-    count = 0
     max_instance_per_sweep = 4
-    for rotation, num_shapes in product_list:
-        for i in range(max_instance_per_sweep):
-            output_path = os.path.join(output_dir, f"form_constancy_{count}.png")
-            # Generate image with specific parameters
-            image_path, ground_truth = generate_form_constancy_task(
-                scene, light, noise_amount=rotation, num_shapes=num_shapes,
-                output_path=output_path)
-            print(f"Image generated at: {image_path}")
-            count += 1
-            # break
-
-
-
-
-
-
-
-
-
-
-
+    items = [{"filename": f"form_constancy_{count}.png", "sweep": sweep, "instance": i}
+             for count, (sweep, i) in enumerate(product(product_list, range(max_instance_per_sweep)))]
 
+    def generate(item):
+        rotation, num_shapes = item['sweep']
+        # Generate image with specific parameters
+        image_path, ground_truth = generate_form_constancy_task(
+            scene, light, noise_amount=rotation, num_shapes=num_shapes,
+            output_path=os.path.join(output_dir, item['filename']))
+        print(f"Image generated at: {image_path}")
+        return image_path, ground_truth
 
+    run_render_sweep(generate, items, TASK, output_dir, seed=args.seed, restart=args.restart,
+                     shard_dir=args.shard_dir, shard_size=args.shard_size, timings_path=args.timings)
 
 
+if __name__ == "__main__":
+    main()
@@ -12,8 +12,15 @@ import math
 import json
 import logging
 from collections import defaultdict
+import sys
+import argparse
 
-logging.basicConfig(level=logging.INFO)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.shards import add_shard_arguments
+from common.sweep import add_restart_argument, add_seed_argument, run_render_sweep, script_argv
+from common.timing import add_timing_argument, stage
+
+TASK = "3D_letter_disambiguation"
 
 # Configuration
 data_dir = "data"
@@ -451,7 +458,8 @@ def generate_3d_dot_letter_a(scene_name=None, light_type=None, output_path=None,
         ground_mat = create_material("black")
         ground.data.materials.append(ground_mat)
     else:
-        bpy.ops.wm.open_mainfile(filepath=scene_file)
+        with stage("open_mainfile"):
+            bpy.ops.wm.open_mainfile(filepath=scene_file)
     
     # Clear selection
     bpy.ops.object.select_all(action='DESELECT')
@@ -565,7 +573,8 @@ def generate_3d_dot_letter_a(scene_name=None, light_type=None, output_path=None,
         output_path = os.path.join(output_dir, f"letter_{letter}_3d_{scene_name}_{light_type}_{dot_type}_{dot_color}.png")
     
     bpy.context.scene.render.filepath = output_path
-    bpy.ops.render.render(write_still=True)
+    with stage("render"):
+        bpy.ops.render.render(write_still=True)
     
     # Save JSON with parameters
     parameters = {
@@ -614,7 +623,8 @@ def generate_3d_dot_letters(scene_name=None, light_type=None, output_path=None,
         ground_mat = create_material("black")
         ground.data.materials.append(ground_mat)
     else:
-        bpy.ops.wm.open_mainfile(filepath=scene_file)
+        with stage("open_mainfile"):
+            bpy.ops.wm.open_mainfile(filepath=scene_file)
 
     bpy.ops.object.select_all(action='DESELECT')
 
@@ -725,7 +735,8 @@ def generate_3d_dot_letters(scene_name=None, light_type=None, output_path=None,
         output_path = os.path.join(output_dir, f"letter_{letter}_3d_{scene_name}_{light_type}_{dot_type}_{dot_color}.png")
     
     bpy.context.scene.render.filepath = output_path
-    bpy.ops.render.render(write_still=True)
+    with stage("render"):
+        bpy.ops.render.render(write_still=True)
     
     # Save JSON with parameters
     parameters = {
@@ -757,9 +768,12 @@ def generate_3d_dot_letters(scene_name=None, light_type=None, output_path=None,
 from itertools import product
 
 # Example usage with different variations
-if __name__ == "__main__":
-    # Create output directory
-    os.makedirs(output_dir, exist_ok=True)
+def main(argv=None):
+    """Generate the 3D letter disambiguation sweep."""
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Generate the 3D letter disambiguation sweep.")
+    add_timing_argument(add_shard_arguments(add_restart_argument(add_seed_argument(parser))))
+    args = parser.parse_args(script_argv() if argv is None else argv)
 
     variations = [
         {"dot_type": "sphere", "background_dots": False},
@@ -773,26 +787,32 @@ if __name__ == "__main__":
 
     # Generate all combinations of variations
     product_variations = list(product(variations, dot_size_list, do_spacing_list, letter_numbers))
-    count = 0
     max_instance_per_sweep = 2
     output_dir = "3D_DoYouSeeMe/letter_disambiguation"
+    items = [{"filename": f"{count}.png", "sweep": entry, "instance": i}
+             for count, (entry, i) in enumerate(product(product_variations, range(max_instance_per_sweep)))]
+
+    def generate(item):
+        # Unpack the variation tuple
+        variation, dot_size, spacing, letter_number = item['sweep']
+        scene = random.choice(scenes)
+        light = random.choice(lights)
+        letters = [random.choice(string.ascii_uppercase) for _ in range(letter_number)]
+        return generate_3d_dot_letters(
+            scene_name=scene,
+            light_type=light,
+            dot_type=variation["dot_type"],
+            dot_color=random.choice(list(color_map.keys())),
+            background_dots=variation["background_dots"],
+            dot_size=dot_size,
+            spacing=spacing,
+            letters=letters,
+            output_path=os.path.join(output_dir, item['filename'])
+        )
+
+    run_render_sweep(generate, items, TASK, output_dir, seed=args.seed, restart=args.restart,
+                     shard_dir=args.shard_dir, shard_size=args.shard_size, timings_path=args.timings)
 
-    for entry in product_variations:
-        for i in range(max_instance_per_sweep):
-            # Unpack the variation tuple
-            variation, dot_size, spacing, letter_number = entry
-            scene = random.choice(scenes)
-            light = random.choice(lights)
-            letters = [random.choice(string.ascii_uppercase) for _ in range(letter_number)]
-            image_path, parameters = generate_3d_dot_letters(
-                scene_name=scene,
-                light_type=light,
-                dot_type=variation["dot_type"],
-                dot_color=random.choice(list(color_map.keys())),
-                background_dots=variation["background_dots"],
-                dot_size=dot_size,
-                spacing=spacing,
-                letters=letters,
-                output_path=os.path.join(output_dir, f"{count}.png")
-            )
-            count += 1
+
+if __name__ == "__main__":
+    main()
@@ -12,8 +12,16 @@ import math
 import json
 import logging
 from collections import defaultdict
+import sys
+import argparse
 
-logging.basicConfig(level=logging.INFO)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.shards import add_shard_arguments
+from common.seeding import seed_item
+from common.sweep import add_restart_argument, add_seed_argument, run_render_sweep, script_argv
+from common.timing import add_timing_argument, stage
+
+TASK = "3D_color_and_shape_disambiguation"
 
 # Configuration
 data_dir = "data"
@@ -416,7 +424,8 @@ def generate_single_discrimination_image(scene_name, light_type,
         ground = bpy.context.active_object
         ground.name = "Ground"
     else:
-        bpy.ops.wm.open_mainfile(filepath=scene_file)
+        with stage("open_mainfile"):
+            bpy.ops.wm.open_mainfile(filepath=scene_file)
     
     # Clear selection
     bpy.ops.object.select_all(action='DESELECT')
@@ -579,7 +588,8 @@ def generate_single_discrimination_image(scene_name, light_type,
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
     bpy.context.scene.render.filepath = output_path
-    bpy.ops.render.render(write_still=True)
+    with stage("render"):
+        bpy.ops.render.render(write_still=True)
     
     # Save JSON with ground truth
     ground_truth = {
@@ -606,11 +616,18 @@ def generate_single_discrimination_image(scene_name, light_type,
 from itertools import product
 
 # Example usage
-if __name__ == "__main__":
+def main(argv=None):
+    """Generate the 3D shape and color disambiguation sweep."""
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Generate the 3D shape and color disambiguation sweep.")
+    add_timing_argument(add_shard_arguments(add_restart_argument(add_seed_argument(parser))))
+    args = parser.parse_args(script_argv() if argv is None else argv)
+
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
     
     # Generate a single image with random parameters
+    seed_item(TASK, master_seed=args.seed)
     scene = random.choice(scenes)
     light = random.choice(lights)
     difficulty = random.choice(["easy", "medium", "hard"])
@@ -624,22 +641,25 @@ if __name__ == "__main__":
 
     product_list = list(product(num_shapes_list, num_instances_per_shape_list, min_visibility))
     
-    count = 0
     instances_per_sweep = 2
     base_dir = os.path.join("3D_DoYouSeeMe", "shape_discrimination")
-    data = [] 
-    for num_shapes, max_instances_per_shape, min_visibility in product_list:
-        for i in range(instances_per_sweep):
-            image_path, ground_truth = generate_single_discrimination_image(
-                scene, light, num_shapes=num_shapes,
-                max_instances_per_shape=max_instances_per_shape,
-                min_visibility=min_visibility,
-                output_path = os.path.join(base_dir, f"{count}.png")
-            )
-            print(f"Image generated at: {image_path}")
-            count +=1
-            data.append({
-                "id": count,
-                "image_path": image_path,
-                "ground_truth": ground_truth,
-            })
\ No newline at end of file
+    items = [{"filename": f"{count}.png", "sweep": sweep, "instance": i}
+             for count, (sweep, i) in enumerate(product(product_list, range(instances_per_sweep)))]
+
+    def generate(item):
+        num_shapes, max_instances_per_shape, min_visibility = item['sweep']
+        image_path, ground_truth = generate_single_discrimination_image(
+            scene, light, num_shapes=num_shapes,
+            max_instances_per_shape=max_instances_per_shape,
+            min_visibility=min_visibility,
+            output_path = os.path.join(base_dir, item['filename'])
+        )
+        print(f"Image generated at: {image_path}")
+        return image_path, ground_truth
+
+    run_render_sweep(generate, items, TASK, base_dir, seed=args.seed, restart=args.restart,
+                     shard_dir=args.shard_dir, shard_size=args.shard_size, timings_path=args.timings)
+
+
+if __name__ == "__main__":
+    main()
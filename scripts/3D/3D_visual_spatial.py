@@ -13,10 +13,18 @@ import math
 import json
 import logging
 from collections import defaultdict
+import sys
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.shards import add_shard_arguments
+from common.sweep import add_restart_argument, add_seed_argument, run_render_sweep, script_argv
+from common.timing import add_timing_argument, stage
+
+TASK = "3D_visual_spatial"
 # --- add a slight tilt relative to the current orientation ---
 import math
 
-logging.basicConfig(level=logging.INFO)
 
 # Configuration
 data_dir = "data"
@@ -128,7 +136,8 @@ def generate_random_shape_grid(
     # Load or create scene
     scene_file = os.path.join(data_dir, "scenes", scene_name + ".blend")
     if os.path.exists(scene_file):
-        bpy.ops.wm.open_mainfile(filepath=scene_file)
+        with stage("open_mainfile"):
+            bpy.ops.wm.open_mainfile(filepath=scene_file)
     else:
         bpy.ops.wm.read_homefile(use_empty=True)
         bpy.ops.mesh.primitive_plane_add(size=20, location=(0, 0, 0))
@@ -229,7 +238,8 @@ def generate_random_shape_grid(
     # render
     if output_path:
         bpy.context.scene.render.filepath = output_path
-        bpy.ops.render.render(write_still=True)
+        with stage("render"):
+            bpy.ops.render.render(write_still=True)
 
     # also dump mapping to JSON alongside the image if you like
     if output_path:
@@ -243,29 +253,41 @@ def generate_random_shape_grid(
 
 from itertools import product
 
-if __name__ == "__main__":
-    os.makedirs(output_dir, exist_ok=True)
+def main(argv=None):
+    """Generate the 3D visual spatial sweep."""
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Generate the 3D visual spatial sweep.")
+    add_timing_argument(add_shard_arguments(add_restart_argument(add_seed_argument(parser))))
+    args = parser.parse_args(script_argv() if argv is None else argv)
 
     grid_rows_list = [2, 3, 4, 5]
     grid_cols_list = [2, 3, 4, 5]
     product_list = list(product(grid_rows_list, grid_cols_list))
-    count = 0
     max_instance_per_sweep = 5
-    for grid_rows, grid_cols in product_list:
-        for i in range(max_instance_per_sweep):
-            grid_id = f"grid_{count}"
-            scene_name = random.choice(scenes)
-            light_type = random.choice(lights)
-            output_path = os.path.join(output_dir, f"{grid_id}.png")
-            generate_random_shape_grid(
-                grid_id=grid_id,
-                scene_name=scene_name,
-                light_type=light_type,
-                grid_rows=grid_rows,
-                grid_cols=grid_cols,
-                output_path=output_path
-            )
-            count += 1
-            logging.info(f"Generated {grid_id} with {grid_rows} rows and {grid_cols} columns in scene {scene_name} with light {light_type}.")
-            # Clean up the scene for the next iteration
-            bpy.ops.object.select_all(action='DESELECT')
+    items = [{"filename": f"grid_{count}.png", "sweep": sweep, "instance": i}
+             for count, (sweep, i) in enumerate(product(product_list, range(max_instance_per_sweep)))]
+
+    def generate(item):
+        grid_rows, grid_cols = item['sweep']
+        grid_id = os.path.splitext(item['filename'])[0]
+        scene_name = random.choice(scenes)
+        light_type = random.choice(lights)
+        output_path = os.path.join(output_dir, item['filename'])
+        mapping = generate_random_shape_grid(
+            grid_id=grid_id,
+            scene_name=scene_name,
+            light_type=light_type,
+            grid_rows=grid_rows,
+            grid_cols=grid_cols,
+            output_path=output_path
+        )
+        logging.info(f"Generated {grid_id} with {grid_rows} rows and {grid_cols} columns in scene {scene_name} with light {light_type}.")
+        # Clean up the scene for the next iteration
+        bpy.ops.object.select_all(action='DESELECT')
+        return output_path, {f"{gid}_{r}_{c}": s for (gid, r, c), s in mapping.items()}
+
+    run_render_sweep(generate, items, TASK, output_dir, seed=args.seed, restart=args.restart,
+                     shard_dir=args.shard_dir, shard_size=args.shard_size, timings_path=args.timings)
+
+if __name__ == "__main__":
+    main()
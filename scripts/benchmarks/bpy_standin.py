@@ -0,0 +1,345 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Stand-in for Blender's Python modules (bpy, mathutils, bmesh, bpy_extras), used to benchmark the
+non-render stages of the 3D generators outside Blender.
+
+Scene operators create plain objects with a box-shaped mesh, rendering is a no-op, every vertex is
+in view of the camera and ray casts never hit, so an item runs its scene setup, placement and
+ground truth code in plain Python. mathutils is the subset of Vector, Euler and Matrix the
+generators use. None of this renders anything; the numbers cover the Python side only.
+"""
+
+import math
+import sys
+import types
+
+
+class Vector:
+    __slots__ = ("_v",)
+
+    def __init__(self, values=(0.0, 0.0, 0.0)):
+        self._v = [float(v) for v in values]
+
+    def __len__(self):
+        return len(self._v)
+
+    def __iter__(self):
+        return iter(self._v)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self._v[index])
+        return self._v[index]
+
+    def __setitem__(self, index, value):
+        self._v[index] = float(value)
+
+    def _axis(i):
+        return property(lambda self: self._v[i], lambda self, value: self.__setitem__(i, value))
+
+    x, y, z = _axis(0), _axis(1), _axis(2)
+    del _axis
+
+    def __add__(self, other):
+        return type(self)(a + b for a, b in zip(self, other))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return type(self)(a - b for a, b in zip(self, other))
+
+    def __rsub__(self, other):
+        return type(self)(b - a for a, b in zip(self, other))
+
+    def __mul__(self, scalar):
+        return type(self)(a * scalar for a in self)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, scalar):
+        return type(self)(a / scalar for a in self)
+
+    def __neg__(self):
+        return type(self)(-a for a in self)
+
+    def __matmul__(self, other):
+        return sum(a * b for a, b in zip(self, other))
+
+    def __eq__(self, other):
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None
+
+    @property
+    def length(self):
+        return math.sqrt(sum(a * a for a in self))
+
+    def normalized(self):
+        length = self.length
+        return type(self)(self) if length == 0 else self / length
+
+    def copy(self):
+        return type(self)(self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({tuple(self._v)})"
+
+
+class Matrix:
+    def __init__(self, rows):
+        self._rows = [[float(v) for v in row] for row in rows]
+
+    @classmethod
+    def Identity(cls, size):
+        return cls([[1.0 if i == j else 0.0 for j in range(size)] for i in range(size)])
+
+    def __getitem__(self, index):
+        return self._rows[index]
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __matmul__(self, other):
+        if isinstance(other, Matrix):
+            cols = list(zip(*other._rows))
+            return Matrix([[sum(a * b for a, b in zip(row, col)) for col in cols] for row in self._rows])
+        values = list(other)
+        if len(values) == len(self._rows) - 1:
+            # 4x4 @ 3D vector, as an affine transform of a point
+            values.append(1.0)
+            return Vector(sum(a * b for a, b in zip(row, values)) for row in self._rows[:-1])
+        return Vector(sum(a * b for a, b in zip(row, values)) for row in self._rows)
+
+    def to_4x4(self):
+        rows = [list(row) + [0.0] for row in self._rows[:3]] + [[0.0, 0.0, 0.0, 1.0]]
+        return Matrix(rows)
+
+
+def _rotation(axis, angle):
+    c, s = math.cos(angle), math.sin(angle)
+    if axis == 'X':
+        return Matrix([[1, 0, 0], [0, c, -s], [0, s, c]])
+    if axis == 'Y':
+        return Matrix([[c, 0, s], [0, 1, 0], [-s, 0, c]])
+    return Matrix([[c, -s, 0], [s, c, 0], [0, 0, 1]])
+
+
+class Euler(Vector):
+    __slots__ = ()
+
+    def __init__(self, angles=(0.0, 0.0, 0.0), order='XYZ'):
+        super().__init__(angles)
+
+    def to_matrix(self):
+        """XYZ rotation matrix, X applied first."""
+        return _rotation('Z', self.z) @ _rotation('Y', self.y) @ _rotation('X', self.x)
+
+    def rotate_axis(self, axis, angle):
+        """Rotate around one of the object's local axes."""
+        m = self.to_matrix() @ _rotation(axis, angle)
+        self._v = [math.atan2(m[2][1], m[2][2]),
+                   math.asin(max(-1.0, min(1.0, -m[2][0]))),
+                   math.atan2(m[1][0], m[0][0])]
+
+
+class _Anything:
+    """Accepts any attribute, item, call or `with`, and is empty and false."""
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        value = _Anything()
+        setattr(self, name, value)
+        return value
+
+    def __call__(self, *args, **kwargs):
+        return _Anything()
+
+    def __getitem__(self, key):
+        return _Anything()
+
+    def __setitem__(self, key, value):
+        pass
+
+    def __iter__(self):
+        return iter(())
+
+    def __bool__(self):
+        return False
+
+    def __contains__(self, item):
+        return False
+
+    def __enter__(self):
+        return _Anything(), _Anything()
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class _Constraints(list):
+    def new(self, type):
+        constraint = _Anything()
+        constraint.type = type
+        self.append(constraint)
+        return constraint
+
+
+class _Object:
+    def __init__(self, name, location=(0, 0, 0), dimensions=(2, 2, 2)):
+        self.name = name
+        self.location = location
+        self.rotation_euler = (0, 0, 0)
+        self.scale = (1, 1, 1)
+        self.parent = None
+        self.data = _Anything()
+        self.data.materials = []
+        self.constraints = _Constraints()
+        dx, dy, dz = (d / 2 for d in dimensions)
+        self.bound_box = [(x * dx, y * dy, z * dz) for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)]
+
+    location = property(lambda self: self._location,
+                        lambda self, value: setattr(self, "_location", Vector(value)))
+    rotation_euler = property(lambda self: self._rotation_euler,
+                              lambda self, value: setattr(self, "_rotation_euler", Euler(value)))
+    scale = property(lambda self: self._scale,
+                     lambda self, value: setattr(self, "_scale", Vector(value)))
+
+    @property
+    def matrix_world(self):
+        rotation = self.rotation_euler.to_matrix()
+        return Matrix([[rotation[i][j] * self.scale[j] for j in range(3)] + [self.location[i]]
+                       for i in range(3)] + [[0, 0, 0, 1]])
+
+    def evaluated_get(self, depsgraph):
+        return self
+
+    def to_mesh(self):
+        mesh = _Anything()
+        mesh.vertices = []
+        for corner in self.bound_box:
+            vertex = _Anything()
+            vertex.co = Vector(corner)
+            mesh.vertices.append(vertex)
+        return mesh
+
+    def to_mesh_clear(self):
+        pass
+
+
+class _Objects(list):
+    """bpy.data.objects: a list that is also looked up by name."""
+
+    def __contains__(self, name):
+        return any(obj.name == name for obj in self)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            for obj in self:
+                if obj.name == key:
+                    return obj
+            raise KeyError(key)
+        return list.__getitem__(self, key)
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def remove(self, obj, do_unlink=True):
+        for i, other in enumerate(self):
+            if other is obj:
+                del self[i]
+                return
+
+    def link(self, obj):
+        self.append(obj)
+
+
+def _new_scene(bpy):
+    bpy.data.objects = _Objects()
+    bpy.data.materials = _Anything()
+    bpy.context.scene = _Anything()
+    bpy.context.collection = _Anything()
+    bpy.context.collection.objects = bpy.data.objects
+    bpy.context.active_object = None
+
+
+def _make_bpy():
+    bpy = types.ModuleType("bpy")
+    bpy.data = _Anything()
+    bpy.context = _Anything()
+    bpy.ops = _Anything()
+    bpy.types = _Anything()
+    _new_scene(bpy)
+
+    def add(name, location=(0, 0, 0), dimensions=(2, 2, 2)):
+        if name in bpy.data.objects:
+            n = 1
+            while f"{name}.{n:03d}" in bpy.data.objects:
+                n += 1
+            name = f"{name}.{n:03d}"
+        obj = _Object(name, location, dimensions)
+        bpy.data.objects.append(obj)
+        bpy.context.active_object = obj
+        return {'FINISHED'}
+
+    def material(name="Material"):
+        mat = _Anything()
+        mat.name = name
+        return mat
+
+    mesh = bpy.ops.mesh
+    mesh.primitive_plane_add = lambda size=2, location=(0, 0, 0), **kw: add("Plane", location, (size, size, 0))
+    mesh.primitive_cube_add = lambda size=2, location=(0, 0, 0), **kw: add("Cube", location, (size,) * 3)
+    mesh.primitive_uv_sphere_add = lambda radius=1, location=(0, 0, 0), **kw: add("Sphere", location,
+                                                                                  (2 * radius,) * 3)
+    mesh.primitive_cylinder_add = lambda radius=1, depth=2, location=(0, 0, 0), **kw: add(
+        "Cylinder", location, (2 * radius, 2 * radius, depth))
+    mesh.primitive_cone_add = lambda radius1=1, depth=2, location=(0, 0, 0), **kw: add(
+        "Cone", location, (2 * radius1, 2 * radius1, depth))
+    mesh.primitive_torus_add = lambda major_radius=1, minor_radius=0.25, location=(0, 0, 0), **kw: add(
+        "Torus", location, (2 * (major_radius + minor_radius),) * 2 + (2 * minor_radius,))
+    bpy.ops.object.camera_add = lambda location=(0, 0, 0), **kw: add("Camera", location)
+    bpy.ops.object.light_add = lambda type='POINT', location=(0, 0, 0), **kw: add(type.capitalize(), location)
+    bpy.ops.object.empty_add = lambda type='PLAIN_AXES', location=(0, 0, 0), **kw: add("Empty", location)
+    bpy.ops.wm.read_homefile = lambda **kw: _new_scene(bpy)
+    bpy.ops.wm.open_mainfile = lambda **kw: _new_scene(bpy)
+    bpy.data.materials.new = material
+    return bpy
+
+
+def install():
+    """
+    Register the stand-in modules in sys.modules, unless Blender's own bpy is already loaded.
+
+    Returns:
+        bool: True if the stand-in is in use
+    """
+    if "bpy" in sys.modules and not getattr(sys.modules["bpy"], "__standin__", False):
+        return False
+    if "bpy" in sys.modules:
+        return True
+
+    bpy = _make_bpy()
+    bpy.__standin__ = True
+
+    mathutils = types.ModuleType("mathutils")
+    mathutils.Vector, mathutils.Euler, mathutils.Matrix = Vector, Euler, Matrix
+
+    bpy_extras = types.ModuleType("bpy_extras")
+    object_utils = types.ModuleType("bpy_extras.object_utils")
+    object_utils.world_to_camera_view = lambda scene, camera, coord: Vector((0.5, 0.5, 1.0))
+    bpy_extras.object_utils = object_utils
+
+    sys.modules.update({
+        "bpy": bpy,
+        "mathutils": mathutils,
+        "bmesh": types.ModuleType("bmesh"),
+        "bpy_extras": bpy_extras,
+        "bpy_extras.object_utils": object_utils,
+    })
+    return True
@@ -0,0 +1,343 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Benchmark cases.
+
+Each case is a setup function `setup(workdir, num_items, seed)` that does the untimed work (imports,
+input data) inside `workdir` and returns the timed function. The timed function generates or
+processes `num_items` items and returns how many it handled. Every item is seeded from its own
+coordinates, as in a sweep, so repeated runs do the same work.
+
+    <task>/<size>            2D generator items at a small, medium or large sweep setting,
+                             with file writes captured in memory
+    2D_shape_discrimination_placement/<count>
+                             one shape discrimination composition of about <count> shapes, at the
+                             density of the large sweep setting; an item is one placed shape
+    2D_color_and_shape_disambiguation_placement/<count>
+                             the same for one joint shape and color composition
+    svg_writer/<task>/<backend>
+                             the large setting of a generator using svgwrite or common.svg's
+                             streaming Drawing, to compare the two SVG writers
+    2D_visual_spatial_grid_size/<side>/<mode>
+                             a visual spatial image of 10 grids of <side> x <side> cells, drawn by the
+                             default writer or by the --large-grids one
+    2D_visual_spatial_questions/<size>
+                             MultiGridQuestionGenerator.generate_question_set on grids of that size
+    2D_visual_spatial_questions/<size>/<count>
+                             the same asking <count> questions per image instead of 5
+    builder/<task>           a dataset_creator turning generated rows or ground truth into questions
+    <3D task>/<size>         one 3D item through the bpy stand-in: scene setup, placement and the
+                             ground truth JSON, without rendering
+"""
+
+import os
+import random
+import string
+
+from common.registry import load_builder, load_generator
+from common.seeding import seed_item
+from common.writer import call_capturing_writes
+
+SIZES = ("small", "medium", "large")
+
+# Sweep tuples taken from each script's own sweep lists. Strings name module attributes.
+GENERATOR_SWEEPS = {
+    "2D_shape_discrimination": {"small": (3, 3, 10), "medium": (7, 6, -20), "large": (7, 10, -40)},
+    "2D_color_and_shape_disambiguation": {"small": (2, 2), "medium": (4, 4), "large": (6, 6)},
+    "2D_visual_spatial": {"small": (3, 3, 1), "medium": (6, 6, 3), "large": (9, 9, 5)},
+    "2D_letter_disambiguation": {"small": (1, 1, 0.1), "medium": (5, 2, 0.08), "large": (9, 3, 0.04)},
+    "2D_visual_closure": {"small": ("define_regular_triangle", 0.1, 1, 1, 1),
+                          "medium": ("define_regular_hexagon", 0.12, 3, 1, 3),
+                          "large": ("define_fine_grained_star", 0.14, 3, 3, 3)},
+    "2D_visual_figure_ground": {"small": (2, 0.1), "medium": (6, 0.3), "large": (10, 0.5)},
+    "2D_visual_form_constancy": {"small": (5, 0.8, 0.8, 0), "medium": (25, 1.1, 1.1, 1),
+                                 "large": (50, 1.4, 1.4, 1)},
+}
+
+# Name of the function of each 2D builder that turns typed dataset_dump rows into question rows
+BUILDER_FUNCTIONS = {
+    "2D_shape_discrimination": "generate_questions",
+    "2D_color_and_shape_disambiguation": "generate_questions",
+    "2D_visual_spatial": "process_dataset",
+}
+
+
+def _resolve(module, sweep):
+    return tuple(getattr(module, v) if isinstance(v, str) else v for v in sweep)
+
+
+def _generated_items(task, sweep, workdir, num_items):
+    ext = ".png" if task == "2D_visual_closure" else ".svg"
+    return [{"output_dir": workdir, "filename": f"{i}{ext}", "sweep": sweep, "instance": i}
+            for i in range(num_items)]
+
+
+def _generator_case(task, size):
+    def setup(workdir, num_items, seed):
+        module = load_generator(task)
+        items = _generated_items(task, _resolve(module, GENERATOR_SWEEPS[task][size]), workdir, num_items)
+
+        def run():
+            for item in items:
+                seed_item(task, item['sweep'], item['instance'], seed)
+                call_capturing_writes(module.generate_sweep_item, item)
+            return len(items)
+        return run
+    return setup
+
+
+# Canvas side and max instances per shape type giving about that many shapes (rings included)
+# at the density of the large shape discrimination sweep setting
+PLACEMENT_SCALING = {"250": (1024, 72), "1k": (2048, 290), "2k": (2896, 580)}
+
+
+def _placement_case(count):
+    def setup(workdir, num_items, seed):
+        module = load_generator("2D_shape_discrimination")
+        side, max_instances = PLACEMENT_SCALING[count]
+
+        def run():
+            random.seed(seed)
+            _, shape_counts, _, _ = module.generate_complex_composition(
+                canvas_width=side, canvas_height=side, num_shapes=len(module.shape_types),
+                max_instances=max_instances, concentric_probability=0.4, min_distance_inwards=-20)
+            return sum(shape_counts.values())
+        return run
+    return setup
+
+
+# Canvas side and max instances per shape type giving about that many shapes at the density of the
+# large joint shape and color sweep setting
+JOINT_PLACEMENT_SCALING = {"250": (1380, 83), "1k": (2760, 333)}
+
+
+def _joint_placement_case(count):
+    def setup(workdir, num_items, seed):
+        module = load_generator("2D_color_and_shape_disambiguation")
+        side, max_instances = JOINT_PLACEMENT_SCALING[count]
+
+        def run():
+            random.seed(seed)
+            _, shape_counts, _, _, _ = module.generate_complex_composition(
+                canvas_width=side, canvas_height=side, num_shapes=len(module.shape_dictionary),
+                max_instances=max_instances)
+            return sum(shape_counts.values())
+        return run
+    return setup
+
+
+# Generators writing their SVGs through common.svg.Drawing, which the svg_writer cases swap for svgwrite's
+SVG_WRITER_TASKS = ("2D_shape_discrimination", "2D_visual_figure_ground", "2D_visual_form_constancy")
+SVG_WRITERS = ("svgwrite", "stream")
+
+
+def _svg_writer_case(task, backend):
+    def setup(workdir, num_items, seed):
+        module = load_generator(task)
+        items = _generated_items(task, _resolve(module, GENERATOR_SWEEPS[task]["large"]), workdir, num_items)
+        if backend == "svgwrite":
+            import svgwrite
+
+            def drawing(*args, precision=None, **attributes):
+                # svgwrite always writes the full repr of numbers
+                return svgwrite.Drawing(*args, **attributes)
+        else:
+            drawing = module.Drawing
+
+        def run():
+            previous, module.Drawing = module.Drawing, drawing
+            try:
+                for item in items:
+                    seed_item(task, item['sweep'], item['instance'], seed)
+                    call_capturing_writes(module.generate_sweep_item, item)
+            finally:
+                module.Drawing = previous
+            return len(items)
+        return run
+    return setup
+
+
+# Grid sides of the 2D_visual_spatial_grid_size/<side>/<mode> cases, 10 grids per image
+GRID_SIDES = (32, 64, 128)
+GRID_MODES = ("default", "large")
+
+
+def _grid_size_case(side, mode):
+    def setup(workdir, num_items, seed):
+        module = load_generator("2D_visual_spatial")
+        items = _generated_items("2D_visual_spatial", (side, side, 10), workdir, num_items)
+        for item in items:
+            item["large_grids"] = mode == "large"
+
+        def run():
+            for item in items:
+                seed_item("2D_visual_spatial", item['sweep'], item['instance'], seed)
+                call_capturing_writes(module.generate_sweep_item, item)
+            return len(items)
+        return run
+    return setup
+
+
+# Questions per image of the 2D_visual_spatial_questions/<size>/<count> cases
+QUESTION_COUNTS = {"large": (200,)}
+
+
+def _questions_case(size, num_questions=5):
+    def setup(workdir, num_items, seed):
+        generator = load_generator("2D_visual_spatial")
+        builder = load_builder("2D_visual_spatial")
+        rows, cols, num_grids = GENERATOR_SWEEPS["2D_visual_spatial"][size]
+        random.seed(seed)
+        grids = [generator.generate_multiple_grids(k=num_grids, rows=rows, cols=cols, cell_size=50,
+                                                   padding=5, grid_spacing=50)[1]
+                 for _ in range(num_items)]
+
+        def run():
+            random.seed(seed)
+            for spatial_dicts in grids:
+                builder.MultiGridQuestionGenerator(spatial_dicts).generate_question_set(num_questions=num_questions)
+            return len(grids)
+        return run
+    return setup
+
+
+def _builder_case(task):
+    def setup(workdir, num_items, seed):
+        generator = load_generator(task)
+        builder = load_builder(task)
+        items = _generated_items(task, _resolve(generator, GENERATOR_SWEEPS[task]["medium"]), workdir, num_items)
+        rows = []
+        for item in items:
+            seed_item(task, item['sweep'], item['instance'], seed)
+            rows.append(call_capturing_writes(generator.generate_sweep_item, item)[0])
+        build = getattr(builder, BUILDER_FUNCTIONS[task])
+
+        def run():
+            random.seed(seed)
+            for _ in build(rows):
+                pass
+            return len(rows)
+        return run
+    return setup
+
+
+# 3D sweep settings and how to generate one item of each task with the stand-in
+GENERATOR_3D_SWEEPS = {
+    "3D_shape_discrimination": {"small": (1, 1, 0.7), "medium": (3, 2, 0.9), "large": (5, 3, 0.99)},
+    "3D_color_and_shape_disambiguation": {"small": (1, 1, 0.7), "medium": (3, 2, 0.9), "large": (5, 3, 0.99)},
+    "3D_form_constancy": {"small": (5, 1), "medium": (10, 2), "large": (15, 4)},
+    "3D_letter_disambiguation": {"small": ("sphere", 0.05, 0.4, 1), "medium": ("cube", 0.08, 0.5, 2),
+                                 "large": ("cylinder", 0.14, 0.5, 2)},
+    "3D_visual_spatial": {"small": (2, 2), "medium": (3, 4), "large": (5, 5)},
+}
+
+
+def _discrimination_item(module, sweep, path):
+    num_shapes, max_instances, min_visibility = sweep
+    module.generate_single_discrimination_image(random.choice(module.scenes), random.choice(module.lights),
+                                                num_shapes=num_shapes, max_instances_per_shape=max_instances,
+                                                min_visibility=min_visibility, output_path=path)
+
+
+def _form_constancy_item(module, sweep, path):
+    rotation, num_shapes = sweep
+    module.generate_form_constancy_task(random.choice(module.scenes), random.choice(module.lights),
+                                        noise_amount=rotation, num_shapes=num_shapes, output_path=path)
+
+
+def _letter_item(module, sweep, path):
+    dot_type, dot_size, spacing, num_letters = sweep
+    module.generate_3d_dot_letters(scene_name=random.choice(module.scenes), light_type=random.choice(module.lights),
+                                   dot_type=dot_type, dot_color=random.choice(list(module.color_map.keys())),
+                                   dot_size=dot_size, spacing=spacing, output_path=path,
+                                   letters=[random.choice(string.ascii_uppercase) for _ in range(num_letters)])
+
+
+def _visual_spatial_item(module, sweep, path):
+    grid_rows, grid_cols = sweep
+    module.generate_random_shape_grid(grid_id=f"grid_{os.path.splitext(os.path.basename(path))[0]}",
+                                      scene_name=random.choice(module.scenes),
+                                      light_type=random.choice(module.lights),
+                                      grid_rows=grid_rows, grid_cols=grid_cols, output_path=path)
+
+
+GENERATE_3D_ITEM = {
+    "3D_shape_discrimination": _discrimination_item,
+    "3D_color_and_shape_disambiguation": _discrimination_item,
+    "3D_form_constancy": _form_constancy_item,
+    "3D_letter_disambiguation": _letter_item,
+    "3D_visual_spatial": _visual_spatial_item,
+}
+
+
+def _load_3d(task):
+    from benchmarks.bpy_standin import install
+
+    if not install():
+        raise RuntimeError("Blender's bpy is loaded, the 3D cases only run with the stand-in")
+    return load_generator(task)
+
+
+def _run_3d_items(task, module, sweep, output_dir, num_items, seed):
+    os.makedirs(output_dir, exist_ok=True)
+    for i in range(num_items):
+        seed_item(task, sweep, i, seed)
+        GENERATE_3D_ITEM[task](module, sweep, os.path.join(output_dir, f"{i}.png"))
+    return num_items
+
+
+def _generator_3d_case(task, size):
+    def setup(workdir, num_items, seed):
+        module = _load_3d(task)
+        sweep = GENERATOR_3D_SWEEPS[task][size]
+        return lambda: _run_3d_items(task, module, sweep, os.path.join(workdir, task), num_items, seed)
+    return setup
+
+
+def _builder_3d_case(task):
+    def setup(workdir, num_items, seed):
+        module = _load_3d(task)
+        builder = load_builder(task)
+        # The builders read the ground truth JSON files from base_dir, relative to the working directory
+        _run_3d_items(task, module, GENERATOR_3D_SWEEPS[task]["medium"],
+                      os.path.join(workdir, builder.base_dir), num_items, seed)
+
+        def run():
+            builder.main()
+            return num_items
+        return run
+    return setup
+
+
+def _all_cases():
+    cases = {}
+    for task in GENERATOR_SWEEPS:
+        for size in SIZES:
+            cases[f"{task}/{size}"] = _generator_case(task, size)
+    for count in PLACEMENT_SCALING:
+        cases[f"2D_shape_discrimination_placement/{count}"] = _placement_case(count)
+    for count in JOINT_PLACEMENT_SCALING:
+        cases[f"2D_color_and_shape_disambiguation_placement/{count}"] = _joint_placement_case(count)
+    for task in SVG_WRITER_TASKS:
+        for backend in SVG_WRITERS:
+            cases[f"svg_writer/{task}/{backend}"] = _svg_writer_case(task, backend)
+    for side in GRID_SIDES:
+        for mode in GRID_MODES:
+            cases[f"2D_visual_spatial_grid_size/{side}/{mode}"] = _grid_size_case(side, mode)
+    for size in SIZES:
+        cases[f"2D_visual_spatial_questions/{size}"] = _questions_case(size)
+    for size, counts in QUESTION_COUNTS.items():
+        for count in counts:
+            cases[f"2D_visual_spatial_questions/{size}/{count}"] = _questions_case(size, count)
+    for task in BUILDER_FUNCTIONS:
+        cases[f"builder/{task}"] = _builder_case(task)
+    for task in GENERATOR_3D_SWEEPS:
+        for size in SIZES:
+            cases[f"{task}/{size}"] = _generator_3d_case(task, size)
+    for task in GENERATOR_3D_SWEEPS:
+        cases[f"builder/{task}"] = _builder_3d_case(task)
+    return cases
+
+
+CASES = _all_cases()
@@ -0,0 +1,195 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Measure generation throughput (items/sec) and peak memory of every generator and question builder,
+and compare them with a stored baseline.
+
+    python scripts/benchmarks/run_benchmarks.py                          # all cases
+    python scripts/benchmarks/run_benchmarks.py --cases "2D_*" "builder/*"
+    python scripts/benchmarks/run_benchmarks.py --update-baseline        # store the results as baseline
+
+Throughput is the best of --repeat timed rounds, after one warm-up run. A round repeats the case
+until it has run for at least --min-time seconds, so fast cases are not lost in timer noise. Peak
+memory is the peak of Python allocations (tracemalloc) during one extra run, measured separately
+because tracing slows the code down. The exit status is 1 when a case is slower or uses more
+memory than its baseline by more than the thresholds. Timings only compare on the same machine
+with the same --items and --seed.
+"""
+
+import argparse
+import contextlib
+import fnmatch
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Memory growth below this many MB is never reported, small cases allocate only a few KB
+MIN_MEMORY_GROWTH_MB = 1.0
+
+
+@contextlib.contextmanager
+def _working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def measure(setup, num_items, seed=0, repeat=3, min_time=0.2, memory=True):
+    """
+    Run one benchmark case in a temporary working directory.
+
+    Args:
+        setup: Case setup function, see benchmarks.cases
+        num_items: Number of items per run
+        seed: Master seed of the items
+        repeat: Number of timed rounds, the fastest is kept
+        min_time: Minimum duration of a round in seconds
+        memory: Also measure the peak memory of one run
+
+    Returns:
+        dict: items_per_sec and peak_mb (None without `memory`)
+    """
+    with tempfile.TemporaryDirectory() as workdir, _working_directory(workdir), \
+            open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        run = setup(workdir, num_items, seed)
+        # Untimed warm-up, so lazy imports and caches are not charged to the first case that uses them
+        run()
+        items_per_sec = 0.0
+        for _ in range(max(1, repeat)):
+            items, start = 0, time.perf_counter()
+            while True:
+                items += run()
+                seconds = time.perf_counter() - start
+                if seconds >= min_time:
+                    break
+            items_per_sec = max(items_per_sec, items / seconds)
+        peak_mb = None
+        if memory:
+            tracemalloc.start()
+            try:
+                run()
+                peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            finally:
+                tracemalloc.stop()
+    return {"items_per_sec": items_per_sec, "peak_mb": peak_mb}
+
+
+def compare(results, baseline, threshold=0.25, memory_threshold=0.25):
+    """
+    Compare results with a baseline.
+
+    Args:
+        results: {case: measurement} of this run
+        baseline: {case: measurement} of the baseline, cases missing from it are not compared
+        threshold: Largest accepted relative drop in items/sec
+        memory_threshold: Largest accepted relative growth of the peak memory
+
+    Returns:
+        list: One message per regression
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        speed = result["items_per_sec"] / base["items_per_sec"]
+        if speed < 1 - threshold:
+            regressions.append(f"{name}: {result['items_per_sec']:.1f} items/sec is {speed:.2f}x the "
+                               f"baseline {base['items_per_sec']:.1f}")
+        if result.get("peak_mb") is not None and base.get("peak_mb"):
+            growth = result["peak_mb"] / base["peak_mb"]
+            if growth > 1 + memory_threshold and result["peak_mb"] - base["peak_mb"] > MIN_MEMORY_GROWTH_MB:
+                regressions.append(f"{name}: peak memory {result['peak_mb']:.1f} MB is {growth:.2f}x the "
+                                   f"baseline {base['peak_mb']:.1f} MB")
+    return regressions
+
+
+def _report_line(name, result, base):
+    line = f"{name:48s} {result['items_per_sec']:10.1f} items/s"
+    if result["peak_mb"] is not None:
+        line += f" {result['peak_mb']:8.2f} MB"
+    if base is not None:
+        line += f"   ({result['items_per_sec'] / base['items_per_sec']:.2f}x baseline)"
+    return line
+
+
+def main(argv=None):
+    """Run the benchmark suite."""
+    parser = argparse.ArgumentParser(description="Run the generation throughput benchmarks.")
+    parser.add_argument("--cases", nargs="+", default=["*"],
+                        help="Glob patterns of the cases to run, e.g. '2D_*' 'builder/*'")
+    parser.add_argument("--list", action="store_true", help="List the cases and exit")
+    parser.add_argument("--items", type=int, default=10, help="Items per run")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed rounds per case, the fastest is kept")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum duration of a timed round in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Master seed of the items")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the peak memory run")
+    parser.add_argument("--output", default="benchmark_results.json", help="Results file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results file")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Largest accepted relative drop in items/sec")
+    parser.add_argument("--memory-threshold", type=float, default=0.25,
+                        help="Largest accepted relative growth of the peak memory")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Write the results to the baseline file instead of comparing")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    logging.getLogger().setLevel(logging.ERROR)
+    from benchmarks.cases import CASES
+
+    names = [name for name in CASES if any(fnmatch.fnmatch(name, pattern) for pattern in args.cases)]
+    if args.list:
+        print("\n".join(names))
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, 'r') as f:
+            stored = json.load(f)
+        if stored["settings"] != {"items": args.items, "seed": args.seed}:
+            print(f"Warning: baseline was measured with {stored['settings']}")
+        baseline = stored["results"]
+
+    results = {}
+    for name in names:
+        results[name] = measure(CASES[name], args.items, seed=args.seed, repeat=args.repeat,
+                                min_time=args.min_time, memory=not args.no_memory)
+        print(_report_line(name, results[name], baseline.get(name)), flush=True)
+
+    report = {
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "processor": platform.processor() or platform.machine()},
+        "settings": {"items": args.items, "seed": args.seed},
+        "results": results,
+    }
+    path = args.baseline if args.update_baseline else args.output
+    if args.update_baseline and os.path.exists(path):
+        # Keep the baseline of the cases that were not run
+        with open(path, 'r') as f:
+            report["results"] = {**json.load(f)["results"], **results}
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {path}")
+
+    regressions = compare(results, baseline, args.threshold, args.memory_threshold)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""Helpers shared by the dataset generation scripts under scripts/2D and scripts/3D."""
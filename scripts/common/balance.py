@@ -0,0 +1,165 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Answer-balanced question sampling for the dataset creators.
+
+Counting answers are heavily skewed: most directional counts of a grid are 0 or 1, and most
+(shape, color) pairs of an image occur once. Drawing questions image by image keeps that skew. With
+--balance-answers the dataset creators instead list every candidate question of every image with its
+answer, and pick the questions of each sweep cell from the answer histogram of the cell:
+
+    --balance-answers uniform           every answer seen in the cell equally often
+    --balance-answers 0:1,1:1,2:2,3:2   answers in proportion to the weights, unlisted answers never
+
+A cell keeps as many questions as the images' default quotas add up to. An answer with fewer
+candidates than its share gives all of them and the rest is shared among the other answers, so the
+cell is only short when the weighted answers together have too few candidates. Questions are balanced
+per cell, not per image: an image may get more questions than its quota and another none.
+
+The choice is made from the histogram, answer by answer, so no candidate is built, drawn and thrown
+away; the builders only turn the chosen candidates into questions. Cells are read and written one
+at a time in dump order, so memory stays at one cell's answers whatever the dataset size.
+"""
+
+import random
+
+UNIFORM = "uniform"
+
+
+def add_balance_argument(parser):
+    """Add the --balance-answers option of the dataset creators."""
+    parser.add_argument("--balance-answers", type=parse_target, default=None, metavar="TARGET",
+                        help="Pick the questions of each sweep cell to match a target answer distribution: "
+                             "'uniform' or weights such as '0:1,1:1,2:2'")
+    return parser
+
+
+def parse_target(spec):
+    """
+    Target answer distribution of --balance-answers.
+
+    Returns:
+        UNIFORM, or {answer: weight} with int answers and positive float weights
+    """
+    if spec == UNIFORM:
+        return UNIFORM
+    weights = {}
+    try:
+        for part in spec.split(","):
+            answer, weight = part.split(":")
+            weights[int(answer)] = float(weight)
+    except ValueError:
+        raise ValueError(f"Invalid answer distribution {spec!r}, expected 'uniform' or 'answer:weight,...'")
+    if any(weight < 0 for weight in weights.values()) or not any(weights.values()):
+        raise ValueError(f"Invalid answer distribution {spec!r}, weights must be >= 0 and not all 0")
+    return weights
+
+
+def allocate(histogram, total, target=UNIFORM):
+    """
+    Number of questions to take of each answer.
+
+    The total is shared in proportion to the target weights. Answers with fewer candidates than
+    their share take them all and the remainder is shared again among the others; integer shares
+    are rounded by largest remainder, ties going to the smaller answer.
+
+    Args:
+        histogram: {answer: number of candidates}
+        total: Questions to take
+        target: UNIFORM or {answer: weight}
+
+    Returns:
+        {answer: count}, every count at most the answer's candidates and summing to at most total
+    """
+    weights = {answer: 1.0 if target == UNIFORM else target.get(answer, 0.0) for answer in histogram}
+    active = sorted(answer for answer in histogram if weights[answer] > 0 and histogram[answer] > 0)
+    taken = {answer: 0 for answer in histogram}
+    remaining = total
+    while active and remaining > 0:
+        weight_sum = sum(weights[answer] for answer in active)
+        capped = [answer for answer in active if histogram[answer] <= remaining * weights[answer] / weight_sum]
+        if not capped:
+            break
+        for answer in capped:
+            taken[answer] = histogram[answer]
+            remaining -= histogram[answer]
+        active = [answer for answer in active if answer not in capped]
+    if active and remaining > 0:
+        weight_sum = sum(weights[answer] for answer in active)
+        shares = {answer: remaining * weights[answer] / weight_sum for answer in active}
+        for answer in active:
+            taken[answer] = int(shares[answer])
+        left = remaining - sum(taken[answer] for answer in active)
+        for answer in sorted(active, key=lambda a: (taken[a] - shares[a], a))[:left]:
+            taken[answer] += 1
+    return taken
+
+
+def balanced_choice(answers, total, target=UNIFORM):
+    """
+    Choose candidates of one sweep cell to match a target answer distribution.
+
+    Args:
+        answers: One sequence of candidate answers per image of the cell
+        total: Questions to keep in the cell
+        target: UNIFORM or {answer: weight}
+
+    Returns:
+        One ascending list of chosen candidate indices per image
+    """
+    import numpy as np
+
+    sizes = [len(a) for a in answers]
+    flat = np.concatenate([np.asarray(a, dtype=np.int64) for a in answers]) if answers else np.zeros(0, np.int64)
+    values, counts = np.unique(flat, return_counts=True)
+    taken = allocate(dict(zip(values.tolist(), counts.tolist())), total, target)
+
+    chosen = []
+    for answer in values.tolist():
+        if taken[answer]:
+            bucket = np.flatnonzero(flat == answer)
+            chosen.extend(bucket[i] for i in random.sample(range(len(bucket)), taken[answer]))
+    chosen = np.sort(np.array(chosen, dtype=np.int64))
+
+    starts = np.cumsum([0] + sizes)
+    image = np.searchsorted(starts, chosen, side="right") - 1
+    per_image = [[] for _ in answers]
+    for k, index in zip(image.tolist(), (chosen - starts[image]).tolist()):
+        per_image[k].append(index)
+    return per_image
+
+
+def balance_by_sweep(images, target):
+    """
+    Answer-balanced choice over the sweep cells of a dataset, streamed cell by cell.
+
+    Dump rows come with the images of a sweep cell next to each other, so a cell ends where the
+    sweep changes: its images are balanced with balanced_choice and yielded before the next cell is
+    read. Only the current cell's answers, quotas and payloads are held; a sweep that comes back
+    later is balanced as a cell of its own.
+
+    Args:
+        images: Iterable of (sweep, answers, quota, payload) per image: the image's sweep cell, the
+            answers of its candidate questions, the number of questions it gets by default, and
+            what the caller needs to build the chosen questions (kept small, e.g. the dump row)
+        target: UNIFORM or {answer: weight}
+
+    Yields:
+        (payload, chosen candidate indices) per image, in the order of `images`
+    """
+    cell, cell_sweep = [], None
+    for sweep, answers, quota, payload in images:
+        if cell and sweep != cell_sweep:
+            yield from _balance_cell(cell, target)
+            cell = []
+        cell_sweep = sweep
+        cell.append((answers, quota, payload))
+    if cell:
+        yield from _balance_cell(cell, target)
+
+
+def _balance_cell(cell, target):
+    chosen = balanced_choice([answers for answers, _, _ in cell], sum(quota for _, quota, _ in cell), target)
+    for (_, _, payload), indices in zip(cell, chosen):
+        yield payload, indices
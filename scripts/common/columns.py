@@ -0,0 +1,132 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Typed columns of the dataset_dump files.
+
+The nested dataset_dump columns (shape and color counts, visual spatial grids, sweep tuples) used to
+be stored as Python repr strings and parsed back with ast.literal_eval row by row. The generators
+now return them as plain lists and records, which Parquet stores as list/struct columns and JSON
+stores natively:
+
+    shape_dictionary  {'circle': 3}                  -> [{"shape": "circle", "count": 3}]
+    color_dictionary  {('circle', 'red'): 1}         -> [{"shape": "circle", "color": "red", "count": 1}]
+    placement         {'circle': (4, 3)}             -> [{"shape": "circle", "requested": 4, "placed": 3}]
+    placement_stats   {'fill_estimate': 0.62, 'attempts': 57, ...}, stored as it is (a struct)
+    spatial_dict      [{(0, 0): ('square', 'white')}] -> [{"rows": 1, "cols": 1, "shape_codes": [0], "fill_codes": [0]}]
+    sweep             (3, 3, 1)                      -> [3, 3, 1]
+
+The *_from_records functions turn a typed value back into the Python object, which is also what
+the dataset_dump.csv shows, so the csv files are unchanged. Grids are stored as the uint8 shape and
+fill codes of common.grids; their names are only spelled out for the csv.
+"""
+
+import ast
+import csv
+import os
+
+from common.grids import GridSet, record_cells
+from common.sink import MetadataSink
+
+
+def counts_to_records(counts, key="shape"):
+    """{name: count} -> [{key: name, "count": count}]"""
+    return [{key: name, "count": count} for name, count in counts.items()]
+
+
+def counts_from_records(records, key="shape"):
+    """[{key: name, "count": count}] -> {name: count}"""
+    return {r[key]: r["count"] for r in records}
+
+
+def pair_counts_to_records(counts, keys=("shape", "color")):
+    """{(a, b): count} -> [{keys[0]: a, keys[1]: b, "count": count}]"""
+    return [{keys[0]: a, keys[1]: b, "count": count} for (a, b), count in counts.items()]
+
+
+def pair_counts_from_records(records, keys=("shape", "color")):
+    """[{keys[0]: a, keys[1]: b, "count": count}] -> {(a, b): count}"""
+    return {(r[keys[0]], r[keys[1]]): r["count"] for r in records}
+
+
+def placement_to_records(counts, key="shape"):
+    """{name: (requested, placed)} -> [{key: name, "requested": requested, "placed": placed}]"""
+    return [{key: name, "requested": requested, "placed": placed} for name, (requested, placed) in counts.items()]
+
+
+def placement_from_records(records, key="shape"):
+    """[{key: name, "requested": requested, "placed": placed}] -> {name: (requested, placed)}"""
+    return {r[key]: (r["requested"], r["placed"]) for r in records}
+
+
+def grids_to_records(spatial_dicts):
+    """Turn {(row, col): (shape, color)} grids into records with row-major shape and fill code lists."""
+    return [GridSet.from_dicts([grid]).to_records()[0] for grid in spatial_dicts]
+
+
+def grids_from_records(records):
+    """Turn grid records back into {(row, col): (shape, color)} dictionaries."""
+    return [{(i // g["cols"], i % g["cols"]): cell for i, cell in enumerate(record_cells(g))}
+            for g in records]
+
+
+def decode_row(row, decoders):
+    """Apply the per-column decoders to a typed row, leaving the other columns as they are."""
+    return {k: decoders[k](v) if k in decoders else v for k, v in row.items()}
+
+
+def encode_row(row, encoders):
+    """Apply the per-column encoders to a row of Python objects."""
+    return {k: encoders[k](v) if k in encoders else v for k, v in row.items()}
+
+
+def typed_dump_path(dir_path, stem="dataset_dump"):
+    """Path of the typed dump: Parquet when pyarrow is installed, JSON lines otherwise."""
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return os.path.join(dir_path, stem + ".jsonl")
+    return os.path.join(dir_path, stem + ".parquet")
+
+
+def write_dump(rows, dir_path, decoders, stem="dataset_dump", arrow_types=None):
+    """
+    Stream typed rows into the typed dump and into the dataset_dump.csv kept for compatibility.
+
+    Args:
+        rows: Iterable of typed rows
+        dir_path: Sweep directory
+        decoders: Per-column functions giving the Python objects written to the csv
+        stem: File name without extension
+        arrow_types: Optional {column: function returning its pyarrow type} for the Parquet dump,
+            e.g. common.grids.records_arrow_type; other columns get the inferred types
+    """
+    with MetadataSink(typed_dump_path(dir_path, stem), arrow_types=arrow_types) as typed_sink, \
+            MetadataSink(os.path.join(dir_path, stem + ".csv")) as csv_sink:
+        for row in rows:
+            typed_sink.write(row)
+            csv_sink.write(decode_row(row, decoders))
+
+
+def read_dump(dir_path, encoders, stem="dataset_dump"):
+    """
+    Yield the typed rows of a sweep's dump.
+
+    Reads dataset_dump.parquet or dataset_dump.jsonl when present. Dumps written before the typed
+    format existed only have the csv; its repr columns are parsed with ast.literal_eval and encoded
+    with `encoders`, so callers always get typed rows.
+
+    Args:
+        dir_path: Sweep directory
+        encoders: Per-column functions turning the parsed csv values into typed values
+        stem: File name without extension
+    """
+    for ext in (".parquet", ".jsonl"):
+        path = os.path.join(dir_path, stem + ext)
+        if os.path.exists(path):
+            yield from MetadataSink.read(path)
+            return
+    with open(os.path.join(dir_path, stem + ".csv"), newline='') as f:
+        for row in csv.DictReader(f):
+            yield encode_row({k: ast.literal_eval(v) if k in encoders else v for k, v in row.items()},
+                             encoders)
@@ -0,0 +1,289 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Array form of the visual spatial grids.
+
+An image of k grids of rows x cols cells is held as two uint8 arrays of shape (k, rows, cols): the
+shape code and the fill code of every cell, indices into SHAPES and FILLS. That is two bytes per
+cell, where a {(row, col): (shape, fill)} dictionary costs a few hundred, and whole rows, columns
+or grids can be counted with NumPy instead of cell by cell.
+
+The generator builds a GridSet, the question builder reads one, and the typed dataset_dump stores
+the codes themselves, one record per grid with row-major code lists, written to Parquet as uint8
+lists (records_arrow_type). Only the legacy dataset_dump.csv spells the names out (see
+common.columns.grids_from_records), and records with name lists from earlier dumps still load:
+
+    grids = GridSet.from_records(row["spatial_dict"])
+    grids.to_records()           -> [{"rows": 3, "cols": 3, "shape_codes": [0, 2, ...], "fill_codes": [1, 0, ...]}, ...]
+    grids.cell(0, 2, 1)          -> ('circle', 'black')
+    grids.save_npz(f)            -> shapes, fills, shape_names, fill_names
+    grids.to_arrow()             -> one row per grid, shapes and fills as fixed-size uint8 lists
+
+to_arrow wraps the arrays without copying them; pyarrow is only needed for it and records_arrow_type.
+
+DirectionalCounts answers "how many black circles left of (r, c)": once an image has been asked a
+few such questions it builds cumulative counts along the rows and columns of every grid for every
+fill, shape and fill and shape filter, and each answer is then a difference of two lookups whatever
+the size of the grid.
+"""
+
+SHAPES = ("square", "circle", "triangle")
+FILLS = ("white", "black")
+SHAPE_CODES = {name: code for code, name in enumerate(SHAPES)}
+FILL_CODES = {name: code for code, name in enumerate(FILLS)}
+
+# Code of an attribute of a cell missing from a grid
+MISSING = 255
+
+
+def _decode(names, code):
+    return None if code == MISSING else names[code]
+
+
+def _encode(codes, name):
+    return MISSING if name is None else codes[name]
+
+
+def record_cells(record):
+    """(shape, fill) names of the cells of one grid record, row-major, from either record form."""
+    if "shape_codes" in record:
+        return [(_decode(SHAPES, shape), _decode(FILLS, fill))
+                for shape, fill in zip(record["shape_codes"], record["fill_codes"])]
+    return list(zip(record["shapes"], record["colors"]))
+
+
+def records_arrow_type():
+    """pyarrow type of a list of grid records, with the codes as uint8 lists."""
+    import pyarrow as pa
+
+    return pa.list_(pa.struct([("rows", pa.int32()), ("cols", pa.int32()),
+                               ("shape_codes", pa.list_(pa.uint8())), ("fill_codes", pa.list_(pa.uint8()))]))
+
+
+class GridSet:
+    def __init__(self, shapes, fills):
+        """
+        Wrap the cell codes of the grids of one image.
+
+        Args:
+            shapes: (k, rows, cols) array of shape codes, indices into SHAPES
+            fills: (k, rows, cols) array of fill codes, indices into FILLS
+        """
+        import numpy as np
+
+        self.shapes = np.asarray(shapes, dtype=np.uint8)
+        self.fills = np.asarray(fills, dtype=np.uint8)
+        if self.shapes.shape != self.fills.shape or self.shapes.ndim != 3:
+            raise ValueError(f"shapes {self.shapes.shape} and fills {self.fills.shape} "
+                             "must both be (k, rows, cols)")
+
+    @classmethod
+    def empty(cls, k, rows, cols):
+        """k grids of rows x cols cells, all missing."""
+        import numpy as np
+
+        return cls(np.full((k, rows, cols), MISSING, dtype=np.uint8),
+                   np.full((k, rows, cols), MISSING, dtype=np.uint8))
+
+    @property
+    def num_grids(self):
+        return self.shapes.shape[0]
+
+    @property
+    def rows(self):
+        return self.shapes.shape[1]
+
+    @property
+    def cols(self):
+        return self.shapes.shape[2]
+
+    def __len__(self):
+        return self.num_grids
+
+    def cell(self, grid, row, col):
+        """(shape, fill) names of a cell, (None, None) outside the grid."""
+        if not (0 <= grid < self.num_grids and 0 <= row < self.rows and 0 <= col < self.cols):
+            return None, None
+        return _decode(SHAPES, self.shapes[grid, row, col]), _decode(FILLS, self.fills[grid, row, col])
+
+    @classmethod
+    def from_dicts(cls, spatial_dicts):
+        """Build from {(row, col): (shape, fill)} dictionaries, padded to the largest grid."""
+        rows = max(r for grid in spatial_dicts for r, _ in grid) + 1
+        cols = max(c for grid in spatial_dicts for _, c in grid) + 1
+        grids = cls.empty(len(spatial_dicts), rows, cols)
+        for k, grid in enumerate(spatial_dicts):
+            for (r, c), (shape, fill) in grid.items():
+                grids.shapes[k, r, c] = _encode(SHAPE_CODES, shape)
+                grids.fills[k, r, c] = _encode(FILL_CODES, fill)
+        return grids
+
+    def to_dicts(self):
+        """{(row, col): (shape, fill)} dictionary of each grid, without the missing cells."""
+        dicts = []
+        for shapes, fills in zip(self.shapes.tolist(), self.fills.tolist()):
+            dicts.append({(r, c): (_decode(SHAPES, shape), _decode(FILLS, fill))
+                          for r, (shape_row, fill_row) in enumerate(zip(shapes, fills))
+                          for c, (shape, fill) in enumerate(zip(shape_row, fill_row))
+                          if shape != MISSING or fill != MISSING})
+        return dicts
+
+    @classmethod
+    def from_records(cls, records):
+        """Build from the dataset_dump records of to_records, or the name lists of earlier dumps."""
+        import numpy as np
+
+        rows = max(g["rows"] for g in records)
+        cols = max(g["cols"] for g in records)
+        grids = cls.empty(len(records), rows, cols)
+        for k, g in enumerate(records):
+            size = (g["rows"], g["cols"])
+            if "shape_codes" in g:
+                shape_codes, fill_codes = g["shape_codes"], g["fill_codes"]
+            else:
+                shape_codes = [_encode(SHAPE_CODES, shape) for shape in g["shapes"]]
+                fill_codes = [_encode(FILL_CODES, fill) for fill in g["colors"]]
+            grids.shapes[k, :size[0], :size[1]] = np.array(shape_codes, dtype=np.uint8).reshape(size)
+            grids.fills[k, :size[0], :size[1]] = np.array(fill_codes, dtype=np.uint8).reshape(size)
+        return grids
+
+    def to_records(self):
+        """The dataset_dump records of the grids: size and row-major shape and fill codes of each grid."""
+        return [{"rows": self.rows, "cols": self.cols,
+                 "shape_codes": shapes.ravel().tolist(), "fill_codes": fills.ravel().tolist()}
+                for shapes, fills in zip(self.shapes, self.fills)]
+
+    def save_npz(self, file):
+        """Write the codes and the names they stand for to an .npz file or file object."""
+        import numpy as np
+
+        np.savez(file, shapes=self.shapes, fills=self.fills, shape_names=np.array(SHAPES), fill_names=np.array(FILLS))
+
+    @classmethod
+    def load_npz(cls, file):
+        """Read a GridSet written by save_npz."""
+        import numpy as np
+
+        with np.load(file) as data:
+            if tuple(data["shape_names"]) != SHAPES or tuple(data["fill_names"]) != FILLS:
+                raise ValueError("grids were saved with different shape or fill codes")
+            return cls(data["shapes"], data["fills"])
+
+    def to_arrow(self):
+        """
+        pyarrow.Table with one row per grid and the row-major codes in fixed-size uint8 list
+        columns "shapes" and "fills"; the table shares the arrays' memory.
+        """
+        import numpy as np
+        import pyarrow as pa
+
+        size = self.rows * self.cols
+        columns = {name: pa.FixedSizeListArray.from_arrays(pa.array(np.ascontiguousarray(codes).ravel()), size)
+                   for name, codes in (("shapes", self.shapes), ("fills", self.fills))}
+        metadata = {"rows": str(self.rows), "cols": str(self.cols),
+                    "shape_names": ",".join(SHAPES), "fill_names": ",".join(FILLS)}
+        return pa.table(columns, metadata=metadata)
+
+
+# Filters of DirectionalCounts: (fill, shape) with None matching any value
+COUNT_FILTERS = ([(fill, None) for fill in FILLS] + [(None, shape) for shape in SHAPES]
+                 + [(fill, shape) for fill in FILLS for shape in SHAPES] + [(None, None)])
+COUNT_FILTER_INDEX = {f: i for i, f in enumerate(COUNT_FILTERS)}
+DIRECTIONS = ("left", "right", "up", "down")
+
+
+class DirectionalCounts:
+    # Counts answered by scanning the row or column before the cumulative counts are built; the
+    # build costs about as much as this many scans on the sweep's grid sizes
+    BUILD_AFTER = 8
+
+    def __init__(self, grids):
+        """
+        Number of cells matching a filter of COUNT_FILTERS left, right, above or below a cell.
+
+        The first BUILD_AFTER counts scan the cells. After that, cumulative counts along the
+        rows and columns of every grid are built for every filter, and each count is the
+        difference of two lookups.
+
+        Args:
+            grids: GridSet
+        """
+        self.grids = grids
+        self.rows, self.cols = grids.rows, grids.cols
+        self.rows_before = None
+        self.cols_before = None
+        self._scans = 0
+
+    def _build(self):
+        import numpy as np
+
+        grids = self.grids
+        fill_masks = grids.fills[None] == np.arange(len(FILLS), dtype=np.uint8)[:, None, None, None]
+        shape_masks = grids.shapes[None] == np.arange(len(SHAPES), dtype=np.uint8)[:, None, None, None]
+        both_masks = (fill_masks[:, None] & shape_masks[None]).reshape((-1,) + grids.shapes.shape)
+        # masks[f, k, r, c]: cell (r, c) of grid k matches filter f
+        masks = np.concatenate([fill_masks, shape_masks, both_masks,
+                                (grids.shapes != MISSING)[None] | (grids.fills != MISSING)[None]])
+        num_filters, k, rows, cols = masks.shape
+        # rows_before[f, k, r, c]: matching cells in row r left of column c, c = cols counts the whole row
+        self.rows_before = np.zeros((num_filters, k, rows, cols + 1), dtype=np.int32)
+        np.cumsum(masks, axis=3, out=self.rows_before[..., 1:])
+        # cols_before[f, k, r, c]: matching cells in column c above row r
+        self.cols_before = np.zeros((num_filters, k, rows + 1, cols), dtype=np.int32)
+        np.cumsum(masks, axis=2, out=self.cols_before[:, :, 1:])
+
+    def _scan(self, grid, row, col, direction, fill, shape):
+        import numpy as np
+
+        if direction in ('left', 'right'):
+            cells = (grid, row, slice(col + 1, self.cols) if direction == 'right' else slice(0, col))
+        else:
+            cells = (grid, slice(row + 1, self.rows) if direction == 'down' else slice(0, row), col)
+        shapes, fills = self.grids.shapes[cells], self.grids.fills[cells]
+        matches = (shapes != MISSING) | (fills != MISSING)
+        if fill is not None:
+            matches &= fills == FILL_CODES[fill]
+        if shape is not None:
+            matches &= shapes == SHAPE_CODES[shape]
+        return int(np.count_nonzero(matches))
+
+    def all_counts(self):
+        """
+        Every count at once.
+
+        Returns:
+            numpy.ndarray: (len(DIRECTIONS), len(COUNT_FILTERS), k, rows, cols) int32 array of the
+            count in each direction from each cell for each filter, -1 where the direction leaves
+            the grid right away (e.g. left of the first column)
+        """
+        import numpy as np
+
+        if self.rows_before is None:
+            self._build()
+        rows_before, cols_before = self.rows_before, self.cols_before
+        counts = np.stack([rows_before[..., :-1],
+                           rows_before[..., -1:] - rows_before[..., 1:],
+                           cols_before[:, :, :-1],
+                           cols_before[:, :, -1:] - cols_before[:, :, 1:]])
+        counts[0, ..., 0] = -1
+        counts[1, ..., -1] = -1
+        counts[2, ..., 0, :] = -1
+        counts[3, ..., -1, :] = -1
+        return counts
+
+    def count(self, grid, row, col, direction, fill=None, shape=None):
+        """Number of cells matching (fill, shape) strictly in `direction` of (row, col), in its row or column."""
+        if self.rows_before is None:
+            if self._scans < self.BUILD_AFTER:
+                self._scans += 1
+                return self._scan(grid, row, col, direction, fill, shape)
+            self._build()
+        f = COUNT_FILTER_INDEX[(fill, shape)]
+        if direction == 'left':
+            return int(self.rows_before[f, grid, row, col])
+        if direction == 'right':
+            return int(self.rows_before[f, grid, row, self.cols] - self.rows_before[f, grid, row, col + 1])
+        if direction == 'up':
+            return int(self.cols_before[f, grid, row, col])
+        return int(self.cols_before[f, grid, self.rows, col] - self.cols_before[f, grid, row + 1, col])
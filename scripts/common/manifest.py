@@ -0,0 +1,183 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Content-addressed manifest of generated sweep items.
+
+Every finished item appends one JSON line with its id, parameters, seed key, the sha256 of each
+output file, its metadata row and its status. The last line of an id wins. On a rerun an item is
+skipped only if its record is "done", was generated from the same seed key and parameters, and
+every output file still exists with the recorded hash; anything missing or corrupt is generated
+again. The parameters include the item's output modes (see common.sweep.item_params), so switching
+e.g. --svg-symbols on an existing sweep regenerates the items instead of keeping stale files.
+
+Only the id, key, status and output hashes of each item are kept in memory. Metadata rows stay in
+the file and are read back through the byte offset of their line, so a manifest of a large sweep
+costs little memory.
+"""
+
+import hashlib
+import json
+import os
+
+
+def file_sha256(path, block_size=1 << 20):
+    """Return the hex sha256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _jsonable(value):
+    """Fallback for json.dumps: functions by name, everything else by str()."""
+    if callable(value):
+        return getattr(value, "__qualname__", str(value))
+    return str(value)
+
+
+def _json_exact(value):
+    """Return True if the value comes back unchanged from a JSON round trip."""
+    try:
+        return json.loads(json.dumps(value)) == value
+    except (TypeError, ValueError):
+        return False
+
+
+def _as_json(value):
+    """The value as it reads back from the manifest file."""
+    return json.loads(json.dumps(value, default=_jsonable))
+
+
+def _row_for_json(row):
+    """
+    Keep JSON values as they are and store anything else (tuples, dicts with tuple keys, functions)
+    as the text pandas writes to the csv, so the csv rebuilt from the manifest is unchanged.
+    """
+    if row is None:
+        return None
+    return {k: v if _json_exact(v) else str(v) for k, v in row.items()}
+
+
+class Manifest:
+    def __init__(self, path):
+        """
+        Load (or start) the manifest stored at `path`.
+
+        Args:
+            path: Path of the manifest.jsonl file, output paths are stored relative to its directory
+        """
+        self.path = path
+        self.root = os.path.dirname(os.path.abspath(path))
+        self.records = {}
+        self.offsets = {}
+        if os.path.exists(path):
+            end = 0
+            with open(path, 'rb') as f:
+                for line in f:
+                    offset, end = end, end + len(line)
+                    if not line.endswith(b"\n"):
+                        # Torn last line from a crash, the item is simply redone
+                        end = offset
+                        break
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._remember(record, offset)
+            if end < os.path.getsize(path):
+                # Drop the torn tail so the next record starts on a line of its own
+                with open(path, 'r+b') as f:
+                    f.truncate(end)
+
+    def _remember(self, record, offset):
+        record.pop("row", None)
+        self.records[record["id"]] = record
+        self.offsets[record["id"]] = offset
+
+    def _abs(self, rel_path):
+        return os.path.join(self.root, rel_path)
+
+    def is_complete(self, item_id, key, params=None):
+        """
+        Return True if the item is done, was generated with `key` (and `params`, when given), and
+        its outputs are intact.
+        """
+        record = self.records.get(item_id)
+        if record is None or record.get("status") != "done" or record.get("key") != key:
+            return False
+        if params is not None and record.get("params") != _as_json(params):
+            return False
+        for rel_path, digest in record["outputs"].items():
+            path = self._abs(rel_path)
+            if not os.path.exists(path) or file_sha256(path) != digest:
+                return False
+        return True
+
+    def record(self, item_id, key, params, outputs, row=None, status="done", error=None, contents=None):
+        """
+        Append the record of one item and flush it to disk.
+
+        Args:
+            item_id: Unique id of the item within the sweep (its output filename)
+            key: Hex seed key of the item
+            params: JSON-serialisable generation parameters (sweep tuple, instance, master seed, ...)
+            outputs: Paths of the files written for the item
+            row: Metadata row of the item, used to rebuild the csv files
+            status: "done" or "failed"
+            error: Error message for failed items
+            contents: Optional {absolute path: bytes} of outputs still being written, hashed from
+                memory instead of read back
+
+        Returns:
+            dict: The row as stored in the manifest and returned by `row()`
+        """
+        contents = contents or {}
+        digests = {}
+        if status == "done":
+            for p in outputs:
+                p = os.path.abspath(p)
+                digests[os.path.relpath(p, self.root)] = (hashlib.sha256(contents[p]).hexdigest()
+                                                          if p in contents else file_sha256(p))
+        record = {
+            "id": item_id,
+            "key": key,
+            "params": params,
+            "outputs": digests,
+            "row": _row_for_json(row),
+            "status": status,
+        }
+        if error is not None:
+            record["error"] = error
+        line = json.dumps(record, default=_jsonable) + "\n"
+        with open(self.path, 'ab') as f:
+            offset = f.tell()
+            f.write(line.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        record = json.loads(line)
+        row = record["row"]
+        self._remember(record, offset)
+        return row
+
+    def row(self, item_id):
+        """Return the metadata row of a recorded item, read back from the manifest file."""
+        with open(self.path, 'rb') as f:
+            f.seek(self.offsets[item_id])
+            return json.loads(f.readline())["row"]
+
+    def rows(self, item_ids):
+        """Yield the metadata rows of the completed items among `item_ids`, in that order."""
+        with open(self.path, 'rb') as f:
+            for i in item_ids:
+                if self.records.get(i, {}).get("status") != "done":
+                    continue
+                f.seek(self.offsets[i])
+                yield json.loads(f.readline())["row"]
+
+    def reset(self):
+        """Forget every record and truncate the manifest file."""
+        self.records = {}
+        self.offsets = {}
+        open(self.path, 'w').close()
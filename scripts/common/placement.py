@@ -0,0 +1,329 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Free-space sampling of shape positions for the 2D composition generators.
+
+The default ("rejection") placement draws candidate centers uniformly over the canvas and retries
+until one fits, so on a crowded canvas most attempts land on shapes already placed and instances
+are dropped after the last attempt. The "free_space" placement draws candidate centers only from
+the cells of a grid that are not yet known to be blocked: after each shape is placed, every cell
+lying entirely inside the region where any later shape would collide with it is removed. The exact
+overlap test still decides every placement, so the rules (min_distance_inwards, negative overlap
+budgets included) are the same; the sampler only stops proposing positions that are sure to fail,
+which spreads the shapes like Poisson-disk (blue noise) samples. When no free cell is left the
+remaining instances are reported as not placed without spending their attempts.
+
+Free-space placement draws a different random stream than rejection placement, so a seed gives a
+different composition in each mode.
+
+`FreeSpaceSampler` only knows the space blocked for the smallest shape. `OccupancyGrid`, used by the
+joint shape and color composition whose overlap test is the axis-aligned box, keeps a bitmap of the
+cells any placed box touches instead, and each draw is sized to the shape at hand: with the shape's
+rotation drawn first, a center is drawn only from the cells whose neighbourhood of the shape's half
+width and half height holds no occupied cell, found with a summed-area table of the bitmap. Such a
+center cannot overlap anything placed, so a draw succeeds at once or reports that the shape does not
+fit at that rotation.
+
+Feasibility
+-----------
+Random placement stops finding room well before the canvas is covered: random disks jam at about
+55% of the plane. Before placing anything the composition generators estimate, from the expected
+instance counts and sizes, the fraction of the canvas the requested instances need. When it is
+above MAX_FILL, --feasibility abort gives up the remaining instances once one fails to fit, and
+--feasibility rescale shrinks every shape by the factor that brings the estimate down to MAX_FILL.
+The default, place, tries every instance as before. Either way the estimate, the factor, the
+attempts spent and the fallbacks taken are recorded (see placement_stats).
+"""
+
+import math
+import random
+
+PLACEMENT_MODES = ("rejection", "free_space")
+FEASIBILITY_MODES = ("place", "abort", "rescale")
+
+# Estimated fraction of the canvas above which a composition is treated as not fitting
+MAX_FILL = 0.5
+# Smallest factor --feasibility rescale shrinks shapes by, below it they are hard to tell apart
+MIN_FIT_SCALE = 0.25
+
+
+def add_placement_argument(parser):
+    """Add the --placement option of the shape composition sweep scripts."""
+    parser.add_argument("--placement", choices=PLACEMENT_MODES, default="rejection",
+                        help="How shape positions are drawn; free_space only samples free canvas")
+    return parser
+
+
+def add_feasibility_argument(parser):
+    """Add the --feasibility option of the shape composition sweep scripts."""
+    parser.add_argument("--feasibility", choices=FEASIBILITY_MODES, default="place",
+                        help="What to do when the requested shapes are estimated not to fit: try every "
+                             "instance, give up the rest after the first that fails, or shrink all shapes")
+    return parser
+
+
+def rotated_box_area(width, height):
+    """Mean area of the axis-aligned bounding box of a width x height box at a uniform random rotation."""
+    return width * height + (width ** 2 + height ** 2) / math.pi
+
+
+def fit_scale(fill_at, max_fill=MAX_FILL, tolerance=1e-3):
+    """
+    Largest factor f <= 1 with fill_at(f) <= max_fill, found by bisection.
+
+    Args:
+        fill_at: Estimated fill of the canvas with every shape scaled by f, growing with f
+        max_fill: Fill to bring the estimate down to
+        tolerance: Precision of the factor
+
+    Returns:
+        float: 1.0 when the shapes fit as they are, never less than MIN_FIT_SCALE
+    """
+    if fill_at(1.0) <= max_fill:
+        return 1.0
+    low, high = MIN_FIT_SCALE, 1.0
+    if fill_at(low) > max_fill:
+        return low
+    while high - low > tolerance:
+        middle = (low + high) / 2
+        if fill_at(middle) <= max_fill:
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+def placement_stats(fill_estimate, scale_factor=1.0):
+    """
+    Telemetry of one composition's placement, stored in the placement_stats column of the dump.
+    The placement loop fills in the counts:
+
+        fill_estimate  fraction of the canvas the requested instances are expected to need
+        scale_factor   factor every shape was shrunk by (--feasibility rescale), 1 otherwise
+        attempts       candidate positions tested
+        fallbacks      instances retried at a smaller scale after failing at their own
+        skipped        instances given up without an attempt, once the canvas was full
+    """
+    return {'fill_estimate': round(fill_estimate, 4), 'scale_factor': round(scale_factor, 4),
+            'attempts': 0, 'fallbacks': 0, 'skipped': 0}
+
+
+def shortfall_note(placement_counts):
+    """
+    Describe the instances a composition could not place, for the sweep's progress line.
+
+    Args:
+        placement_counts: {shape type: (requested instances, placed instances)}
+
+    Returns:
+        str: " (placed 9 of 12 requested instances: star 2 of 4, hexagon 3 of 4)", or "" when
+        every instance was placed
+    """
+    short = [(name, requested, placed) for name, (requested, placed) in placement_counts.items()
+             if placed < requested]
+    if not short:
+        return ""
+    requested = sum(r for r, _ in placement_counts.values())
+    placed = sum(p for _, p in placement_counts.values())
+    details = ", ".join(f"{name} {p} of {r}" for name, r, p in short)
+    return f" (placed {placed} of {requested} requested instances: {details})"
+
+
+class FreeSpaceSampler:
+    # Cells drawn per sample looking for one that meets the shape's box of valid centers
+    MAX_DRAWS = 8
+
+    def __init__(self, xmin, ymin, xmax, ymax, cell_size):
+        """
+        Cover the region where shape centers may fall with a grid of free cells.
+
+        Args:
+            xmin, ymin, xmax, ymax: Region of possible centers, e.g. the canvas less the margin of
+                the smallest shape
+            cell_size: Side of a grid cell, a fraction of the smallest shape keeps the blocked
+                regions accurate
+        """
+        self.x0, self.y0 = xmin, ymin
+        self.cell_size = float(cell_size)
+        self.cols = max(1, math.ceil((xmax - xmin) / self.cell_size))
+        self.rows = max(1, math.ceil((ymax - ymin) / self.cell_size))
+        # Free cells in a list for uniform draws, and their position in it for O(1) removal
+        self._free = [(i, j) for j in range(self.rows) for i in range(self.cols)]
+        self._position = {cell: k for k, cell in enumerate(self._free)}
+
+    def __len__(self):
+        return len(self._free)
+
+    def sample(self, xmin, ymin, xmax, ymax):
+        """
+        Draw a center in a random free cell that meets the box of valid centers of the shape.
+
+        Cells are drawn uniformly from the free ones until one meets the box, at most MAX_DRAWS
+        times; the point drawn in the last cell is clamped to the box.
+
+        Returns:
+            tuple: (x, y), or None when no cell is free
+        """
+        if not self._free:
+            return None
+        size = self.cell_size
+        for _ in range(self.MAX_DRAWS):
+            i, j = random.choice(self._free)
+            left, top = self.x0 + i * size, self.y0 + j * size
+            if left <= xmax and xmin <= left + size and top <= ymax and ymin <= top + size:
+                break
+        x = left + random.random() * size
+        y = top + random.random() * size
+        return min(max(x, xmin), xmax), min(max(y, ymin), ymax)
+
+    def _remove(self, cell):
+        k = self._position.pop(cell, None)
+        if k is None:
+            return
+        last = self._free.pop()
+        if last != cell:
+            self._free[k] = last
+            self._position[last] = k
+
+    def block_disk(self, x, y, radius):
+        """Remove the cells lying entirely within `radius` of (x, y)."""
+        if radius <= 0:
+            return
+        size = self.cell_size
+        x, y = x - self.x0, y - self.y0
+        for i in range(max(0, math.floor((x - radius) / size)), min(self.cols, math.floor((x + radius) / size) + 1)):
+            # Distance along x to the farther side of the column
+            dx = max(abs(i * size - x), abs((i + 1) * size - x))
+            if dx >= radius:
+                continue
+            reach = math.sqrt(radius ** 2 - dx ** 2)
+            for j in range(max(0, math.ceil((y - reach) / size)), min(self.rows, math.floor((y + reach) / size))):
+                self._remove((i, j))
+
+    def block_box(self, xmin, ymin, xmax, ymax):
+        """Remove the cells lying entirely inside the box (xmin, ymin, xmax, ymax)."""
+        size = self.cell_size
+        xmin, xmax, ymin, ymax = xmin - self.x0, xmax - self.x0, ymin - self.y0, ymax - self.y0
+        for i in range(max(0, math.ceil(xmin / size)), min(self.cols, math.floor(xmax / size))):
+            for j in range(max(0, math.ceil(ymin / size)), min(self.rows, math.floor(ymax / size))):
+                self._remove((i, j))
+
+
+class OccupancyGrid:
+    # Cells checked one by one per sample before all cells are checked at once
+    MAX_DRAWS = 8
+
+    def __init__(self, xmin, ymin, xmax, ymax, cell_size):
+        """
+        Cover the region where shapes may lie with a bitmap of occupied cells, all free at first.
+
+        Args:
+            xmin, ymin, xmax, ymax: Region covered, e.g. the canvas less its padding
+            cell_size: Side of a cell; smaller cells waste less space around placed boxes
+        """
+        import numpy as np
+
+        self.x0, self.y0 = xmin, ymin
+        self.cell_size = float(cell_size)
+        self.cols = max(1, math.ceil((xmax - xmin) / self.cell_size))
+        self.rows = max(1, math.ceil((ymax - ymin) / self.cell_size))
+        self.occupied = np.zeros((self.rows, self.cols), dtype=bool)
+        self._num_free = self.occupied.size
+        self._table = None
+
+    def __len__(self):
+        return self._num_free
+
+    def block_box(self, xmin, ymin, xmax, ymax):
+        """Mark every cell the box (xmin, ymin, xmax, ymax) touches as occupied."""
+        size = self.cell_size
+        i0 = max(0, math.floor((xmin - self.x0) / size))
+        i1 = min(self.cols, math.floor((xmax - self.x0) / size) + 1)
+        j0 = max(0, math.floor((ymin - self.y0) / size))
+        j1 = min(self.rows, math.floor((ymax - self.y0) / size) + 1)
+        if i0 < i1 and j0 < j1:
+            region = self.occupied[j0:j1, i0:i1]
+            self._num_free -= int(region.size - region.sum())
+            region[...] = True
+            self._table = None
+
+    def _summed_area(self):
+        import numpy as np
+
+        if self._table is None:
+            # table[j, i]: occupied cells in rows < j and columns < i
+            self._table = np.zeros((self.rows + 1, self.cols + 1), dtype=np.int32)
+            self._table[1:, 1:] = self.occupied.cumsum(axis=0).cumsum(axis=1)
+        return self._table
+
+    def _occupied_count(self, table, i0, j0, i1, j1):
+        # Occupied cells in columns i0..i1-1 and rows j0..j1-1
+        return table[j1, i1] - table[j0, i1] - table[j1, i0] + table[j0, i0]
+
+    def _cell_range(self, xmin, ymin, xmax, ymax):
+        # Columns i0..i1-1 and rows j0..j1-1 of the cells meeting a box
+        size = self.cell_size
+        return (max(0, math.ceil((xmin - self.x0) / size) - 1), max(0, math.ceil((ymin - self.y0) / size) - 1),
+                min(self.cols, math.floor((xmax - self.x0) / size) + 1),
+                min(self.rows, math.floor((ymax - self.y0) / size) + 1))
+
+    def _free_cells(self, kx, ky, i0, j0, i1, j1):
+        # Flat indices, within columns i0..i1-1 and rows j0..j1-1, of the cells with no occupied
+        # cell within kx columns and ky rows
+        import numpy as np
+
+        # padded[j + ky, i + kx] is the summed-area table at the row and column clamped to the grid
+        padded = np.pad(self._summed_area(), ((ky, ky), (kx, kx)), mode='edge')
+        top, bottom = slice(j0, j1), slice(j0 + 2 * ky + 1, j1 + 2 * ky + 1)
+        left, right = slice(i0, i1), slice(i0 + 2 * kx + 1, i1 + 2 * kx + 1)
+        counts = padded[bottom, right] - padded[top, right] - padded[bottom, left] + padded[top, left]
+        return np.flatnonzero(counts == 0)
+
+    def has_room(self, half_width, half_height, xmin, ymin, xmax, ymax):
+        """Whether sample would find a cell for a box of these half sizes."""
+        i0, j0, i1, j1 = self._cell_range(xmin, ymin, xmax, ymax)
+        if i0 >= i1 or j0 >= j1:
+            return False
+        size = self.cell_size
+        return len(self._free_cells(math.ceil(half_width / size), math.ceil(half_height / size),
+                                    i0, j0, i1, j1)) > 0
+
+    def sample(self, half_width, half_height, xmin, ymin, xmax, ymax):
+        """
+        Draw a center at which a box of the given half sizes touches no occupied cell.
+
+        A cell qualifies when it meets the box of valid centers and no occupied cell lies within
+        ceil(half size / cell_size) cells of it along either axis. Up to MAX_DRAWS cells meeting
+        the box are drawn and checked against the summed-area table; when none qualifies every cell
+        is checked at once. Either way the cell is uniform among the qualifying ones. The point drawn
+        in it is clamped to the box of valid centers, which keeps it in the cell.
+
+        Returns:
+            tuple: (x, y), or None when no cell has the clearance
+        """
+        size = self.cell_size
+        kx, ky = math.ceil(half_width / size), math.ceil(half_height / size)
+        i0, j0, i1, j1 = self._cell_range(xmin, ymin, xmax, ymax)
+        if i0 >= i1 or j0 >= j1:
+            return None
+        table = self._summed_area()
+
+        cell = None
+        for _ in range(self.MAX_DRAWS):
+            i, j = random.randrange(i0, i1), random.randrange(j0, j1)
+            if not self._occupied_count(table, max(0, i - kx), max(0, j - ky),
+                                        min(self.cols, i + kx + 1), min(self.rows, j + ky + 1)):
+                cell = i, j
+                break
+        if cell is None:
+            free = self._free_cells(kx, ky, i0, j0, i1, j1)
+            if not len(free):
+                return None
+            j, i = divmod(int(free[random.randrange(len(free))]), i1 - i0)
+            cell = i0 + i, j0 + j
+
+        i, j = cell
+        x = self.x0 + (i + random.random()) * size
+        y = self.y0 + (j + random.random()) * size
+        return min(max(x, xmin), xmax), min(max(y, ymin), ymax)
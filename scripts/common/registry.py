@@ -0,0 +1,89 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Task name to generator module lookup.
+
+The generator scripts have no side effects at import and keep their heavy dependencies (pandas,
+matplotlib, tqdm) inside the functions that use them, so a single generator function can
+be imported cheaply, e.g. `load_generator("2D_visual_spatial").generate_sweep_item`. The 3D
+generators import bpy and only load inside Blender.
+
+The dataset_creator scripts that turn a sweep into questions live in directories that are not
+packages, so `load_builder` imports them from their file.
+"""
+
+import importlib
+import importlib.util
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+GENERATORS = {
+    "2D_shape_discrimination": "scripts.2D.shape_discrimination",
+    "2D_color_and_shape_disambiguation": "scripts.2D.joint_shape_color_disambiguation",
+    "2D_visual_spatial": "scripts.2D.visual_spatial",
+    "2D_letter_disambiguation": "scripts.2D.letter_disambiguation_generator",
+    "2D_visual_closure": "scripts.2D.visual_closure",
+    "2D_visual_figure_ground": "scripts.2D.visual_figure_ground",
+    "2D_visual_form_constancy": "scripts.2D.visual_form_constancy",
+    "3D_form_constancy": "scripts.3D.3D_form_constancy",
+    "3D_letter_disambiguation": "scripts.3D.3D_letter_disambiguation",
+    "3D_color_and_shape_disambiguation": "scripts.3D.3D_shape_and_color_disambiguation",
+    "3D_shape_discrimination": "scripts.3D.3D_shape_discrimination",
+    "3D_visual_spatial": "scripts.3D.3D_visual_spatial",
+}
+
+BUILDERS = {
+    "2D_shape_discrimination": "2D_DoYouSeeMe/geometric_dataset/dataset_creator.py",
+    "2D_color_and_shape_disambiguation": "2D_DoYouSeeMe/color_and_shape_disambiguation/dataset_creator_color.py",
+    "2D_visual_spatial": "2D_DoYouSeeMe/visual_spatial/spatial_dataset_converter.py",
+    "3D_form_constancy": "3D_DoYouSeeMe/3D_visual_form_constancy/dataset_creator.py",
+    "3D_letter_disambiguation": "3D_DoYouSeeMe/3D_letter_disambiguation/dataset_creator.py",
+    "3D_color_and_shape_disambiguation": "3D_DoYouSeeMe/3D_color_and_shape_disambiguation/dataset_creator.py",
+    "3D_shape_discrimination": "3D_DoYouSeeMe/3D_shape_discrimination/dataset_creator.py",
+    "3D_visual_spatial": "3D_DoYouSeeMe/3D_visual_spatial/dataset_creator.py",
+}
+
+
+def load_generator(task):
+    """
+    Import the generator module of a task without running its sweep.
+
+    Args:
+        task: Task name, as in the TASK constant of the script
+
+    Returns:
+        module: The generator module, exposing `main(argv=None)` and its generation functions
+    """
+    if task not in GENERATORS:
+        raise KeyError(f"Unknown task {task!r}, expected one of {sorted(GENERATORS)}")
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    return importlib.import_module(GENERATORS[task])
+
+
+def load_builder(task):
+    """
+    Import the dataset_creator module of a task without running it.
+
+    Args:
+        task: Task name, as in GENERATORS
+
+    Returns:
+        module: The builder module, exposing `main()` and its question functions
+    """
+    if task not in BUILDERS:
+        raise KeyError(f"No dataset builder for task {task!r}, expected one of {sorted(BUILDERS)}")
+    name = f"{task}_dataset_creator"
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(REPO_ROOT, BUILDERS[task]))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[name]
+            raise
+    return sys.modules[name]
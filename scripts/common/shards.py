@@ -0,0 +1,171 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Size-bounded tar shards of generated items, in the WebDataset layout.
+
+Every item is stored as consecutive tar members sharing one key, e.g. `17.svg` and `17.json`. Each
+shard is a plain uncompressed tar that can be streamed sequentially with `tar` or WebDataset. Next to
+the shards, `index.jsonl` records for every key its shard and the byte offset and size of each member,
+so a single item can be read with one seek.
+"""
+
+import contextlib
+import io
+import json
+import os
+import tarfile
+
+from common.manifest import _jsonable
+from common.sink import MetadataSink
+
+INDEX_NAME = "index.jsonl"
+
+
+def add_shard_arguments(parser):
+    """Add the --shard-dir and --shard-size options shared by the 2D and 3D sweep scripts."""
+    parser.add_argument("--shard-dir", default=None,
+                        help="Also pack every item and its ground truth into tar shards in this directory")
+    parser.add_argument("--shard-size", type=int, default=512,
+                        help="Maximum shard size in MB")
+    return parser
+
+
+def open_shards(shard_dir, task, shard_size=512):
+    """
+    Return a ShardWriter for the shards of `task` under `shard_dir`, or a null context when
+    `shard_dir` is None, so callers can always write `with open_shards(...) as shards:`.
+
+    Args:
+        shard_dir: Root shard directory (--shard-dir), each task gets its own subdirectory
+        task: Task name
+        shard_size: Maximum shard size in MB
+    """
+    if shard_dir is None:
+        return contextlib.nullcontext()
+    return ShardWriter(os.path.join(shard_dir, task), shard_size << 20)
+
+
+class ShardWriter:
+    def __init__(self, shard_dir, max_bytes=512 << 20, prefix="shard"):
+        """
+        Start writing shards into `shard_dir`, replacing the shards and index of a previous run.
+
+        Args:
+            shard_dir: Output directory of the shards and their index
+            max_bytes: A new shard is started when the next item would take the current one past this size
+            prefix: Shard file name prefix, shards are named <prefix>-000000.tar, <prefix>-000001.tar, ...
+        """
+        os.makedirs(shard_dir, exist_ok=True)
+        for name in os.listdir(shard_dir):
+            if name.startswith(prefix + "-") and name.endswith(".tar"):
+                os.remove(os.path.join(shard_dir, name))
+        self.shard_dir = shard_dir
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.num_shards = 0
+        self._tar = None
+        self._name = None
+        self._index = MetadataSink(os.path.join(shard_dir, INDEX_NAME))
+
+    def _next_shard(self):
+        self._close_shard()
+        self._name = f"{self.prefix}-{self.num_shards:06d}.tar"
+        self._tar = tarfile.open(os.path.join(self.shard_dir, self._name), "w", format=tarfile.PAX_FORMAT)
+        self.num_shards += 1
+
+    def _close_shard(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+
+    def write(self, key, paths=(), row=None, contents=None):
+        """
+        Append one item to the current shard.
+
+        Args:
+            key: Item key, the basename of its output file without extension
+            paths: Files of the item, stored as <key><ext>
+            row: Optional metadata row, stored as <key>.json
+            contents: Optional {absolute path: bytes} of files not yet on disk
+        """
+        contents = contents or {}
+        members = []
+        for path in paths:
+            data = contents.get(os.path.abspath(path))
+            if data is None:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            members.append((key + os.path.splitext(path)[1], data))
+        if row is not None:
+            members.append((key + ".json", json.dumps(row, default=_jsonable).encode("utf-8")))
+
+        # Header and padding of every member, plus the end-of-archive record written on close
+        size = sum(len(data) + 2 * tarfile.BLOCKSIZE for _, data in members) + tarfile.RECORDSIZE
+        if self._tar is None or (self._tar.offset > 0 and self._tar.offset + size > self.max_bytes):
+            self._next_shard()
+
+        offsets = {}
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            self._tar.addfile(info, io.BytesIO(data))
+            padded = -(-len(data) // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+            offsets[name[len(key) + 1:]] = [self._tar.offset - padded, len(data)]
+        self._index.write({"key": key, "shard": self._name, "members": offsets})
+
+    def close(self):
+        """Finish the current shard and the index."""
+        self._close_shard()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def add_render(shards, image_path):
+    """Pack a 3D render and the ground truth JSON saved next to it, unless sharding is off (shards is None)."""
+    if shards is not None:
+        stem = os.path.splitext(image_path)[0]
+        shards.write(os.path.basename(stem), [image_path, stem + ".json"])
+
+
+class ShardReader:
+    def __init__(self, shard_dir):
+        """Load the index of the shards in `shard_dir`."""
+        self.shard_dir = shard_dir
+        self.index = {record["key"]: record
+                      for record in MetadataSink.read(os.path.join(shard_dir, INDEX_NAME))}
+
+    def keys(self):
+        return self.index.keys()
+
+    def get(self, key):
+        """Return the members of one item as {extension: bytes}, reading only their bytes."""
+        record = self.index[key]
+        members = {}
+        with open(os.path.join(self.shard_dir, record["shard"]), 'rb') as f:
+            for ext, (offset, size) in record["members"].items():
+                f.seek(offset)
+                members[ext] = f.read(size)
+        return members
+
+    def __iter__(self):
+        """Stream every item in shard order as (key, {extension: bytes})."""
+        shards = sorted({record["shard"] for record in self.index.values()})
+        for shard in shards:
+            key, members = None, {}
+            with tarfile.open(os.path.join(self.shard_dir, shard), "r|") as tar:
+                for info in tar:
+                    name_key, ext = info.name.split(".", 1)
+                    if key is not None and name_key != key:
+                        yield key, members
+                        members = {}
+                    key = name_key
+                    members[ext] = tar.extractfile(info).read()
+            if key is not None:
+                yield key, members
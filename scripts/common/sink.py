@@ -0,0 +1,168 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Streaming, append-only writer for metadata rows.
+
+The generators and dataset creators used to collect every row in a list and write it with
+pd.DataFrame(rows).to_csv(...) after the last item. A MetadataSink takes the rows as they are
+produced instead, buffers at most `batch_size` of them, and appends every full batch to disk with an
+fsync. Memory stays flat whatever the sweep size, and a crash loses at most one batch.
+
+Parquet files (written with pyarrow, imported only when a .parquet sink is opened) get one row group
+per batch. Parquet writes its footer on close, so an interrupted Parquet file is unreadable; the
+generators rebuild it from the manifest on the next run.
+"""
+
+import csv
+import json
+import os
+
+from common.manifest import _jsonable
+
+
+class MetadataSink:
+    def __init__(self, path, fieldnames=None, batch_size=1000, append=False, arrow_types=None):
+        """
+        Open a metadata file for streaming writes.
+
+        The format follows the extension of `path`. A `.csv` file gets the same text as
+        pd.DataFrame(rows).to_csv(path, index=False), with containers written through str(). A
+        `.jsonl` file gets one JSON object per row. A `.parquet` file gets typed columns, with the
+        schema taken from the first batch.
+
+        Args:
+            path: Output file, `.csv`, `.jsonl` or `.parquet`
+            fieldnames: CSV columns in order. Defaults to the keys of the first row. Keys that are
+                not listed are dropped.
+            batch_size: Number of rows buffered before they are written and synced
+            append: Add to an existing file instead of truncating it. An existing CSV header is reused.
+            arrow_types: Optional {column: function returning a pyarrow type} overriding the
+                types inferred from the first batch of a Parquet file
+        """
+        ext = os.path.splitext(path)[1].lower()
+        if ext not in (".csv", ".jsonl", ".parquet"):
+            raise ValueError(f"Unsupported metadata format {ext!r}, expected .csv, .jsonl or .parquet")
+        if ext == ".parquet" and append:
+            raise ValueError("Parquet files cannot be appended to")
+        self.path = path
+        self.format = ext[1:]
+        self.fieldnames = list(fieldnames) if fieldnames is not None else None
+        self.batch_size = max(1, batch_size)
+        self.arrow_types = arrow_types or {}
+        self.count = 0
+        self._buffer = []
+        self._writer = None
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        resume = append and os.path.exists(path) and os.path.getsize(path) > 0
+        if resume and self.format == "csv" and self.fieldnames is None:
+            with open(path, 'r', newline='') as f:
+                self.fieldnames = next(csv.reader(f))
+        self._header_written = resume
+        if self.format == "parquet":
+            self._file = open(path, 'wb')
+        else:
+            self._file = open(path, 'a' if append else 'w', newline='')
+
+    def write(self, row):
+        """Buffer one row, writing the batch out once it is full."""
+        if row is None:
+            return
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def writerows(self, rows):
+        """Stream every row of an iterable into the sink."""
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        """Write the buffered rows and sync them to disk."""
+        if not self._buffer:
+            return
+        if self.format == "csv":
+            self._write_csv(self._buffer)
+        elif self.format == "parquet":
+            self._write_parquet(self._buffer)
+        else:
+            self._file.writelines(json.dumps(row, default=_jsonable) + "\n" for row in self._buffer)
+        self.count += len(self._buffer)
+        self._buffer = []
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _write_csv(self, rows):
+        if self._writer is None:
+            if self.fieldnames is None:
+                self.fieldnames = list(rows[0].keys())
+            self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames,
+                                          extrasaction="ignore", lineterminator="\n")
+            if not self._header_written:
+                self._writer.writeheader()
+                self._header_written = True
+        self._writer.writerows(rows)
+
+    def _write_parquet(self, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._writer is None:
+            schema = pa.Table.from_pylist(rows).schema
+            for name, arrow_type in self.arrow_types.items():
+                if name in schema.names:
+                    schema = schema.set(schema.get_field_index(name), pa.field(name, arrow_type()))
+            table = pa.Table.from_pylist(rows, schema=schema)
+            self._writer = pq.ParquetWriter(self._file, table.schema)
+        else:
+            table = pa.Table.from_pylist(rows, schema=self._writer.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        """Flush the remaining rows and close the file."""
+        if self._file.closed:
+            return
+        self.flush()
+        if self.format == "csv" and not self._header_written and self.fieldnames is not None:
+            # An empty run still gets a header, like an empty DataFrame with known columns
+            csv.writer(self._file, lineterminator="\n").writerow(self.fieldnames)
+        if self.format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self._file, pa.schema([]))
+            self._writer.close()
+        self._file.close()
+
+    @staticmethod
+    def read(path, batch_size=1000):
+        """
+        Yield the rows of a metadata file one at a time.
+
+        Parquet files are read one batch at a time and converted to Python column-wise by pyarrow.
+        JSON lines are parsed per line. CSV values come back as strings.
+        """
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".parquet":
+            import pyarrow.parquet as pq
+
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+                yield from batch.to_pylist()
+        elif ext == ".jsonl":
+            with open(path, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        else:
+            with open(path, 'r', newline='') as f:
+                yield from csv.DictReader(f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
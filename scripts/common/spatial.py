@@ -0,0 +1,231 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Uniform-grid spatial hash used as the broadphase of the 2D placement loops.
+
+Placed shapes are stored under every grid cell their axis-aligned bounding box touches. A query
+returns the shapes whose boxes intersect the query box, found through the cells it touches instead of
+a scan of everything placed so far, so only nearby shapes reach the exact (SAT) test. With cells about
+the size of a shape, a query touches a handful of cells whatever the canvas size or shape count.
+`intersects` answers only whether any box intersects, stopping at the first one, for placement loops
+whose overlap test is the bounding box itself.
+
+`sat_overlap` is the exact test of one pair of polygons and `sat_overlaps` the same test run on many
+pairs in one NumPy call. `PlacedPolygons` combines the broadphase and the exact test to check a batch
+of candidate poses against everything placed.
+"""
+
+import math
+
+
+def corners_box(corners, margin=0.0):
+    """Axis-aligned bounding box (xmin, ymin, xmax, ymax) of a list of points, grown by `margin`."""
+    xs = [x for x, _ in corners]
+    ys = [y for _, y in corners]
+    return min(xs) - margin, min(ys) - margin, max(xs) + margin, max(ys) + margin
+
+
+class SpatialHash:
+    def __init__(self, cell_size):
+        """
+        Create an empty index.
+
+        Args:
+            cell_size: Side of a grid cell, ideally close to the size of the boxes inserted
+        """
+        self.cell_size = float(cell_size)
+        self._cells = {}
+        self._entries = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _cell_range(self, box):
+        xmin, ymin, xmax, ymax = box
+        size = self.cell_size
+        return (range(math.floor(xmin / size), math.floor(xmax / size) + 1),
+                range(math.floor(ymin / size), math.floor(ymax / size) + 1))
+
+    def insert(self, obj, box):
+        """Add `obj` with bounding box `box` = (xmin, ymin, xmax, ymax)."""
+        index = len(self._entries)
+        self._entries.append((box, obj))
+        cols, rows = self._cell_range(box)
+        for i in cols:
+            for j in rows:
+                self._cells.setdefault((i, j), []).append(index)
+
+    def query(self, box):
+        """Return the objects whose bounding boxes intersect `box`, in insertion order."""
+        xmin, ymin, xmax, ymax = box
+        cols, rows = self._cell_range(box)
+        found = set()
+        for i in cols:
+            for j in rows:
+                found.update(self._cells.get((i, j), ()))
+        hits = []
+        for index in sorted(found):
+            (bxmin, bymin, bxmax, bymax), obj = self._entries[index]
+            if bxmin <= xmax and xmin <= bxmax and bymin <= ymax and ymin <= bymax:
+                hits.append(obj)
+        return hits
+
+    def intersects(self, box):
+        """Return True if any stored bounding box intersects `box`; touching boxes intersect."""
+        xmin, ymin, xmax, ymax = box
+        cols, rows = self._cell_range(box)
+        for i in cols:
+            for j in rows:
+                for index in self._cells.get((i, j), ()):
+                    bxmin, bymin, bxmax, bymax = self._entries[index][0]
+                    if bxmin <= xmax and xmin <= bxmax and bymin <= ymax and ymin <= bymax:
+                        return True
+        return False
+
+
+def sat_overlap(corners1, corners2, min_distance):
+    """
+    Check if two convex polygons overlap using the Separating Axis Theorem (SAT).
+
+    Args:
+        corners1: Corners of the first polygon, in order
+        corners2: Corners of the second polygon, in order
+        min_distance: Minimum distance between the polygons for them not to count as overlapping,
+            negative values allow that much overlap
+    """
+    def get_axes(corners):
+        axes = []
+        for i in range(len(corners)):
+            p1 = corners[i]
+            p2 = corners[(i + 1) % len(corners)]
+            edge = (p2[0] - p1[0], p2[1] - p1[1])
+            normal = (-edge[1], edge[0])
+            length = math.sqrt(normal[0]**2 + normal[1]**2)
+            if length > 0:
+                axes.append((normal[0]/length, normal[1]/length))
+        return axes
+
+    def project(corners, axis):
+        dots = [axis[0] * x + axis[1] * y for x, y in corners]
+        return min(dots), max(dots)
+
+    for axis in get_axes(corners1) + get_axes(corners2):
+        p1_min, p1_max = project(corners1, axis)
+        p2_min, p2_max = project(corners2, axis)
+        # One axis on which the projections do not overlap is enough to separate the polygons
+        if p1_min > p2_max + min_distance or p2_min > p1_max + min_distance:
+            return False
+    return True
+
+
+def sat_overlaps(corners1, corners2, min_distance):
+    """
+    Separating Axis Theorem test of pairs of convex polygons, vectorized over the pairs.
+
+    Gives the same answer as sat_overlap for every pair: the same edge normals, projections and
+    comparisons in the same floating point operations, so placements do not change when a loop
+    switches to this kernel.
+
+    Args:
+        corners1: (P, N, 2) array of the corners of the first polygon of each pair, in order
+        corners2: (P, M, 2) array of the corners of the second polygon of each pair
+        min_distance: Projections closer than this count as overlapping; negative values allow
+            that much overlap
+
+    Returns:
+        numpy.ndarray: (P,) bool, True where no edge normal separates the pair by more than min_distance
+    """
+    import numpy as np
+
+    corners1 = np.asarray(corners1, dtype=float)
+    n = corners1.shape[1]
+    polygons = np.concatenate([corners1, np.asarray(corners2, dtype=float)], axis=1)
+    m = polygons.shape[1]
+    # Edge i of each polygon runs from corner i to the next corner of the same polygon
+    following = np.r_[np.arange(1, n), 0, np.arange(n + 1, m), n]
+    edges = polygons[:, following] - polygons
+    nx, ny = -edges[..., 1], edges[..., 0]
+    length = np.sqrt(nx ** 2 + ny ** 2)
+    # Degenerate edges give NaN axes, whose comparisons are all False, so they never separate
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ax, ay = nx / length, ny / length
+        # dots[p, a, c]: projection of corner c of pair p (both polygons) on axis a
+        dots = ax[:, :, None] * polygons[:, None, :, 0] + ay[:, :, None] * polygons[:, None, :, 1]
+        p1_min, p1_max = dots[..., :n].min(axis=2), dots[..., :n].max(axis=2)
+        p2_min, p2_max = dots[..., n:].min(axis=2), dots[..., n:].max(axis=2)
+        separated = (p1_min > p2_max + min_distance) | (p2_min > p1_max + min_distance)
+    return ~separated.any(axis=1)
+
+
+class PlacedPolygons:
+    # Rounds with fewer candidate/neighbour pairs are tested in plain Python, where the fixed cost
+    # of the NumPy calls would outweigh the work
+    MIN_VECTOR_PAIRS = 16
+
+    def __init__(self, cell_size, num_corners=4):
+        """
+        Create an empty set of placed convex polygons.
+
+        Args:
+            cell_size: Cell size of the SpatialHash over their bounding boxes
+            num_corners: Number of corners of every polygon
+        """
+        import numpy as np
+
+        self.index = SpatialHash(cell_size)
+        self.polygons = []
+        self._array = np.empty((16, num_corners, 2))
+
+    def __len__(self):
+        return len(self.polygons)
+
+    def add(self, corners):
+        """Place a polygon given by its list of corners."""
+        import numpy as np
+
+        index = len(self.polygons)
+        if index == len(self._array):
+            self._array = np.concatenate([self._array, np.empty_like(self._array)])
+        self._array[index] = corners
+        self.polygons.append(corners)
+        self.index.insert(index, corners_box(corners))
+
+    def first_free(self, candidates, reach, min_distance):
+        """
+        Return the index of the first candidate that overlaps no placed polygon, or None.
+
+        Candidates are looked up in the broadphase in order until one has no neighbour within
+        `reach`. The pairs before it are tested with sat_overlaps in a single call, or one by one
+        with sat_overlap when there are only a few.
+
+        Args:
+            candidates: Corner lists of the candidate polygons, in the order they were drawn
+            reach: Margin added to a candidate's bounding box when looking for neighbours
+            min_distance: Minimum distance between polygons, as in sat_overlap
+        """
+        import numpy as np
+
+        neighbours = []
+        for corners in candidates:
+            near = self.index.query(corners_box(corners, reach))
+            if not near:
+                break
+            neighbours.append(near)
+        alone = len(neighbours) if len(neighbours) < len(candidates) else None
+
+        num_pairs = sum(len(near) for near in neighbours)
+        if num_pairs < self.MIN_VECTOR_PAIRS:
+            for k, near in enumerate(neighbours):
+                if not any(sat_overlap(candidates[k], self.polygons[m], min_distance) for m in near):
+                    return k
+            return alone
+
+        pair_candidates = np.repeat(np.arange(len(neighbours)), [len(near) for near in neighbours])
+        pair_placed = [m for near in neighbours for m in near]
+        hits = sat_overlaps(np.asarray(candidates[:len(neighbours)])[pair_candidates], self._array[pair_placed],
+                            min_distance)
+        blocked = np.zeros(len(neighbours), dtype=bool)
+        blocked[pair_candidates[hits]] = True
+        free = np.flatnonzero(~blocked)
+        return int(free[0]) if len(free) else alone
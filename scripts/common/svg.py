@@ -0,0 +1,206 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Lightweight SVG output for the 2D generators.
+
+`Drawing` is a streaming stand-in for the part of svgwrite.Drawing the generators use: the element
+factories (rect, circle, line, polygon, path, text, g, use), `add`, `defs`, the transform helpers
+(translate, rotate, scale), fill/stroke, item assignment of attributes, `tostring()` and
+`write(fileobj)`, so it also works with common.writer.save_drawing. svgwrite builds a validated
+element tree and serializes it at the end; here every element is serialized to text once, when it is
+added to its parent, and only the text is kept. Elements must therefore be complete when they are
+added, which is how the generators already build them.
+
+Numbers are written with at most PRECISION decimals (trailing zeros dropped) instead of svgwrite's
+full float repr, which shortens files with many computed coordinates. The difference is far below a
+pixel, but it can move the anti-aliasing of a few edge pixels, so `Drawing(precision=None)` keeps
+the full repr; the figure-ground and form constancy generators use that and rasterize exactly as
+they did with svgwrite.
+
+Symbol reuse
+------------
+By default every shape instance is written out with its full outline. With --svg-symbols each
+shape template is written once inside <defs> and every instance becomes a <use> element that only
+carries its transform and paint:
+
+    <defs><path id="shape-star" d="M0,-30 L7.1,-9.8 ..."/></defs>
+    <use xlink:href="#shape-star" transform="translate(120.5 80.2) rotate(30.0) scale(1.4)" fill="red"/>
+
+The images look the same and draw the same random numbers, so a seed gives the same composition
+in both modes; the files are smaller and faster to write and to rasterize when shapes repeat.
+"""
+
+XLINK_NAMESPACE = 'xmlns:xlink="http://www.w3.org/1999/xlink"'
+
+# Decimals kept for numbers written by Drawing
+PRECISION = 4
+
+_ATTRIBUTE_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"})
+_TEXT_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+
+def add_symbols_argument(parser):
+    """Add the --svg-symbols option of the SVG sweep scripts."""
+    parser.add_argument("--svg-symbols", action="store_true",
+                        help="Define each shape once in <defs> and draw instances with <use>")
+    return parser
+
+
+def symbol_id(name):
+    """Id of the <defs> entry of a shape template."""
+    return f"shape-{name}"
+
+
+def symbol_use(name, transform, **attributes):
+    """
+    <use> element drawing shape template `name`.
+
+    Args:
+        name: Template name, see symbol_id
+        transform: Value of the transform attribute
+        **attributes: Presentation attributes, underscores in the names written as dashes
+    """
+    extra = "".join(f' {key.replace("_", "-")}="{value}"' for key, value in attributes.items())
+    return f'<use xlink:href="#{symbol_id(name)}" transform="{transform}"{extra}/>'
+
+
+def number(value, precision=PRECISION):
+    """
+    Text of a number with at most `precision` decimals, e.g. 33.00000001 -> "33", 2.5 -> "2.5";
+    precision None gives str(value) as svgwrite writes it.
+    """
+    if isinstance(value, int) or precision is None:
+        return str(value)
+    text = f"{value:.{precision}f}".rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+def _value(value, precision):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return number(value, precision)
+    return str(value).translate(_ATTRIBUTE_ESCAPES)
+
+
+class Element:
+    def __init__(self, tag, content=None, precision=PRECISION, **attributes):
+        """
+        An SVG element whose children are kept as serialized text.
+
+        Args:
+            tag: Element name
+            content: Optional text content
+            precision: Decimals of the numbers written, None for the full repr (see number)
+            **attributes: Attributes as in svgwrite, underscores in the names written as dashes
+        """
+        self.tag = tag
+        self.content = content
+        self.precision = precision
+        self.attributes = {}
+        self._children = []
+        for key, value in attributes.items():
+            self[key] = value
+
+    def __setitem__(self, key, value):
+        self.attributes[key.rstrip("_").replace("_", "-")] = value
+
+    def __getitem__(self, key):
+        return self.attributes[key.rstrip("_").replace("_", "-")]
+
+    def add(self, element):
+        """Serialize `element` as the next child and return it."""
+        self._children.append(element.tostring())
+        return element
+
+    def fill(self, color=None):
+        if color is not None:
+            self['fill'] = color
+        return self
+
+    def stroke(self, color=None, width=None):
+        if color is not None:
+            self['stroke'] = color
+        if width is not None:
+            self['stroke-width'] = width
+        return self
+
+    def _transform(self, operation, *values):
+        text = f"{operation}({','.join(number(v, self.precision) for v in values if v is not None)})"
+        current = self.attributes.get('transform')
+        self.attributes['transform'] = text if current is None else f"{current} {text}"
+
+    def translate(self, tx, ty=None):
+        self._transform("translate", tx, ty)
+
+    def rotate(self, angle, center=None):
+        self._transform("rotate", angle, *(center if center is not None else ()))
+
+    def scale(self, sx, sy=None):
+        self._transform("scale", sx, sy)
+
+    def tostring(self):
+        attributes = "".join(f' {key}="{_value(value, self.precision)}"' for key, value in self.attributes.items())
+        if not self._children and self.content is None:
+            return f"<{self.tag}{attributes}/>"
+        text = "" if self.content is None else str(self.content).translate(_TEXT_ESCAPES)
+        return f"<{self.tag}{attributes}>{text}{''.join(self._children)}</{self.tag}>"
+
+
+class Drawing(Element):
+    def __init__(self, filename="noname.svg", size=("100%", "100%"), precision=PRECISION, **attributes):
+        """
+        Start an SVG document.
+
+        Args:
+            filename: Path used by common.writer.save_drawing
+            size: (width, height), numbers or strings such as "200px"
+            precision: Decimals of the numbers written by the drawing and its elements, None for
+                the full repr svgwrite writes
+            **attributes: Further attributes of the <svg> element
+        """
+        super().__init__("svg", width=size[0], height=size[1], precision=precision, **attributes)
+        self.filename = filename
+        self.defs = self._element("defs")
+
+    def _element(self, tag, content=None, **attributes):
+        return Element(tag, content, precision=self.precision, **attributes)
+
+    def rect(self, insert=(0, 0), size=(1, 1), **extra):
+        return self._element("rect", x=insert[0], y=insert[1], width=size[0], height=size[1], **extra)
+
+    def circle(self, center=(0, 0), r=1, **extra):
+        return self._element("circle", cx=center[0], cy=center[1], r=r, **extra)
+
+    def line(self, start=(0, 0), end=(0, 0), **extra):
+        return self._element("line", x1=start[0], y1=start[1], x2=end[0], y2=end[1], **extra)
+
+    def polygon(self, points=(), **extra):
+        points = " ".join(f"{number(x, self.precision)},{number(y, self.precision)}" for x, y in points)
+        return self._element("polygon", points=points, **extra)
+
+    def path(self, d="", **extra):
+        return self._element("path", d=d, **extra)
+
+    def text(self, text, insert=None, **extra):
+        if insert is not None:
+            extra = {'x': insert[0], 'y': insert[1], **extra}
+        return self._element("text", content=text, **extra)
+
+    def g(self, **extra):
+        return self._element("g", **extra)
+
+    def use(self, href, **extra):
+        element = self._element("use", **extra)
+        element.attributes['xlink:href'] = href
+        return element
+
+    def tostring(self):
+        defs = self.defs.tostring() if self.defs._children else ""
+        attributes = "".join(f' {key}="{_value(value, self.precision)}"' for key, value in self.attributes.items())
+        return (f'<svg xmlns="http://www.w3.org/2000/svg" {XLINK_NAMESPACE}{attributes}>'
+                f"{defs}{''.join(self._children)}</svg>")
+
+    def write(self, fileobj):
+        """Write the document, with an XML declaration, to a text file object."""
+        fileobj.write('<?xml version="1.0" encoding="utf-8" ?>\n')
+        fileobj.write(self.tostring())
@@ -0,0 +1,315 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import collections
+import functools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from common.manifest import Manifest
+from common.seeding import item_key, seed_item
+from common.shards import add_render, add_shard_arguments, open_shards
+from common.sink import MetadataSink
+from common.timing import add_timing_argument, call_timing_stages, open_timings, timed_call
+from common.writer import WriteBehind, call_capturing_writes
+
+
+def add_seed_argument(parser):
+    """Add the --seed option shared by the 2D and 3D sweep scripts."""
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Master seed; every item is seeded from (task, sweep, instance, seed)")
+    return parser
+
+
+def add_restart_argument(parser):
+    """Add the --restart option of the resumable 2D and 3D sweep scripts."""
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore the manifest of a previous run and regenerate every item")
+    return parser
+
+
+def add_sweep_arguments(parser):
+    """Add the --num-workers, --seed, --chunksize, --restart, shard and timing options shared by the 2D sweep scripts."""
+    parser.add_argument("--num-workers", type=int, default=1,
+                        help="Number of worker processes (0 uses all available cores)")
+    add_seed_argument(parser)
+    parser.add_argument("--chunksize", type=int, default=4,
+                        help="Number of sweep items handed to a worker at a time")
+    add_restart_argument(parser)
+    add_shard_arguments(parser)
+    add_timing_argument(parser)
+    return parser
+
+
+def script_argv(argv=None):
+    """Return the script's own arguments, dropping Blender's arguments up to '--' when present."""
+    argv = sys.argv if argv is None else argv
+    if "--" in argv:
+        return argv[argv.index("--") + 1:]
+    return argv[1:]
+
+
+def _seeded_call(worker, task, seed, timed, item):
+    """
+    Seed the global RNG from the item's coordinates and run the worker on it, capturing its file
+    writes and, if `timed`, its stage timings. Returns (result, files, stages or None).
+    """
+    seed_item(task, item['sweep'], item.get('instance', 0), seed)
+    if timed:
+        (result, files), stages = call_timing_stages(call_capturing_writes, worker, item)
+        return result, files, stages
+    return (*call_capturing_writes(worker, item), None)
+
+
+def _chunk_call(call, chunk):
+    return [call(item) for item in chunk]
+
+
+def _hand_off(writer, files):
+    """Queue the captured files of an item on the writer and return them as {absolute path: bytes}."""
+    contents = {}
+    for path, data in files:
+        writer.submit(path, data)
+        contents[os.path.abspath(path)] = data
+    return contents
+
+
+def _finish(writer, timings, item, result, files, stages):
+    """Hand the item's files to the writer and record its stage timings, with the time spent waiting for the writer."""
+    if timings is None:
+        return result, _hand_off(writer, files)
+    start = time.perf_counter()
+    contents = _hand_off(writer, files)
+    stages["write_wait"] = time.perf_counter() - start
+    timings.record(item.get('filename', item.get('instance', 0)), stages)
+    return result, contents
+
+
+def run_sweep(worker, items, task, num_workers=1, seed=0, chunksize=4, writer=None, timings=None):
+    """
+    Run `worker(item)` for every sweep item and yield the results in item order.
+
+    Before each call the global `random` module is seeded from (task, item['sweep'],
+    item['instance'], seed), so the output of an item does not depend on which process ran it
+    or on the items before it. A serial run (num_workers=1) and a pool run with the same seed
+    give identical results, and any subset of `items` reproduces the same images.
+
+    Files the worker writes through common.writer.write_file are handed to `writer`, so they are
+    written by its threads while the next items are generated. Pool runs keep at most two chunks
+    per worker in flight, so a slow writer holds back the workers instead of queueing results.
+
+    Args:
+        worker: Top-level (picklable) function generating a single item and returning its metadata row
+        items: Sequence of per-item dicts with at least 'sweep' and 'instance' keys
+        task: Task name mixed into every item seed
+        num_workers: Number of worker processes, 1 runs in-process and 0 uses all cores
+        seed: Master seed for the sweep
+        chunksize: Number of items sent to a worker process at a time
+        writer: WriteBehind receiving the output files. By default one is started for the sweep
+            and flushed when the last result has been yielded.
+        timings: Optional common.timing.StageTimings receiving the stage timings of every item,
+            plus "write_wait", the time the main process waited for room in the writer's queue
+
+    Yields:
+        tuple: (return value of `worker`, {absolute path: bytes} of its files) for each item, in
+        the same order as `items`
+    """
+    if writer is None:
+        with WriteBehind() as writer:
+            yield from run_sweep(worker, items, task, num_workers, seed, chunksize, writer, timings)
+        return
+
+    call = functools.partial(_seeded_call, worker, task, seed, timings is not None)
+    items = list(items)
+
+    if num_workers == 0:
+        num_workers = os.cpu_count() or 1
+
+    if num_workers == 1 or len(items) <= 1:
+        for item in items:
+            yield _finish(writer, timings, item, *call(item))
+        return
+
+    chunksize = max(1, chunksize)
+    chunks = (items[i:i + chunksize] for i in range(0, len(items), chunksize))
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        window = collections.deque((chunk, executor.submit(_chunk_call, call, chunk))
+                                   for _, chunk in zip(range(2 * num_workers), chunks))
+        while window:
+            done, future = window.popleft()
+            results = future.result()
+            chunk = next(chunks, None)
+            if chunk is not None:
+                window.append((chunk, executor.submit(_chunk_call, call, chunk)))
+            for item, result in zip(done, results):
+                yield _finish(writer, timings, item, *result)
+
+
+# Keys of a sweep item that place it in the sweep; every other key is an option changing its output
+ITEM_FIELDS = ("output_dir", "filename", "sweep", "instance")
+
+
+def item_params(item, seed):
+    """
+    Manifest parameters of an item: sweep tuple, instance and master seed, plus under "mode" the
+    item's other keys (--placement, --svg-symbols, ...), so an item generated with other options is
+    not taken as complete.
+    """
+    params = {"sweep": item['sweep'], "instance": item.get('instance', 0), "seed": seed}
+    mode = {k: v for k, v in item.items() if k not in ITEM_FIELDS}
+    if mode:
+        params["mode"] = mode
+    return params
+
+
+def item_outputs(item):
+    """Default output files of a 2D sweep item."""
+    return [os.path.join(item['output_dir'], item['filename'])]
+
+
+def _guarded_call(worker, item):
+    """Run the worker and return (row, error) instead of raising, so one bad item does not stop a sweep."""
+    try:
+        return worker(item), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def run_resumable_sweep(worker, items, task, manifest_path, num_workers=1, seed=0, chunksize=4,
+                        restart=False, outputs=item_outputs, progress=None, shard_dir=None, shard_size=512,
+                        timings_path=None):
+    """
+    Run a sweep through `run_sweep`, skipping the items a previous run already completed.
+
+    Items are identified by their 'filename'. Items recorded as done in the manifest with the same
+    seed key, the same parameters (item_params, which include the item's output options) and intact
+    output files are skipped; missing, corrupt, failed or re-parameterised items are generated
+    again and recorded as they finish.
+
+    This is a generator: rows are yielded one at a time in item order, read back from the manifest
+    for skipped items, so they can be streamed into a MetadataSink without holding the sweep's
+    metadata in memory. Failed items yield nothing.
+
+    With `shard_dir` set, every completed item's output files and row (as <key>.json) are also packed
+    into tar shards under <shard_dir>/<task>, in item order.
+
+    Output files go through a WriteBehind. Items are recorded with the hashes of the bytes handed
+    to it, before the files reach the disk; the writer is flushed before the generator finishes,
+    and an item whose file was lost in a crash fails the hash check and is generated again.
+
+    Args:
+        worker: Top-level (picklable) function generating a single item and returning its metadata row
+        items: Sequence of per-item dicts with 'filename', 'sweep' and 'instance' keys
+        task: Task name mixed into every item seed
+        manifest_path: Path of the manifest.jsonl file
+        num_workers: Number of worker processes, 1 runs in-process and 0 uses all cores
+        seed: Master seed for the sweep
+        chunksize: Number of items sent to a worker process at a time
+        restart: Discard the existing manifest and regenerate every item
+        outputs: Function returning the output paths of an item
+        progress: Optional wrapper for the result iterator, e.g. tqdm
+        shard_dir: Optional root directory of the tar shards
+        shard_size: Maximum shard size in MB
+        timings_path: Optional JSON lines file receiving the stage timings of the generated items
+            (see common.timing)
+
+    Yields:
+        dict: Metadata row of each completed item, as stored in the manifest
+    """
+    items = list(items)
+    manifest = Manifest(manifest_path)
+    if restart:
+        manifest.reset()
+
+    keys = {item['filename']: f"{item_key(task, item['sweep'], item.get('instance', 0), seed):032x}"
+            for item in items}
+    pending = [item for item in items
+               if not manifest.is_complete(item['filename'], keys[item['filename']], item_params(item, seed))]
+    print(f"{len(items) - len(pending)} of {len(items)} items already complete, generating {len(pending)}")
+
+    pending_ids = {item['filename'] for item in pending}
+    failed = 0
+    with WriteBehind() as writer, open_shards(shard_dir, task, shard_size) as shards, \
+            open_timings(timings_path, task) as timings:
+        results = run_sweep(functools.partial(_guarded_call, worker), pending, task, num_workers=num_workers,
+                            seed=seed, chunksize=chunksize, writer=writer, timings=timings)
+        if progress is not None:
+            results = progress(results, total=len(pending))
+        results = iter(results)
+
+        for item in items:
+            contents = None
+            if item['filename'] not in pending_ids:
+                row = manifest.row(item['filename'])
+            else:
+                (row, error), contents = next(results)
+                params = item_params(item, seed)
+                if error is not None:
+                    failed += 1
+                    print(f"Failed to generate {item['filename']}: {error}")
+                    manifest.record(item['filename'], keys[item['filename']], params, [],
+                                    status="failed", error=error)
+                    continue
+                row = manifest.record(item['filename'], keys[item['filename']], params, outputs(item),
+                                      row=row, contents=contents)
+            if shards is not None:
+                shards.write(os.path.splitext(item['filename'])[0], outputs(item), row, contents=contents)
+            yield row
+        for _ in results:
+            pass
+    if failed:
+        print(f"{failed} items failed, rerun to retry them")
+
+
+def run_render_sweep(generate, items, task, output_dir, seed=0, restart=False, shard_dir=None, shard_size=512,
+                     timings_path=None):
+    """
+    Render the items of a 3D sweep in order, skipping the items a previous run already completed.
+
+    The 3D counterpart of run_resumable_sweep for the Blender scripts, which render in-process one
+    item at a time. Each item is seeded with seed_item and checked against output_dir/manifest.jsonl
+    like a 2D item; pending items are rendered by `generate(item)` (timed as the item's stage when
+    `timings_path` is set) and recorded with their render and the ground truth JSON saved next to it.
+    Every completed item, new or skipped, gets one row in output_dir/dataset_dump.jsonl:
+
+        {"filename": "3.png", "sweep": [...], "instance": 1, "ground_truth": {...}}
+
+    and, with `shard_dir` set, its render and JSON are packed into the tar shards.
+
+    Args:
+        generate: Function rendering one item, called right after the item is seeded; returns
+            (image path, ground truth dict)
+        items: Sequence of per-item dicts with 'filename', 'sweep' and 'instance' keys; other keys
+            are options recorded in the manifest (see item_params)
+        task: Task name mixed into every item seed
+        output_dir: Directory of the renders, the manifest and the dataset_dump
+        seed: Master seed for the sweep
+        restart: Discard the existing manifest and render every item
+        shard_dir: Optional root directory of the tar shards
+        shard_size: Maximum shard size in MB
+        timings_path: Optional JSON lines file receiving the stage timings of the rendered items
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(output_dir, "manifest.jsonl"))
+    if restart:
+        manifest.reset()
+
+    with MetadataSink(os.path.join(output_dir, "dataset_dump.jsonl")) as sink, \
+            open_shards(shard_dir, task, shard_size) as shards, \
+            open_timings(timings_path, task) as timings:
+        for item in items:
+            filename = item['filename']
+            key = seed_item(task, item['sweep'], item.get('instance', 0), seed)
+            params = item_params(item, seed)
+            image_path = os.path.join(output_dir, filename)
+            if manifest.is_complete(filename, key, params):
+                row = manifest.row(filename)
+            else:
+                image_path, ground_truth = timed_call(timings, filename, generate, item)
+                row = manifest.record(filename, key, params, [image_path, os.path.splitext(image_path)[0] + ".json"],
+                                      row=ground_truth)
+            sink.write({"filename": filename, "sweep": list(item['sweep']), "instance": item.get('instance', 0),
+                        "ground_truth": row})
+            add_render(shards, image_path)
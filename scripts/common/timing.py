@@ -0,0 +1,144 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Opt-in per-stage timing of the generators.
+
+Generators mark their expensive steps with `with stage("placement"):`. Unless the item runs through
+`call_timing_stages` this only checks a global, so untimed sweeps pay nothing. Inside a timed call
+the durations of the stages are summed per name; stages may nest, and an inner stage's time is then
+also part of the outer one. The whole call is recorded as the "item" stage.
+
+With --timings PATH a sweep appends to PATH (JSON lines) one line per item:
+
+    {"type": "item", "run": ..., "task": ..., "id": "sweep_0_0.svg", "stages": {"item": 0.012, "placement": 0.009, ...}}
+
+and, when it finishes, one line per stage aggregated over the items of the run:
+
+    {"type": "stage", "run": ..., "task": ..., "stage": "placement", "items": 120, "total": 1.08,
+     "mean": 0.009, "p50": 0.008, "p95": 0.015, "max": 0.031}
+
+Times are wall-clock seconds. "run" is the start time of the sweep, so several runs can share a file.
+"""
+
+import contextlib
+import datetime
+import time
+
+from common.sink import MetadataSink
+
+_stages = None
+
+
+def add_timing_argument(parser):
+    """Add the --timings option shared by the 2D and 3D sweep scripts."""
+    parser.add_argument("--timings", default=None,
+                        help="Append per-item and aggregated stage timings to this JSON lines file")
+    return parser
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Time the enclosed block as stage `name` of the current item, when the item is timed."""
+    if _stages is None:
+        yield
+        return
+    stages = _stages
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[name] = stages.get(name, 0.0) + time.perf_counter() - start
+
+
+def call_timing_stages(func, *args, **kwargs):
+    """
+    Call `func(*args, **kwargs)` and time the stages it runs.
+
+    Returns:
+        tuple: (return value, {stage: seconds}), the whole call included as "item"
+    """
+    global _stages
+    previous, _stages = _stages, {}
+    stages = _stages
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        stages["item"] = time.perf_counter() - start
+        _stages = previous
+    return result, stages
+
+
+def _percentile(values, q):
+    """Nearest-rank percentile of sorted `values`."""
+    return values[min(len(values) - 1, max(0, round(q * len(values)) - 1))]
+
+
+def open_timings(path, task):
+    """
+    Return a StageTimings appending to `path`, or a null context when `path` is None, so callers can
+    always write `with open_timings(...) as timings:`.
+    """
+    if path is None:
+        return contextlib.nullcontext()
+    return StageTimings(path, task)
+
+
+class StageTimings:
+    def __init__(self, path, task):
+        """
+        Start appending the stage timings of one sweep run to `path`.
+
+        Args:
+            path: JSON lines file, created if missing
+            task: Task name written on every line
+        """
+        self.task = task
+        self.run = datetime.datetime.now().isoformat(timespec="seconds")
+        self._sink = MetadataSink(path, batch_size=100, append=True)
+        self._durations = {}
+
+    def record(self, item_id, stages):
+        """Write the stage timings of one item."""
+        self._sink.write({"type": "item", "run": self.run, "task": self.task, "id": item_id, "stages": stages})
+        for name, seconds in stages.items():
+            self._durations.setdefault(name, []).append(seconds)
+
+    def call(self, item_id, func, *args, **kwargs):
+        """Run `func(*args, **kwargs)` through call_timing_stages, record its stages and return its result."""
+        result, stages = call_timing_stages(func, *args, **kwargs)
+        self.record(item_id, stages)
+        return result
+
+    def summary(self):
+        """Return the aggregated line of every stage recorded so far."""
+        lines = []
+        for name, durations in self._durations.items():
+            durations = sorted(durations)
+            lines.append({"type": "stage", "run": self.run, "task": self.task, "stage": name,
+                          "items": len(durations), "total": sum(durations),
+                          "mean": sum(durations) / len(durations), "p50": _percentile(durations, 0.5),
+                          "p95": _percentile(durations, 0.95), "max": durations[-1]})
+        return lines
+
+    def close(self):
+        """Write the aggregated stage timings and close the file."""
+        try:
+            self._sink.writerows(self.summary())
+        finally:
+            self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def timed_call(timings, item_id, func, *args, **kwargs):
+    """Call `func` through `timings.call`, or directly when timing is off (timings is None)."""
+    if timings is None:
+        return func(*args, **kwargs)
+    return timings.call(item_id, func, *args, **kwargs)
@@ -0,0 +1,142 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Write-behind file output for the sweep generators.
+
+Generators hand finished bytes to `write_file(path, data)` instead of writing them on the generating
+thread. Inside a sweep (see common.sweep.run_sweep) the writes of an item are captured, sent back to
+the main process, and written there by a small thread pool while the next items are generated. The
+queue is bounded, so a slow filesystem stalls generation (back-pressure) instead of buffering the
+whole sweep in memory, and `flush()` is a barrier that waits for, and optionally fsyncs, every write.
+
+Outside a sweep `write_file` simply writes the file.
+"""
+
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from common.timing import stage
+
+_captured = None
+
+
+def _to_bytes(data):
+    return data.encode("utf-8") if isinstance(data, str) else bytes(data)
+
+
+def write_file(path, data):
+    """
+    Write `data` (str or bytes) to `path`, through the sweep's write-behind queue when running inside one.
+
+    str data is written as UTF-8, like open(path, 'w').write(data).
+    """
+    data = _to_bytes(data)
+    if _captured is not None:
+        _captured.append((path, data))
+        return
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def save_drawing(dwg):
+    """Write a Drawing (common.svg or svgwrite) to its filename through `write_file`, with the same bytes as dwg.save()."""
+    buf = io.StringIO()
+    with stage("serialization"):
+        dwg.write(buf)
+    write_file(dwg.filename, buf.getvalue())
+
+
+def call_capturing_writes(func, *args):
+    """
+    Call `func(*args)` and capture the files it writes through `write_file`.
+
+    Returns:
+        tuple: (return value, [(path, bytes), ...])
+    """
+    global _captured
+    previous, _captured = _captured, []
+    try:
+        return func(*args), _captured
+    finally:
+        _captured = previous
+
+
+class WriteBehind:
+    def __init__(self, num_threads=4, max_pending=64, fsync=True):
+        """
+        Start the writer threads.
+
+        Args:
+            num_threads: Number of writer threads
+            max_pending: Maximum number of queued or in-flight writes, `submit` blocks beyond it
+            fsync: fsync every file before it is renamed into place
+        """
+        self.fsync = fsync
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=num_threads, thread_name_prefix="write-behind")
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._errors = []
+
+    def _write(self, path, data):
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Written under a temporary name and renamed, so a crash never leaves a truncated output
+            tmp_path = f"{path}.tmp{threading.get_ident()}"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except Exception as e:
+            with self._lock:
+                self._errors.append(f"{path}: {type(e).__name__}: {e}")
+        finally:
+            self._slots.release()
+
+    def submit(self, path, data):
+        """Queue one file write, blocking while `max_pending` writes are outstanding."""
+        data = _to_bytes(data)
+        self._slots.acquire()
+        future = self._executor.submit(self._write, path, data)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def flush(self):
+        """Barrier: wait until every queued write is on disk, raising if any of them failed."""
+        while True:
+            with self._lock:
+                pending = list(self._pending)
+            if not pending:
+                break
+            for future in pending:
+                future.result()
+        with self._lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise OSError(f"{len(errors)} writes failed, first: {errors[0]}")
+
+    def close(self):
+        """Flush and stop the writer threads."""
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,48 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.balance import UNIFORM, allocate, balance_by_sweep
+
+
+def _images(read, cells=((0,), (1,), (2,)), per_cell=4):
+    """Images of contiguous sweep cells; `read` collects the payloads as they are consumed."""
+    for sweep in cells:
+        for i in range(per_cell):
+            payload = (sweep, i)
+            read.append(payload)
+            yield sweep, [0, 0, 1, 2, i], 1, payload
+
+
+def test_output_keeps_image_order():
+    random.seed(0)
+    read = []
+    # A sweep that comes back later is not moved up to its first cell
+    payloads = [payload for payload, _ in balance_by_sweep(_images(read, cells=((0,), (1,), (0,))), UNIFORM)]
+    assert payloads == read
+
+
+def test_buffers_one_cell_at_a_time():
+    random.seed(0)
+    read = []
+    for payload, _ in balance_by_sweep(_images(read), UNIFORM):
+        # The cell being yielded is complete and at most the first image of the next one was read
+        cell_end = read.index(payload) - payload[1] + 4
+        assert len(read) <= cell_end + 1
+
+
+def test_cell_keeps_its_quota():
+    random.seed(0)
+    chosen = {}
+    for (sweep, _), indices in balance_by_sweep(_images([]), UNIFORM):
+        chosen[sweep] = chosen.get(sweep, 0) + len(indices)
+    assert chosen == {(0,): 4, (1,): 4, (2,): 4}
+
+
+def test_allocate_shares_capped_answers():
+    assert allocate({0: 100, 1: 50, 2: 5, 3: 1}, 40) == {0: 17, 1: 17, 2: 5, 3: 1}
+    assert allocate({0: 100, 1: 50, 2: 5}, 40, {0: 1, 1: 3}) == {0: 10, 1: 30, 2: 0}
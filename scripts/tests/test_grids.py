@@ -0,0 +1,82 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import itertools
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.grids import COUNT_FILTERS, DIRECTIONS, FILLS, SHAPES, DirectionalCounts, GridSet
+
+STEPS = {"left": (0, -1), "right": (0, 1), "up": (-1, 0), "down": (1, 0)}
+
+
+def _grids(seed=0, sizes=((4, 5), (2, 3), (5, 1), (1, 1))):
+    """Random grids of different sizes, padded to the largest, with a few cells left out."""
+    rng = random.Random(seed)
+    dicts = []
+    for rows, cols in sizes:
+        grid = {(r, c): (rng.choice(SHAPES), rng.choice(FILLS)) for r in range(rows) for c in range(cols)}
+        for cell in rng.sample(sorted(grid), len(grid) // 5):
+            del grid[cell]
+        dicts.append(grid)
+    return GridSet.from_dicts(dicts)
+
+
+def _naive(grids, grid, row, col, direction, fill, shape):
+    """Walk from the cell to the grid edge and count the matching cells."""
+    dr, dc = STEPS[direction]
+    count = 0
+    r, c = row + dr, col + dc
+    while 0 <= r < grids.rows and 0 <= c < grids.cols:
+        cell_shape, cell_fill = grids.cell(grid, r, c)
+        if ((cell_shape, cell_fill) != (None, None) and fill in (None, cell_fill)
+                and shape in (None, cell_shape)):
+            count += 1
+        r, c = r + dr, c + dc
+    return count
+
+
+def _at_edge(grids, row, col, direction):
+    dr, dc = STEPS[direction]
+    return not (0 <= row + dr < grids.rows and 0 <= col + dc < grids.cols)
+
+
+def _queries(grids):
+    return itertools.product(range(grids.num_grids), range(grids.rows), range(grids.cols), DIRECTIONS,
+                             COUNT_FILTERS)
+
+
+def test_all_counts_matches_naive_scan():
+    grids = _grids()
+    counts = DirectionalCounts(grids).all_counts()
+    assert counts.shape == (len(DIRECTIONS), len(COUNT_FILTERS), grids.num_grids, grids.rows, grids.cols)
+    for grid, row, col, direction, (fill, shape) in _queries(grids):
+        expected = -1 if _at_edge(grids, row, col, direction) else _naive(grids, grid, row, col, direction,
+                                                                           fill, shape)
+        got = counts[DIRECTIONS.index(direction), COUNT_FILTERS.index((fill, shape)), grid, row, col]
+        assert got == expected, (grid, row, col, direction, fill, shape)
+
+
+def test_count_matches_naive_scan_before_and_after_build():
+    grids = _grids(seed=1)
+    counts = DirectionalCounts(grids)
+    for n, (grid, row, col, direction, (fill, shape)) in enumerate(_queries(grids)):
+        # The first BUILD_AFTER counts scan the cells, the next one builds the cumulative counts
+        assert (counts.rows_before is None) == (n <= DirectionalCounts.BUILD_AFTER)
+        expected = _naive(grids, grid, row, col, direction, fill, shape)
+        got = counts.count(grid, row, col, direction, fill=fill, shape=shape)
+        assert got == expected, (grid, row, col, direction, fill, shape)
+    assert counts.rows_before is not None
+
+
+def test_scan_and_lookup_agree_on_edges():
+    grids = _grids(seed=2)
+    scanning = DirectionalCounts(grids)
+    built = DirectionalCounts(grids)
+    built.all_counts()
+    for grid, row, col, direction, (fill, shape) in _queries(grids):
+        if _at_edge(grids, row, col, direction):
+            assert scanning._scan(grid, row, col, direction, fill, shape) == 0
+            assert built.count(grid, row, col, direction, fill=fill, shape=shape) == 0
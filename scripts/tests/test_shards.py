@@ -0,0 +1,73 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import json
+import os
+import random
+import sys
+import tarfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.shards import INDEX_NAME, ShardReader, ShardWriter
+from common.sink import MetadataSink
+
+
+def _write_items(tmp_path, count=20, max_bytes=40 << 10):
+    """Write items of random sizes, half of them from disk and half from memory; return {key: members}."""
+    rng = random.Random(0)
+    shard_dir = str(tmp_path / "shards")
+    expected = {}
+    with ShardWriter(shard_dir, max_bytes=max_bytes) as shards:
+        for i in range(count):
+            key = str(i)
+            path = str(tmp_path / f"{key}.svg")
+            data = bytes(rng.getrandbits(8) for _ in range(rng.randint(0, 6000)))
+            row = {"name": f"{key}.svg", "sweep": (i, 2)}
+            if i % 2:
+                with open(path, 'wb') as f:
+                    f.write(data)
+                shards.write(key, [path], row)
+            else:
+                shards.write(key, [path], row, contents={os.path.abspath(path): data})
+            expected[key] = {"svg": data, "json": json.dumps(row).encode("utf-8")}
+    return shard_dir, expected
+
+
+def test_index_points_at_the_members(tmp_path):
+    shard_dir, expected = _write_items(tmp_path)
+    index = list(MetadataSink.read(os.path.join(shard_dir, INDEX_NAME)))
+    assert [record["key"] for record in index] == list(expected)
+    shards = sorted(name for name in os.listdir(shard_dir) if name.endswith(".tar"))
+    assert len(shards) > 1
+    assert sorted({record["shard"] for record in index}) == shards
+
+    for record in index:
+        with tarfile.open(os.path.join(shard_dir, record["shard"])) as tar:
+            for ext, (offset, size) in record["members"].items():
+                info = tar.getmember(f"{record['key']}.{ext}")
+                assert (info.offset_data, info.size) == (offset, size)
+
+
+def test_shards_stay_under_the_size_limit(tmp_path):
+    max_bytes = 40 << 10
+    shard_dir, _ = _write_items(tmp_path, max_bytes=max_bytes)
+    for name in os.listdir(shard_dir):
+        if name.endswith(".tar"):
+            assert os.path.getsize(os.path.join(shard_dir, name)) <= max_bytes
+
+
+def test_reader_get_and_iteration(tmp_path):
+    shard_dir, expected = _write_items(tmp_path)
+    reader = ShardReader(shard_dir)
+    assert list(reader.keys()) == list(expected)
+    for key, members in expected.items():
+        assert reader.get(key) == members
+    assert dict(iter(reader)) == expected
+    assert [key for key, _ in reader] == list(expected)
+
+
+def test_rewrite_replaces_old_shards(tmp_path):
+    _write_items(tmp_path, count=20)
+    shard_dir, expected = _write_items(tmp_path, count=3)
+    assert sorted(name for name in os.listdir(shard_dir) if name.endswith(".tar")) == ["shard-000000.tar"]
+    assert dict(iter(ShardReader(shard_dir))) == expected
@@ -0,0 +1,69 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.sink import MetadataSink
+
+ROWS = [{"name": f"{i}.svg", "count": i, "score": i / 4, "sweep": [i, i + 1],
+         "counts": [{"shape": "circle", "color": "red", "count": i}]}
+        for i in range(7)]
+
+
+def _write(path, rows, **kwargs):
+    with MetadataSink(path, batch_size=3, **kwargs) as sink:
+        sink.writerows(rows)
+    return sink
+
+
+def test_jsonl_round_trip(tmp_path):
+    path = str(tmp_path / "rows.jsonl")
+    assert _write(path, ROWS).count == len(ROWS)
+    assert list(MetadataSink.read(path)) == ROWS
+
+
+def test_parquet_round_trip(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "rows.parquet")
+    _write(path, ROWS)
+    assert list(MetadataSink.read(path, batch_size=2)) == ROWS
+
+
+def test_parquet_arrow_types(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    path = str(tmp_path / "rows.parquet")
+    _write(path, ROWS, arrow_types={"sweep": lambda: pa.list_(pa.uint8())})
+    assert pq.read_schema(path).field("sweep").type == pa.list_(pa.uint8())
+    assert list(MetadataSink.read(path)) == ROWS
+
+
+def test_csv_round_trip(tmp_path):
+    path = str(tmp_path / "rows.csv")
+    _write(path, ROWS)
+    # CSV values come back as the strings pandas' to_csv writes
+    assert list(MetadataSink.read(path)) == [{k: str(v) for k, v in row.items()} for row in ROWS]
+
+
+def test_csv_append_and_fieldnames(tmp_path):
+    path = str(tmp_path / "rows.csv")
+    _write(path, ROWS[:4], fieldnames=["name", "count"])
+    _write(path, ROWS[4:], append=True)
+    assert list(MetadataSink.read(path)) == [{"name": row["name"], "count": str(row["count"])} for row in ROWS]
+
+
+def test_empty_csv_gets_header(tmp_path):
+    path = str(tmp_path / "rows.csv")
+    _write(path, [], fieldnames=["name", "count"])
+    with open(path) as f:
+        assert f.read() == "name,count\n"
+
+
+def test_unsupported_format(tmp_path):
+    with pytest.raises(ValueError):
+        MetadataSink(str(tmp_path / "rows.txt"))
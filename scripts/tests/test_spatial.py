@@ -0,0 +1,90 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import math
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.registry import load_generator
+from common.spatial import PlacedPolygons, sat_overlap, sat_overlaps
+
+
+def _convex_polygon(rng, num_corners, center, radius):
+    """Corners of a random convex polygon, at sorted angles on a circle."""
+    angles = sorted(rng.uniform(0, 2 * math.pi) for _ in range(num_corners))
+    return [(center[0] + radius * math.cos(a), center[1] + radius * math.sin(a)) for a in angles]
+
+
+def _square(x, y, side):
+    return [(x, y), (x + side, y), (x + side, y + side), (x, y + side)]
+
+
+def _pairs(rng, count, n, m):
+    pairs = []
+    for _ in range(count):
+        first = _convex_polygon(rng, n, (rng.uniform(0, 100), rng.uniform(0, 100)), rng.uniform(5, 40))
+        second = _convex_polygon(rng, m, (rng.uniform(0, 100), rng.uniform(0, 100)), rng.uniform(5, 40))
+        pairs.append((first, second))
+    return pairs
+
+
+@pytest.mark.parametrize("min_distance", [-3, 0, 4])
+@pytest.mark.parametrize("n, m", [(3, 3), (4, 4), (4, 6), (8, 5)])
+def test_sat_overlaps_matches_sat_overlap(n, m, min_distance):
+    rng = random.Random(n * 10 + m)
+    pairs = _pairs(rng, 300, n, m)
+    expected = [sat_overlap(a, b, min_distance) for a, b in pairs]
+    got = sat_overlaps([a for a, _ in pairs], [b for _, b in pairs], min_distance)
+    assert got.tolist() == expected
+    # Both outcomes are exercised
+    assert 0 < sum(expected) < len(expected)
+
+
+@pytest.mark.parametrize("min_distance", [-1, 0, 1])
+def test_sat_overlaps_touching_and_contained(min_distance):
+    pairs = [
+        (_square(0, 0, 10), _square(10, 0, 10)),     # sharing an edge
+        (_square(0, 0, 10), _square(10, 10, 10)),    # sharing a corner
+        (_square(0, 0, 10), _square(10.5, 0, 10)),   # half a unit apart
+        (_square(0, 0, 30), _square(10, 10, 5)),     # contained
+        (_square(10, 10, 5), _square(0, 0, 30)),     # containing
+        (_square(0, 0, 10), _square(0, 0, 10)),      # identical
+    ]
+    expected = [sat_overlap(a, b, min_distance) for a, b in pairs]
+    got = sat_overlaps([a for a, _ in pairs], [b for _, b in pairs], min_distance)
+    assert got.tolist() == expected
+    # Contained and identical polygons overlap whatever the distance
+    assert expected[3:] == [True, True, True]
+
+
+@pytest.mark.parametrize("num_candidates", [1, 4, 32])
+def test_first_free_matches_scan(num_candidates):
+    rng = random.Random(num_candidates)
+    placed = PlacedPolygons(60)
+    for _ in range(40):
+        placed.add(_square(rng.uniform(0, 400), rng.uniform(0, 400), rng.uniform(10, 40)))
+    for _ in range(200):
+        candidates = [_square(rng.uniform(0, 400), rng.uniform(0, 400), rng.uniform(10, 40))
+                      for _ in range(num_candidates)]
+        expected = next((k for k, corners in enumerate(candidates)
+                         if not any(sat_overlap(corners, other, 2) for other in placed.polygons)), None)
+        assert placed.first_free(candidates, 2 * math.sqrt(2) + 1, 2) == expected
+
+
+@pytest.mark.parametrize("placement", ["rejection", "free_space"])
+def test_batched_placement_matches_one_at_a_time(placement):
+    module = load_generator("2D_shape_discrimination")
+    # Crowded settings, so that rounds fail and grow to full batches
+    settings = dict(canvas_width=500, canvas_height=400, num_shapes=5, max_instances=8, min_scale=1.0,
+                    max_scale=2.0, placement=placement)
+    for seed in range(5):
+        random.seed(seed)
+        one_at_a_time = module.generate_complex_composition(candidates_per_round=1, **settings)
+        random.seed(seed)
+        batched = module.generate_complex_composition(candidates_per_round=32, **settings)
+        assert batched[:3] == one_at_a_time[:3]
+        assert batched[3]['attempts'] == one_at_a_time[3]['attempts']
@@ -0,0 +1,118 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.shards import ShardReader
+from common.sweep import run_resumable_sweep, run_sweep
+from common.writer import write_file
+
+TASK = "test_sweep"
+
+# Items generated by _worker in this process, in call order
+generated = []
+
+
+def _worker(item):
+    """Draw a few random numbers, write them to the item's file and return them as its row."""
+    generated.append(item['filename'])
+    values = [random.random() for _ in range(3)]
+    if item.get('fail', False):
+        raise ValueError("bad item")
+    write_file(os.path.join(item['output_dir'], item['filename']), repr(values))
+    return {"name": item['filename'], "values": values, "sweep": list(item['sweep'])}
+
+
+def _items(output_dir, count=12, **options):
+    return [{"output_dir": output_dir, "filename": f"{idx}.txt", "sweep": (idx % 3, idx % 2), "instance": idx // 6,
+             **options}
+            for idx in range(count)]
+
+
+def _run(items, tmp_path, **kwargs):
+    generated.clear()
+    return list(run_resumable_sweep(_worker, items, TASK, str(tmp_path / "manifest.jsonl"), **kwargs))
+
+
+def test_serial_and_pool_runs_are_identical(tmp_path):
+    serial = list(run_sweep(_worker, _items(str(tmp_path / "serial")), TASK, num_workers=1, seed=3))
+    for chunksize in (1, 5):
+        pool = list(run_sweep(_worker, _items(str(tmp_path / "serial")), TASK, num_workers=3, seed=3,
+                              chunksize=chunksize))
+        assert pool == serial
+    # Files reach the disk with the captured bytes
+    for row, files in serial:
+        for path, data in files.items():
+            with open(path, 'rb') as f:
+                assert f.read() == data
+
+
+def test_items_do_not_depend_on_each_other(tmp_path):
+    items = _items(str(tmp_path))
+    full = [row for row, _ in run_sweep(_worker, items, TASK, seed=1)]
+    subset = [row for row, _ in run_sweep(_worker, items[5:8], TASK, seed=1)]
+    assert subset == full[5:8]
+    other_seed = [row for row, _ in run_sweep(_worker, items, TASK, seed=2)]
+    assert other_seed != full
+
+
+def test_resume_skips_complete_items(tmp_path):
+    items = _items(str(tmp_path))
+    first = _run(items, tmp_path)
+    assert generated == [item['filename'] for item in items]
+    assert _run(items, tmp_path) == first
+    assert generated == []
+
+
+def test_resume_redoes_deleted_and_corrupted_items(tmp_path):
+    items = _items(str(tmp_path))
+    first = _run(items, tmp_path)
+    os.remove(tmp_path / "2.txt")
+    with open(tmp_path / "7.txt", 'a') as f:
+        f.write("corrupt")
+    assert _run(items, tmp_path) == first
+    assert generated == ["2.txt", "7.txt"]
+    with open(tmp_path / "7.txt") as f:
+        assert f.read() == repr(first[7]["values"])
+
+
+def test_resume_redoes_items_with_other_options_or_seed(tmp_path):
+    _run(_items(str(tmp_path)), tmp_path)
+    _run(_items(str(tmp_path), symbols=True), tmp_path)
+    assert len(generated) == 12
+    _run(_items(str(tmp_path), symbols=True), tmp_path, seed=1)
+    assert len(generated) == 12
+    _run(_items(str(tmp_path), symbols=True), tmp_path, seed=1)
+    assert generated == []
+
+
+def test_failed_items_are_retried(tmp_path):
+    items = _items(str(tmp_path), count=4)
+    items[1] = {**items[1], "fail": True}
+    rows = _run(items, tmp_path)
+    assert [row["name"] for row in rows] == ["0.txt", "2.txt", "3.txt"]
+    items[1] = {**items[1], "fail": False}
+    rows = _run(items, tmp_path)
+    assert generated == ["1.txt"]
+    assert [row["name"] for row in rows] == ["0.txt", "1.txt", "2.txt", "3.txt"]
+
+
+def test_shards_match_outputs_and_rows(tmp_path):
+    items = _items(str(tmp_path))
+    shard_dir = str(tmp_path / "shards")
+    rows = _run(items, tmp_path, shard_dir=shard_dir)
+    first = dict(iter(ShardReader(os.path.join(shard_dir, TASK))))
+    assert list(first) == [os.path.splitext(item['filename'])[0] for item in items]
+    for item, row in zip(items, rows):
+        members = first[os.path.splitext(item['filename'])[0]]
+        with open(os.path.join(item['output_dir'], item['filename']), 'rb') as f:
+            assert members["txt"] == f.read()
+        assert json.loads(members["json"]) == row
+    # Skipped items are packed from the files on disk, into the same shards
+    _run(items, tmp_path, shard_dir=shard_dir)
+    assert generated == []
+    assert dict(iter(ShardReader(os.path.join(shard_dir, TASK)))) == first
@@ -0,0 +1,91 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.writer import WriteBehind, call_capturing_writes, write_file
+
+
+class _BlockedWriter(WriteBehind):
+    """WriteBehind whose writes wait for `release` to be set."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.release = threading.Event()
+
+    def _write(self, path, data):
+        self.release.wait(10)
+        super()._write(path, data)
+
+
+def test_writes_reach_the_disk(tmp_path):
+    with WriteBehind(num_threads=2, max_pending=3) as writer:
+        for i in range(20):
+            writer.submit(str(tmp_path / "out" / f"{i}.txt"), f"item {i}")
+    for i in range(20):
+        with open(tmp_path / "out" / f"{i}.txt") as f:
+            assert f.read() == f"item {i}"
+    # No temporary files are left behind
+    assert sorted(os.listdir(tmp_path / "out")) == sorted(f"{i}.txt" for i in range(20))
+
+
+def test_submit_blocks_when_the_queue_is_full(tmp_path):
+    writer = _BlockedWriter(num_threads=1, max_pending=2)
+    submitted = []
+
+    def submit_all():
+        for i in range(4):
+            writer.submit(str(tmp_path / f"{i}.txt"), b"x")
+            submitted.append(i)
+
+    thread = threading.Thread(target=submit_all)
+    thread.start()
+    thread.join(0.5)
+    # Two writes are outstanding, the third submit waits for a free slot
+    assert thread.is_alive()
+    assert submitted == [0, 1]
+    writer.release.set()
+    thread.join(10)
+    assert submitted == [0, 1, 2, 3]
+    writer.close()
+    assert sorted(os.listdir(tmp_path)) == [f"{i}.txt" for i in range(4)]
+
+
+def test_flush_raises_failed_writes(tmp_path):
+    (tmp_path / "file").write_text("not a directory")
+    writer = WriteBehind(num_threads=2)
+    writer.submit(str(tmp_path / "file" / "a.txt"), b"x")
+    writer.submit(str(tmp_path / "b.txt"), b"y")
+    with pytest.raises(OSError, match="1 writes failed"):
+        writer.flush()
+    # The other writes still happen, and the errors are reported once
+    assert (tmp_path / "b.txt").read_bytes() == b"y"
+    writer.flush()
+    writer.close()
+
+
+def test_close_raises_failed_writes(tmp_path):
+    (tmp_path / "file").write_text("not a directory")
+    with pytest.raises(OSError):
+        with WriteBehind() as writer:
+            writer.submit(str(tmp_path / "file" / "a.txt"), b"x")
+
+
+def test_capturing_writes(tmp_path):
+    path = str(tmp_path / "a.txt")
+
+    def generate():
+        write_file(path, "café")
+        return 7
+
+    assert call_capturing_writes(generate) == (7, [(path, "café".encode("utf-8"))])
+    assert not os.path.exists(path)
+    # Outside a capture the file is written at once
+    generate()
+    with open(path, 'rb') as f:
+        assert f.read() == "café".encode("utf-8")